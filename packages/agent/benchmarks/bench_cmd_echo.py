@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of the command echo detection.
+
+Compares CmdEchoMatcher with the previous per-line implementation of ReadBuffer._cmd_in_line,
+which is copied below as legacy_cmd_in_line, on typical lines of a 1000 columns terminal.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_cmd_echo.py
+"""
+import re
+import timeit
+
+from netdriver_core.utils.terminal import simulate_output, simulate_output_oct_to_chinese
+from netdriver_agent.client.channel import get_cmd_echo_matcher
+from netdriver_agent.plugins.cisco import CiscoBase
+
+
+_CMD = "show running-config"
+_NUMBER = 200
+
+
+def legacy_cmd_in_line(cmd: str, encode: str, pattern: re.Pattern, line: str = '') -> bool:
+    """ ReadBuffer._cmd_in_line before CmdEchoMatcher, without trace logs """
+    if cmd in re.sub(r'\s[\r\x08]', '', line):
+        return True
+    if cmd.replace(' ', '') in re.sub(r'[\x07\s]', '', line):
+        return True
+    chinese = simulate_output_oct_to_chinese(output=line, encoding=encode)
+    if cmd in chinese:
+        return True
+    for index in range(1, len(line)):
+        if re.match(pattern, line[:index]):
+            line = line[index:].lstrip()
+            break
+    if '�' in line:
+        line_splits = re.sub(r"(\s\r|\r\n)", '', line).split('�')
+        for line_split in line_splits:
+            if line_split not in cmd:
+                return False
+        return True
+    line = simulate_output(line)
+    for index in range(1, len(line)):
+        if re.match(pattern, line[:index]):
+            line = line[index:].lstrip()
+            break
+    if '$' in line and line.replace('\x08', '').split('$')[0] in cmd:
+        return True
+    return False
+
+
+_LINES = {
+    "echo": f"router# {_CMD}\r\n",
+    "blank 1000 cols": " " * 998 + "\r\n",
+    "redraw 1000 cols": "\r" + " " * 997 + "\r\n",
+    "output 1000 cols": ("interface GigabitEthernet0/1 description uplink " * 21)[:998] + "\r\n",
+    "scrolled echo": "router#$" + "x" * 990 + "\r\n",
+}
+
+
+if __name__ == "__main__":
+    pattern = CiscoBase.PatternHelper.get_union_pattern()
+    matcher = get_cmd_echo_matcher(_CMD, "utf-8")
+    print(f"{'line':<18} | {'legacy':>12} | {'matcher':>12} | speedup")
+    for name, line in _LINES.items():
+        assert legacy_cmd_in_line(_CMD, "utf-8", pattern, line) == matcher.match(pattern, line), name
+        legacy = timeit.timeit(lambda: legacy_cmd_in_line(_CMD, "utf-8", pattern, line), number=_NUMBER)
+        new = timeit.timeit(lambda: matcher.match(pattern, line), number=_NUMBER)
+        print(f"{name:<18} | {legacy / _NUMBER * 1e6:9.1f} us | {new / _NUMBER * 1e6:9.1f} us | "
+              f"{legacy / new:6.1f}x")
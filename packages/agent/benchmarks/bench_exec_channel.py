@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of read-only commands over SSH exec channels and the interactive shell.
+
+Starts a simunet Arista device, sends a batch of show commands concurrently to one session,
+once queued on the interactive shell and once over exec channels, and reports the time of the
+batch. Each command is delayed by _LATENCY on the device to model the processing time of a
+real device; the exec channels run concurrently, the shell runs the commands one by one.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_exec_channel.py
+"""
+import asyncio
+import time
+
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_core.log import logman
+from netdriver_simunet.server.device import MockSSHDevice
+from netdriver_simunet.server.handlers.command_handler import CommandHandler
+
+
+_HOST = "127.0.0.1"
+_PORT = 18926
+_COMMANDS = [1, 50, 200]
+# simulated processing time of a command on the device (unit: seconds)
+_LATENCY = 0.005
+
+
+def add_latency() -> None:
+    exec_cmd = CommandHandler.exec_cmd
+
+    async def delayed_exec_cmd(self, command) -> str:
+        # the empty lines to get the prompt are answered at once
+        if command:
+            await asyncio.sleep(_LATENCY)
+        return await exec_cmd(self, command)
+
+    CommandHandler.exec_cmd = delayed_exec_cmd
+
+
+async def run(session, count: int, exec_channel: bool) -> None:
+    start = time.perf_counter()
+    results = await asyncio.gather(*[session.send_cmd("show version", exec_channel=exec_channel)
+                                     for _ in range(count)])
+    elapsed = time.perf_counter() - start
+    assert all(result.exception is None and "Arista" in result.output for result in results)
+    print(f"{'exec' if exec_channel else 'shell':>6} | {count:>4} commands | {elapsed:7.3f}s | "
+          f"{count / elapsed:8.1f} cmd/s")
+
+
+async def main() -> None:
+    logman.logger.remove()
+    add_latency()
+    device = MockSSHDevice.create_device(vendor="arista", model="eos", version="4.31.2F",
+                                         host=_HOST, port=_PORT)
+    await device.start()
+    config = Configuration()
+    config.from_yaml("config/agent/agent.yml")
+    plugin = PluginEngine().get_plugin("arista", "eos", "4.31.2F")
+    session = await plugin.create(ip=_HOST, port=_PORT, protocol="ssh", username="admin",
+                                  password="admin", vendor="arista", model="eos", version="4.31.2F",
+                                  config=config, queue_size=max(_COMMANDS))
+    await session._init_task
+    try:
+        for count in _COMMANDS:
+            await run(session, count, exec_channel=False)
+            await run(session, count, exec_channel=True)
+    finally:
+        await session.close()
+        device.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of a configuration push with and without pipelining.
+
+Starts a simunet Hillstone device behind a TCP proxy that delays the data by half of _RTT in
+each direction, to model a WAN link, then pushes _LINES configuration lines in config mode
+with several pipeline windows and reports the time of the push.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_pipeline.py
+"""
+import asyncio
+import time
+
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_core.dev.mode import Mode
+from netdriver_core.log import logman
+from netdriver_simunet.server.device import MockSSHDevice
+
+
+_HOST = "127.0.0.1"
+_DEVICE_PORT = 18933
+_PROXY_PORT = 18934
+# round trip time of the link (unit: seconds)
+_RTT = 0.05
+_LINES = 200
+_WINDOWS = [0, 8, 32, 128]
+
+
+async def forward(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """ Forward the data after half of the RTT, keeping the order """
+    queue = asyncio.Queue()
+
+    async def delay():
+        while True:
+            deadline, data = await queue.get()
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+            if not data:
+                writer.close()
+                return
+            writer.write(data)
+
+    task = asyncio.create_task(delay())
+    while True:
+        data = await reader.read(65536)
+        queue.put_nowait((time.monotonic() + _RTT / 2, data))
+        if not data:
+            break
+    await task
+
+
+async def handle_proxy(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    device_reader, device_writer = await asyncio.open_connection(_HOST, _DEVICE_PORT)
+    try:
+        await asyncio.gather(forward(reader, device_writer), forward(device_reader, writer))
+    except (asyncio.CancelledError, ConnectionError):
+        # the benchmark is done
+        pass
+
+
+async def main() -> None:
+    logman.logger.remove()
+    device = MockSSHDevice.create_device(vendor="hillstone", model="sg6000", version="5.5",
+                                         host=_HOST, port=_DEVICE_PORT)
+    await device.start()
+    proxy = await asyncio.start_server(handle_proxy, _HOST, _PROXY_PORT)
+    config = Configuration()
+    config.from_yaml("config/agent/agent.yml")
+    plugin = PluginEngine().get_plugin("hillstone", "sg6000", "5.5")
+    session = await plugin.create(ip=_HOST, port=_PROXY_PORT, protocol="ssh", username="admin",
+                                  password="admin", vendor="hillstone", model="sg6000", version="5.5",
+                                  config=config)
+    await session._init_task
+    command = "\n".join(["hostname hillstone"] * _LINES)
+    try:
+        for window in _WINDOWS:
+            start = time.perf_counter()
+            result = await session.send_cmd(command, mode=Mode.CONFIG, pipeline_window=window, timeout=600)
+            elapsed = time.perf_counter() - start
+            assert result.exception is None
+            print(f"window {window:>4} | {_LINES} lines | RTT {_RTT * 1e3:.0f}ms | {elapsed:7.3f}s | "
+                  f"{_LINES / elapsed:8.1f} lines/s")
+    finally:
+        await session.close()
+        proxy.close()
+        device.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
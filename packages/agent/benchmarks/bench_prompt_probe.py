@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the prompt probe before every command task.
+
+Starts a simunet Arista device behind a TCP proxy that delays the data by half of _RTT in each
+direction, to model a WAN link, then sends _COMMANDS show commands one by one, once probing the
+prompt before every task and once tracking the prompt at the end of the tasks, and reports the
+average latency of a command.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_prompt_probe.py
+"""
+import asyncio
+import time
+
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_core.log import logman
+from netdriver_simunet.server.device import MockSSHDevice
+
+
+_HOST = "127.0.0.1"
+_DEVICE_PORT = 18937
+_PROXY_PORT = 18938
+# round trip time of the link (unit: seconds)
+_RTT = 0.05
+_COMMANDS = 20
+
+
+async def forward(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """ Forward the data after half of the RTT, keeping the order """
+    queue = asyncio.Queue()
+
+    async def delay():
+        while True:
+            deadline, data = await queue.get()
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+            if not data:
+                writer.close()
+                return
+            writer.write(data)
+
+    task = asyncio.create_task(delay())
+    while True:
+        data = await reader.read(65536)
+        queue.put_nowait((time.monotonic() + _RTT / 2, data))
+        if not data:
+            break
+    await task
+
+
+async def handle_proxy(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    device_reader, device_writer = await asyncio.open_connection(_HOST, _DEVICE_PORT)
+    try:
+        await asyncio.gather(forward(reader, device_writer), forward(device_reader, writer))
+    except (asyncio.CancelledError, ConnectionError):
+        # the session is closed
+        pass
+
+
+async def run(session, track_prompt: bool) -> None:
+    if not track_prompt:
+        # forget the prompt at the end of the tasks, so every task probes it
+        session._track_prompt = lambda output: None
+    elapsed = []
+    for _ in range(_COMMANDS):
+        start = time.perf_counter()
+        result = await session.send_cmd("show version")
+        elapsed.append(time.perf_counter() - start)
+        assert result.exception is None and "Arista" in result.output
+    label = "track" if track_prompt else "probe"
+    print(f"{label:>6} | {_COMMANDS} commands | avg {sum(elapsed) / len(elapsed) * 1000:7.1f}ms | "
+          f"total {sum(elapsed):6.3f}s")
+
+
+async def main() -> None:
+    logman.logger.remove()
+    device = MockSSHDevice.create_device(vendor="arista", model="eos", version="4.31.2F",
+                                         host=_HOST, port=_DEVICE_PORT)
+    await device.start()
+    proxy = await asyncio.start_server(handle_proxy, _HOST, _PROXY_PORT)
+    config = Configuration()
+    config.from_yaml("config/agent/agent.yml")
+    config.session.device_profile_cache.from_value(None)
+    plugin = PluginEngine().get_plugin("arista", "eos", "4.31.2F")
+    try:
+        for track_prompt in (False, True):
+            session = await plugin.create(ip=_HOST, port=_PROXY_PORT, protocol="ssh", username="admin",
+                                          password="admin", vendor="arista", model="eos",
+                                          version="4.31.2F", config=config)
+            await session._init_task
+            try:
+                await run(session, track_prompt)
+            finally:
+                await session.close()
+    finally:
+        proxy.close()
+        device.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
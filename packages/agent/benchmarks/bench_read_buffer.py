@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of ReadBuffer prompt scanning.
+
+Replays the read loop of SSHChannel.read_channel_until (append a chunk, check the union pattern
+and the more pattern) over outputs of growing size. The per-chunk cost should stay flat while
+the output grows. The learned prompt mode checks the literal prompt on the tail of the output
+first, and runs the patterns on the last line only.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_read_buffer.py
+"""
+import time
+
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_agent.client.channel import ReadBuffer
+
+
+_CMD = "show configuration"
+_LINE = "set policy id 100 from trust to untrust src-addr any dst-addr any service any permit\r\n"
+_CHUNK_SIZE = 65536
+_SIZES_MB = [1, 5, 10, 20, 40]
+
+
+def gen_chunks(size: int) -> list[str]:
+    """ Generate chunks of device output with the given size """
+    body = _LINE * (size // len(_LINE))
+    data = f"hostname# {_CMD}\r\n{body}hostname# "
+    return [data[i:i + _CHUNK_SIZE] for i in range(0, len(data), _CHUNK_SIZE)]
+
+
+def run(size_mb: int, prompt: str = None) -> None:
+    union_pattern = HillstoneBase.PatternHelper.get_union_pattern()
+    more_pattern = HillstoneBase.PatternHelper.get_more_pattern()
+    chunks = gen_chunks(size_mb * 1024 * 1024)
+    output = ReadBuffer(cmd=_CMD)
+    costs = []
+    matched = None
+    for chunk in chunks:
+        start = time.perf_counter()
+        output.append(chunk)
+        if prompt:
+            matched = output.check_learned_prompt(prompt, union_pattern)
+            if not matched:
+                output.check_tail_pattern(more_pattern)
+        else:
+            matched = output.check_pattern(union_pattern, False)
+            if not matched:
+                output.check_pattern(more_pattern)
+        costs.append(time.perf_counter() - start)
+    assert matched, "prompt not found"
+    head = sum(costs[:10]) / 10
+    tail = sum(costs[-10:]) / 10
+    print(f"{'learned' if prompt else 'pattern':>8} | {size_mb:>4} MB | {len(chunks):>5} chunks | total {sum(costs):8.3f}s | "
+          f"first 10 chunks {head * 1e3:7.3f}ms/chunk | last 10 chunks {tail * 1e3:7.3f}ms/chunk")
+
+
+if __name__ == "__main__":
+    print(f"ReadBuffer scanning, chunk size {_CHUNK_SIZE} bytes, patterns: union + more")
+    for size in _SIZES_MB:
+        run(size)
+        run(size, prompt="hostname#")
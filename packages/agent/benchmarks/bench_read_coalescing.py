@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of quiescence-aware read coalescing.
+
+Streams a large output in small chunks through SSHChannel.read_channel_until with coalescing
+off and on, and reports the wall time and the number of pattern checks. A short command is run
+as well to show that coalescing does not add latency before the output exceeds
+coalesce_min_size.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_read_coalescing.py
+"""
+import asyncio
+import time
+
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_agent.client import channel as channel_module
+from netdriver_agent.client.channel import SSHChannel
+from netdriver_core.log import logman
+
+
+_CMD = "show configuration"
+_LINE = "set policy id 100 from trust to untrust src-addr any dst-addr any service any permit\r\n"
+_CHUNK_SIZE = 1024
+_MIN_SIZE = 65536
+_QUIET_TIME = 0.002
+
+
+class _Stream:
+    def __init__(self, chunks: list[str]):
+        self._chunks = list(chunks)
+
+    async def read(self, n: int = -1) -> str:
+        await asyncio.sleep(0)
+        return self._chunks.pop(0) if self._chunks else ""
+
+    def at_eof(self) -> bool:
+        return False
+
+    def write(self, data) -> None:
+        pass
+
+
+class _Conn:
+    def is_closed(self) -> bool:
+        return False
+
+
+class _Process:
+    def __init__(self, chunks: list[str]):
+        self.stdout = _Stream(chunks)
+        self.stdin = self.stdout
+
+    def is_closing(self) -> bool:
+        return False
+
+
+def gen_chunks(size: int) -> list[str]:
+    """ Generate small chunks of device output with the given size """
+    body = _LINE * (size // len(_LINE))
+    data = f"hostname# {_CMD}\r\n{body}hostname# "
+    return [data[i:i + _CHUNK_SIZE] for i in range(0, len(data), _CHUNK_SIZE)]
+
+
+async def run(size: int, min_size: int) -> tuple[float, int]:
+    checks = 0
+    check_pattern = channel_module.ReadBuffer.check_pattern
+
+    def _check_pattern(self, pattern, is_update_checkpos=True):
+        nonlocal checks
+        checks += 1
+        return check_pattern(self, pattern, is_update_checkpos)
+
+    channel_module.ReadBuffer.check_pattern = _check_pattern
+    try:
+        channel = SSHChannel(_Conn(), _Process(gen_chunks(size)), logger=logman.logger,
+                             coalesce_min_size=min_size, coalesce_quiet_time=_QUIET_TIME)
+        channel._read_buffer_size = _MIN_SIZE
+        start = time.perf_counter()
+        await channel.read_channel_until(
+            _CMD, HillstoneBase.PatternHelper.get_union_pattern(),
+            HillstoneBase.PatternHelper.get_more_pattern(), " ", timeout=60)
+        return time.perf_counter() - start, checks
+    finally:
+        channel_module.ReadBuffer.check_pattern = check_pattern
+
+
+async def main() -> None:
+    logman.logger.remove()
+    print(f"{'output':>10} {'mode':>8} {'wall(s)':>10} {'checks':>8}")
+    for size in [4 * 1024, 1024 * 1024, 10 * 1024 * 1024]:
+        for mode, min_size in (("off", 0), ("on", _MIN_SIZE)):
+            cost, checks = await run(size, min_size)
+            print(f"{size // 1024:>8}KB {mode:>8} {cost:>10.4f} {checks:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
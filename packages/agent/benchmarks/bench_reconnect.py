@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the session establishment with and without the device profile cache.
+
+Starts a simunet Hillstone device behind a TCP proxy that delays the data by half of _RTT in
+each direction, to model a WAN link, then creates and closes _ROUNDS sessions in a row, once
+without the cache and once with a cache file in a temp dir, and reports the average time from
+connect to the session ready. The first session with the cache learns the profile.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_reconnect.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.client.profile_cache import DeviceProfileCache
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_core.log import logman
+from netdriver_simunet.server.device import MockSSHDevice
+
+
+_HOST = "127.0.0.1"
+_DEVICE_PORT = 18935
+_PROXY_PORT = 18936
+# round trip time of the link (unit: seconds)
+_RTT = 0.05
+_ROUNDS = 5
+
+
+async def forward(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """ Forward the data after half of the RTT, keeping the order """
+    queue = asyncio.Queue()
+
+    async def delay():
+        while True:
+            deadline, data = await queue.get()
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+            if not data:
+                writer.close()
+                return
+            writer.write(data)
+
+    task = asyncio.create_task(delay())
+    while True:
+        data = await reader.read(65536)
+        queue.put_nowait((time.monotonic() + _RTT / 2, data))
+        if not data:
+            break
+    await task
+
+
+async def handle_proxy(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    device_reader, device_writer = await asyncio.open_connection(_HOST, _DEVICE_PORT)
+    try:
+        await asyncio.gather(forward(reader, device_writer), forward(device_reader, writer))
+    except (asyncio.CancelledError, ConnectionError):
+        # the session is closed
+        pass
+
+
+async def run(config: Configuration, label: str) -> None:
+    plugin = PluginEngine().get_plugin("hillstone", "sg6000", "5.5")
+    elapsed = []
+    for _ in range(_ROUNDS):
+        start = time.perf_counter()
+        session = await plugin.create(ip=_HOST, port=_PROXY_PORT, protocol="ssh", username="admin",
+                                      password="admin", vendor="hillstone", model="sg6000",
+                                      version="5.5", config=config)
+        await session._init_task
+        elapsed.append(time.perf_counter() - start)
+        await session.close()
+    print(f"{label:>10} | first {elapsed[0]:6.3f}s | later avg {sum(elapsed[1:]) / (_ROUNDS - 1):6.3f}s")
+
+
+async def main() -> None:
+    logman.logger.remove()
+    device = MockSSHDevice.create_device(vendor="hillstone", model="sg6000", version="5.5",
+                                         host=_HOST, port=_DEVICE_PORT)
+    await device.start()
+    proxy = await asyncio.start_server(handle_proxy, _HOST, _PROXY_PORT)
+    try:
+        config = Configuration()
+        config.from_yaml("config/agent/agent.yml")
+        config.session.device_profile_cache.from_value(None)
+        await run(config, "no cache")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.session.device_profile_cache.from_value(os.path.join(tmp_dir, "device_profiles.json"))
+            DeviceProfileCache._instance = None
+            await run(config, "cache")
+    finally:
+        proxy.close()
+        device.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the concurrent commands of one session over multiple shell channels.
+
+Starts a simunet Hillstone device, creates a session with 1, 2 and 4 shell channels over its SSH
+connection, sends a batch of commands concurrently and reports the time of the batch. Each
+command is delayed by _LATENCY on the device to model the processing time of a real device,
+which the other shells overlap; with no latency the batch is bound by the local CPU.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_shell_channels.py
+"""
+import asyncio
+import time
+
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_core.log import logman
+from netdriver_simunet.server.device import MockSSHDevice
+from netdriver_simunet.server.handlers.command_handler import CommandHandler
+
+
+_HOST = "127.0.0.1"
+_PORT = 18925
+_SHELL_CHANNELS = [1, 2, 4]
+_COMMANDS = 200
+# simulated processing time of a command on the device (unit: seconds)
+_LATENCY = 0.005
+
+
+def add_latency() -> None:
+    exec_cmd = CommandHandler.exec_cmd
+
+    async def delayed_exec_cmd(self, command) -> str:
+        # the empty lines to get the prompt are answered at once
+        if command:
+            await asyncio.sleep(_LATENCY)
+        return await exec_cmd(self, command)
+
+    CommandHandler.exec_cmd = delayed_exec_cmd
+
+
+async def run(plugin, config: Configuration, shell_channels: int) -> None:
+    profiles = config.session.profiles()
+    profiles["global"]["shell_channels"] = shell_channels
+    config.session.profiles.from_value(profiles)
+    start = time.perf_counter()
+    session = await plugin.create(ip=_HOST, port=_PORT, protocol="ssh", username="admin",
+                                  password="admin", vendor="hillstone", model="sg6000", version="5.5",
+                                  config=config, queue_size=_COMMANDS)
+    await session._init_task
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    results = await asyncio.gather(*[session.send_cmd("show version") for _ in range(_COMMANDS)])
+    elapsed = time.perf_counter() - start
+    assert all(result.exception is None and "Hillstone" in result.output for result in results)
+    await session.close()
+    print(f"{shell_channels:>2} shells | setup {setup:7.3f}s | {_COMMANDS} commands {elapsed:7.3f}s | "
+          f"{_COMMANDS / elapsed:8.1f} cmd/s")
+
+
+async def main() -> None:
+    logman.logger.remove()
+    add_latency()
+    device = MockSSHDevice.create_device(vendor="hillstone", model="sg6000", version="5.5",
+                                         host=_HOST, port=_PORT)
+    await device.start()
+    config = Configuration()
+    config.from_yaml("config/agent/agent.yml")
+    plugin = PluginEngine().get_plugin("hillstone", "sg6000", "5.5")
+    try:
+        for shell_channels in _SHELL_CHANNELS:
+            await run(plugin, config, shell_channels)
+    finally:
+        device.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of session setup over SSH and telnet.
+
+Starts a simunet Hillstone device listening on both SSH and telnet, then creates sessions
+concurrently over each protocol and reports the setup time (connect, login and session init)
+and the time of a show command.
+
+Usage:
+    uv run python packages/agent/benchmarks/bench_telnet.py
+"""
+import asyncio
+import time
+
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_core.log import logman
+from netdriver_simunet.server.device import MockSSHDevice
+
+
+_HOST = "127.0.0.1"
+_SSH_PORT = 18923
+_TELNET_PORT = 18924
+_SESSIONS = [1, 10, 50]
+
+
+async def setup_session(plugin, config: Configuration, protocol: str, port: int, username: str):
+    session = await plugin.create(ip=_HOST, port=port, protocol=protocol, username=username,
+                                  password="admin", vendor="hillstone", model="sg6000", version="5.5",
+                                  config=config)
+    await session._init_task
+    return session
+
+
+async def run(plugin, config: Configuration, protocol: str, port: int, count: int) -> None:
+    start = time.perf_counter()
+    sessions = await asyncio.gather(*[
+        setup_session(plugin, config, protocol, port, f"user{i}") for i in range(count)])
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    await asyncio.gather(*[session.send_cmd("show version") for session in sessions])
+    cmd = time.perf_counter() - start
+    await asyncio.gather(*[session.close() for session in sessions])
+    print(f"{protocol:>8} | {count:>4} sessions | setup {setup:7.3f}s | "
+          f"{setup / count * 1e3:7.2f}ms/session | show version {cmd:7.3f}s")
+
+
+async def main() -> None:
+    logman.logger.remove()
+    device = MockSSHDevice.create_device(vendor="hillstone", model="sg6000", version="5.5",
+                                         host=_HOST, port=_SSH_PORT, telnet_port=_TELNET_PORT)
+    await device.start()
+    config = Configuration()
+    config.from_yaml("config/agent/agent.yml")
+    plugin = PluginEngine().get_plugin("hillstone", "sg6000", "5.5")
+    try:
+        for count in _SESSIONS:
+            await run(plugin, config, "ssh", _SSH_PORT, count)
+            await run(plugin, config, "telnet", _TELNET_PORT, count)
+    finally:
+        device.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,14 +3,19 @@
 from typing import Annotated
 from dependency_injector.wiring import inject, Provide
 from fastapi import Depends, Header
+from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
 from netdriver_agent.containers import Container
-from netdriver_agent.handlers.cmd_req_handler import CommandRequestHandler
+from netdriver_agent.handlers.cmd_req_handler import CommandRequestHandler, CommandStreamRequestHandler
 from netdriver_agent.handlers.conn_req_handler import ConnectRequestHandler
+from netdriver_agent.handlers.session_req_handler import (SessionListRequestHandler, SessionPrewarmRequestHandler,
+    SessionRecordsRequestHandler)
 from netdriver_agent.models.cmd import CommandRequest, CommandResponse
 from netdriver_agent.models.common import CommonResponse
 from netdriver_agent.models.conn import ConnectRequest
 from netdriver_agent.models.header import CommonHeaders
+from netdriver_agent.models.session import (PrewarmRequest, PrewarmResponse, SessionListRequest,
+    SessionListResponse, SessionRecordsRequest, SessionRecordsResponse)
 from netdriver_agent.route import LoggingApiRoute
 
 
@@ -28,6 +33,18 @@ async def cmd(
     return await handler.handle(command)
 
 
+@router.post("/cmd/stream", summary="Execute command on device and stream the output",
+             response_class=StreamingResponse)
+@inject
+async def cmd_stream(
+    command: CommandRequest,
+    headers: Annotated[CommonHeaders, Header()],
+    handler: CommandStreamRequestHandler = Depends(Provide[Container.cmd_stream_req_handler])
+) -> StreamingResponse:
+    """ Execute command on device, the output is streamed as NDJSON records while it is read. """
+    return await handler.handle(command)
+
+
 @router.post("/connect", summary="Check the connection between agent and device")
 @inject
 async def connect(
@@ -37,3 +54,36 @@ async def connect(
 ) -> CommonResponse:
     """ Check the connection to the device. """
     return await handler.handle(request)
+
+
+@router.post("/session/records", summary="Dump the recent I/O of a session")
+@inject
+async def session_records(
+    request: SessionRecordsRequest,
+    headers: Annotated[CommonHeaders, Header()],
+    handler: SessionRecordsRequestHandler = Depends(Provide[Container.session_records_req_handler])
+) -> SessionRecordsResponse:
+    """ Dump the recent I/O recorded by the flight recorder of a session. """
+    return await handler.handle(request)
+
+
+@router.post("/session/prewarm", summary="Pre-warm the sessions of devices")
+@inject
+async def session_prewarm(
+    request: PrewarmRequest,
+    headers: Annotated[CommonHeaders, Header()],
+    handler: SessionPrewarmRequestHandler = Depends(Provide[Container.session_prewarm_req_handler])
+) -> PrewarmResponse:
+    """ Create the sessions of the devices in the background, and return the progress. """
+    return await handler.handle(request)
+
+
+@router.post("/session/list", summary="List the sessions in the pool")
+@inject
+async def session_list(
+    request: SessionListRequest,
+    headers: Annotated[CommonHeaders, Header()],
+    handler: SessionListRequestHandler = Depends(Provide[Container.session_list_req_handler])
+) -> SessionListResponse:
+    """ Return the aggregated status of the pool, and a page of the sessions. """
+    return await handler.handle(request)
@@ -6,10 +6,21 @@ from dependency_injector.providers import Configuration
 from netdriver_core.utils.terminal import simulate_output, simulate_output_oct_to_chinese
 from pydantic import IPvAnyAddress
 from re import Match, Pattern
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List
+import asyncio
 import asyncssh
+from asyncssh.public_key import get_default_certificate_algs, get_default_public_key_algs
+import codecs
+import copy
+import functools
+import mmap
+import tempfile
+import weakref
 import re
 
+from netdriver_agent.client.recorder import FlightRecorder
+from netdriver_agent.client.stream import OutputStream
+from netdriver_agent.client.telnet import TelnetClientConnection
 from netdriver_core.exception.errors import ChannelError
 from netdriver_core.log import logman
 from netdriver_core.utils.asyncu import async_timeout
@@ -20,6 +31,34 @@ log = logman.logger
 
 DEFAULT_SESSION_PROFILE = {
     "read_timeout": 10,
+    # str: decode every chunk by asyncssh; bytes: read raw bytes and decode once per command;
+    # spill: same as bytes, and spill large outputs to temp files
+    "read_mode": "str",
+    # Coalesce the reads of a command output once it exceeds the min size (unit: bytes), 0 disables
+    "coalesce_min_size": 0,
+    # Stop coalescing when no data arrives in the quiet time (unit: seconds)
+    "coalesce_quiet_time": 0.002,
+    # Detect the end of output by the literal prompt learned for the mode and vsys
+    "learned_prompt": True,
+    # Max time waiting for the prompt at the end of the login banner (unit: seconds), only spent on the
+    # devices showing no prompt before the first probe
+    "banner_timeout": 0.5,
+    # Number of interactive shells opened over the SSH connection, tasks run on the least busy one
+    "shell_channels": 1,
+    # Max sessions of a device in the pool, each over its own connection
+    "sessions_per_device": 1,
+    # Run the read-only commands over SSH exec channels, if the plugin supports it
+    "exec_channel": False,
+    # Max lines of a multi-line command written ahead of the prompts, 0 or 1 runs the lines one by one
+    "pipeline_window": 0,
+    # Size of the recent I/O kept per session (unit: bytes), dumped to the session log when a task
+    # fails, 0 disables it
+    "flight_recorder_size": 65536,
+    # Max queue time of a lower priority task before it is dispatched ahead of the higher priorities
+    # (unit: seconds), 0 disables it
+    "queue_starvation_time": 30,
+    # TTL of the cached outputs by the pattern of the read-only commands (unit: seconds), empty disables it
+    "result_cache": {},
 }
 
 _DEFAUTL_SSH_CONFIG = {
@@ -29,8 +68,8 @@ _DEFAUTL_SSH_CONFIG = {
     "login_timeout": 3.0,
     "keepalive_interval": 60,
     "keepalive_count_max": 3,
-    # Key exchange algorithms
-    "kex_algs": set([
+    # Key exchange algorithms, in the order of preference
+    "kex_algs": [
       "gss-curve25519-sha256",
       "gss-curve448-sha512",
       "gss-nistp521-sha512",
@@ -74,9 +113,9 @@ _DEFAUTL_SSH_CONFIG = {
       "diffie-hellman-group18-sha512@ssh.com",
       "diffie-hellman-group1-sha1",
       "rsa1024-sha1",
-    ]),
-    # Encryption algorithms
-    "encryption_algs": set([
+    ],
+    # Encryption algorithms, in the order of preference
+    "encryption_algs": [
       "chacha20-poly1305@openssh.com",
       "aes256-gcm@openssh.com",
       "aes128-gcm@openssh.com",
@@ -93,31 +132,76 @@ _DEFAUTL_SSH_CONFIG = {
       "arcfour256",
       "arcfour128",
       "arcfour",
-    ]),
+    ],
+}
+_DEFAULT_TELNET_CONFIG = {
+    "connect_timeout": 10.0,
+    "login_timeout": 3.0,
 }
 _DEFAULT_READ_BUFFER_SIZE = 8192
+_DEFAULT_SPILL_THRESHOLD = 4 * 1024 * 1024
+_DEFAULT_READ_BUFFER_MEMORY_LIMIT = 256 * 1024 * 1024
+# the learned prompt is compared with the last bytes of the output
+_PROMPT_TAIL_SIZE = 512
+# the default host key algorithms of asyncssh, a learned one is moved to the front
+_DEFAULT_HOST_KEY_ALGS = [
+    alg.decode("ascii") for alg in get_default_certificate_algs() + get_default_public_key_algs()]
+# the key algorithm of RSA is ssh-rsa, which also names the SHA-1 signature, so it is not preferred
+_NOT_PREFERRED_HOST_KEY_ALGS = ("ssh-rsa",)
+
 
+def _prefer_alg(algs: List[str], alg: Optional[str]) -> List[str]:
+    """ Move the algorithm to the front of the list, if it is in the list """
+    if not alg or alg not in algs:
+        return algs
+    return [alg] + [a for a in algs if a != alg]
 
-def update_ssh_config(kwargs: dict, profile: dict, config: Configuration) -> dict:
-    """ Update SSH configuration with defaults and provided parameters """
+
+def update_ssh_config(kwargs: dict, profile: dict, config: Configuration,
+                      device_profile: dict = None) -> dict:
+    """ Update SSH configuration with defaults and provided parameters
+
+    :param device_profile: dict, the profile learned from the device, see DeviceProfileCache, the
+        algorithms negotiated before are offered first
+    """
     ssh = config.session.ssh
-    extra_kex_algs = set(ssh.kex_algs() or [])
-    extra_encryption_algs = (ssh.encryption_algs() or [])
+    device_profile = device_profile or {}
     ssh_config = _DEFAUTL_SSH_CONFIG.copy()
-    ssh_config["kex_algs"] = list(ssh_config["kex_algs"].union(extra_kex_algs))
-    ssh_config["encryption_algs"] = list(ssh_config["encryption_algs"].union(extra_encryption_algs))
+    # keep the order of preference, dict.fromkeys drops the duplicates
+    ssh_config["kex_algs"] = list(dict.fromkeys(ssh_config["kex_algs"] + list(ssh.kex_algs() or [])))
+    ssh_config["encryption_algs"] = _prefer_alg(
+        list(dict.fromkeys(ssh_config["encryption_algs"] + list(ssh.encryption_algs() or []))),
+        device_profile.get("encryption_alg"))
     ssh_config["login_timeout"] = ssh.login_timeout() or ssh_config["login_timeout"]
     ssh_config["connect_timeout"] = ssh.connect_timeout() or ssh_config["connect_timeout"]
     ssh_config["keepalive_interval"] = ssh.keepalive_interval() or ssh_config["keepalive_interval"]
     ssh_config["keepalive_count_max"] = ssh.keepalive_count_max() or ssh_config["keepalive_count_max"]
     server_host_key_algs = profile.get("server_host_key_algs", [])
+    host_key_alg = device_profile.get("server_host_key_alg")
     if server_host_key_algs:
         ssh_config["server_host_key_algs"] = server_host_key_algs
-    term_size = ()
+    elif host_key_alg in _DEFAULT_HOST_KEY_ALGS and host_key_alg not in _NOT_PREFERRED_HOST_KEY_ALGS:
+        ssh_config["server_host_key_algs"] = _prefer_alg(_DEFAULT_HOST_KEY_ALGS, host_key_alg)
     kwargs.update(ssh_config)
-    if ssh.term_size() and ssh.term_size.width() and ssh.term_size.height():
-        term_size = (ssh.term_size.width(), ssh.term_size.height())
-    return kwargs, term_size
+    return kwargs, get_term_size(config)
+
+
+def update_telnet_config(kwargs: dict, config: Configuration) -> dict:
+    """ Update Telnet configuration with defaults and provided parameters """
+    telnet = config.session.telnet
+    telnet_config = _DEFAULT_TELNET_CONFIG.copy()
+    telnet_config["login_timeout"] = telnet.login_timeout() or telnet_config["login_timeout"]
+    telnet_config["connect_timeout"] = telnet.connect_timeout() or telnet_config["connect_timeout"]
+    kwargs.update(telnet_config)
+    return kwargs, get_term_size(config)
+
+
+def get_term_size(config: Configuration) -> tuple:
+    """ Get the terminal size (width, height) from config, empty if not set """
+    term_size = config.session.ssh.term_size
+    if term_size() and term_size.width() and term_size.height():
+        return (term_size.width(), term_size.height())
+    return ()
 
 
 class Channel:
@@ -126,6 +210,9 @@ class Channel:
     _read_buffer_size: int 
     _line_break: str
     _read_channel_until_timeout: float
+    _recorder: FlightRecorder = None
+    # the stream of the running task, which the read chunks are written to
+    output_stream: Optional[OutputStream] = None
 
     @classmethod
     async def create(cls,
@@ -138,23 +225,60 @@ class Channel:
                  logger: object = None,
                  profile: dict = {},
                  config: Configuration = None,
+                 device_profile: dict = None,
                  **kwargs: dict) -> "Channel":
-        """ Factory method to create channel """
+        """ Factory method to create channel
+
+        :param device_profile: dict, the profile learned from the device, see DeviceProfileCache
+        """
 
         cls._read_buffer_size = config.session.read_buffer_size() or _DEFAULT_READ_BUFFER_SIZE
         cls._read_channel_until_timeout = profile.get("read_timeout", DEFAULT_SESSION_PROFILE.get("read_timeout", 10))
 
         if protocol == "ssh":
-            kwargs, term_size = update_ssh_config(kwargs, profile, config)
+            kwargs, term_size = update_ssh_config(kwargs, profile, config, device_profile)
             conn = await asyncssh.connect(
                 host=str(ip), port=port, username=username, password=password,
                 encoding=encode, **kwargs)
-            terminal = await conn.create_process(term_type="ansi", term_size=term_size)
-            terminal.stdout.channel.set_encoding(encoding=encode, errors='replace')
-            return SSHChannel(conn, terminal, logger=logger, encode=encode)
+        elif protocol == "telnet":
+            # the telnet connection provides the same interface as asyncssh, see TelnetClientConnection
+            kwargs, term_size = update_telnet_config(kwargs, config)
+            conn = await TelnetClientConnection.connect(
+                host=str(ip), port=port, username=username, password=password,
+                encoding=encode, term_size=term_size, logger=logger, **kwargs)
         else:
             raise ValueError(f"protocol {protocol} not supported.")
 
+        read_mode = profile.get("read_mode", DEFAULT_SESSION_PROFILE.get("read_mode"))
+        coalesce = {
+            "coalesce_min_size": profile.get(
+                "coalesce_min_size", DEFAULT_SESSION_PROFILE.get("coalesce_min_size")),
+            "coalesce_quiet_time": profile.get(
+                "coalesce_quiet_time", DEFAULT_SESSION_PROFILE.get("coalesce_quiet_time")),
+            "recorder_size": profile.get(
+                "flight_recorder_size", DEFAULT_SESSION_PROFILE.get("flight_recorder_size")),
+        }
+        if read_mode in ("bytes", "spill"):
+            terminal = await BytesSSHChannel.create_terminal(conn, encode, term_size)
+            spill_threshold = None
+            if read_mode == "spill":
+                ReadBufferBudget(config.session.read_buffer_memory_limit())
+                spill_threshold = profile.get("spill_threshold", _DEFAULT_SPILL_THRESHOLD)
+            return BytesSSHChannel(conn, terminal, logger=logger, encode=encode, term_size=term_size,
+                                   spill_threshold=spill_threshold, **coalesce)
+        terminal = await SSHChannel.create_terminal(conn, encode, term_size)
+        return SSHChannel(conn, terminal, logger=logger, encode=encode, term_size=term_size, **coalesce)
+
+    @property
+    def recorder(self) -> FlightRecorder:
+        """ the recent I/O of the channel """
+        return self._recorder
+
+    async def _stream_output(self, chunk: str | bytes) -> None:
+        """ Write the chunk read to the output stream if there is one """
+        if self.output_stream is not None:
+            await self.output_stream.write(chunk)
+
     @abstractmethod
     async def read_channel(self, buffer_size: int = None) -> str:
         """ read the available data of buff size
@@ -168,6 +292,7 @@ class Channel:
         union_pattern: Pattern,
         more_pattern: Pattern,
         more_cmd: str,
+        prompt: str = None,
         timeout: float = 10) -> str:
 
         """
@@ -177,12 +302,25 @@ class Channel:
         :param handle_more: bool
         :param more_pattern: Pattern
         :param more_cmd: str
+        :param prompt: str, the literal prompt learned by the session
         :param timeout: float
         """
 
     @abstractmethod
-    async def write_channel(self, data: str) -> None:
-        """ write data to channel """
+    async def write_channel(self, data: str, secret: bool = False) -> None:
+        """ write data to channel, the data of a secret write is not recorded """
+
+    @abstractmethod
+    async def open_shell(self) -> "Channel":
+        """ open another channel over the same connection """
+
+    @abstractmethod
+    async def exec_command(self, command: str, timeout: float = 10) -> str:
+        """ run a command over an exec channel of the same connection """
+
+    @abstractmethod
+    def get_ssh_algs(self) -> Dict[str, str]:
+        """ get the algorithms negotiated with the device, empty if not over SSH """
 
     @abstractmethod
     async def close(self) -> None:
@@ -198,19 +336,56 @@ class Channel:
 
 
 class SSHChannel(Channel):
-    """ AsyncSSH Channel """
+    """ AsyncSSH Channel, also drives the telnet connections which provide the same interface """
     _conn: asyncssh.SSHClientConnection
     _terminal: asyncssh.SSHClientProcess
 
     def __init__(self, conn: asyncssh.SSHClientConnection,
                  terminal: asyncssh.SSHClientProcess,
                  logger: object = None,
-                 encode: str = "utf-8") -> None:
-        """ SSH Channel """
+                 encode: str = "utf-8",
+                 term_size: tuple = (),
+                 coalesce_min_size: int = 0,
+                 coalesce_quiet_time: float = 0.002,
+                 recorder_size: int = 65536) -> None:
+        """ SSH Channel
+        :param term_size: tuple, the terminal size of the shells opened by open_shell
+        :param coalesce_min_size: int, once the output of a command exceeds the min size, coalesce the
+            following reads until the min size is reached or the channel is quiet, 0 disables it
+        :param coalesce_quiet_time: float, the quiet time (unit: seconds) ends a coalescing read
+        :param recorder_size: int, size of the recent I/O kept by the flight recorder, 0 disables it
+        """
         self._conn = conn
         self._terminal = terminal
         self._logger = logger
         self._encode = encode
+        self._term_size = term_size
+        self._coalesce_min_size = coalesce_min_size
+        self._coalesce_quiet_time = coalesce_quiet_time
+        self._recorder = FlightRecorder(recorder_size)
+        # the channels opened by open_shell share the connection of the first one
+        self._owns_conn = True
+
+    @classmethod
+    async def create_terminal(cls, conn: asyncssh.SSHClientConnection, encode: str = "utf-8",
+                              term_size: tuple = ()) -> asyncssh.SSHClientProcess:
+        """ Create an interactive shell process over the connection """
+        terminal = await conn.create_process(term_type="ansi", term_size=term_size)
+        if isinstance(conn, asyncssh.SSHClientConnection):
+            terminal.stdout.channel.set_encoding(encoding=encode, errors='replace')
+        return terminal
+
+    async def open_shell(self) -> "SSHChannel":
+        """ Open another interactive shell over the connection of the channel
+
+        The new channel has the same settings, closing it does not close the connection.
+        """
+        self._check_channel()
+        channel = copy.copy(self)
+        channel._terminal = await self.create_terminal(self._conn, self._encode, self._term_size)
+        channel._recorder = FlightRecorder(self._recorder.capacity)
+        channel._owns_conn = False
+        return channel
 
     def _check_channel(self):
         if not self._conn:
@@ -222,9 +397,55 @@ class SSHChannel(Channel):
         self._check_channel()
         buf_size = buffer_size if buffer_size else self._read_buffer_size
         ret = await self._terminal.stdout.read(buf_size)
-        self._logger.debug(f"Read:\n<<<{ret}<<<\n")
+        self._recorder.record(FlightRecorder.READ, ret)
+        await self._stream_output(ret)
         return ret
 
+    async def _read_coalesced(self, buffer_size: int) -> str | bytes:
+        """ Read a chunk, then keep reading until the coalesce min size is reached or the channel is
+        quiet for the coalesce quiet time, so the caller checks the prompt only at quiet points
+        """
+        self._check_channel()
+        stdout = self._terminal.stdout
+        chunks = [await stdout.read(buffer_size)]
+        size = len(chunks[0])
+        limit = min(self._coalesce_min_size, buffer_size)
+        while size < limit and not stdout.at_eof():
+            try:
+                chunk = await asyncio.wait_for(stdout.read(buffer_size - size), self._coalesce_quiet_time)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        ret = chunks[0][:0].join(chunks)
+        self._recorder.record(FlightRecorder.READ, ret)
+        await self._stream_output(ret)
+        return ret
+
+    async def read_channel_coalesced(self, buffer_size: int = None) -> str:
+        """ Read a coalesced chunk as str, see _read_coalesced """
+        return await self._read_coalesced(buffer_size if buffer_size else self._read_buffer_size)
+
+    def _is_coalescing(self, read_size: int) -> bool:
+        """ Coalesce only for large outputs, so short commands check the prompt on every chunk """
+        return self._coalesce_min_size > 0 and read_size >= self._coalesce_min_size
+
+    @staticmethod
+    def _check_prompt(output: "ReadBuffer", union_pattern: Pattern, prompt: str = None) -> bool:
+        """ Check the learned prompt on the tail if there is one, otherwise the union pattern """
+        if prompt:
+            return output.check_learned_prompt(prompt, union_pattern)
+        return output.check_pattern(union_pattern, False) is not None
+
+    @staticmethod
+    def _check_more(output: "ReadBuffer", more_pattern: Pattern, prompt: str = None) -> bool:
+        """ The more prompt waits for input, so it is checked on the tail along with the learned prompt """
+        if prompt:
+            return output.check_tail_pattern(more_pattern) is not None
+        return output.check_pattern(more_pattern) is not None
+
     def _get_lastline(self, chunk: str = "") -> str:
         """ Get the last line from the chunk """
         lines = chunk.splitlines()
@@ -236,37 +457,79 @@ class SSHChannel(Channel):
     @async_timeout()
     async def read_channel_until(
         self, cmd, union_pattern: Pattern, more_pattern: Pattern, more_cmd: str = '',
-        timeout: float = 10) -> str:
+        prompt: str = None, timeout: float = 10) -> str:
         """ Read data until pattern or timeout
         :param union_pattern: Pattern, the pattern to match
         :param handle_more: bool, whether to handle more data
         :param more_pattern: Pattern, the pattern to match for more data
         :param more_cmd: str, the command to send for more data
+        :param prompt: str, the literal prompt learned by the session, checked on the tail of the
+            output before the union pattern
         :param timeout: float, the timeout for the read operation
         :return: str, the data read from the channel
         """
         self._check_channel()
         output = ReadBuffer(cmd=cmd, encode=self._encode)
+        read_size = 0
         while not self.read_at_eof():
-            chunk = await self.read_channel(self._read_buffer_size)
+            if self._is_coalescing(read_size):
+                chunk = await self.read_channel_coalesced(self._read_buffer_size)
+            else:
+                chunk = await self.read_channel(self._read_buffer_size)
+            read_size += len(chunk)
             output.append(chunk)
-            if output.check_pattern(union_pattern, False):
+            if self._check_prompt(output, union_pattern, prompt):
                 self._logger.debug(f"Found prompt, stop reading")
                 break
-            if more_pattern and output.check_pattern(more_pattern):
+            if more_pattern and self._check_more(output, more_pattern, prompt):
                 self._logger.debug(f"More data detected, sending command: {more_cmd}")
-                self._terminal.stdin.write(more_cmd)
+                self._write(more_cmd)
                 continue
         return output.get_data()
 
-    async def write_channel(self, data: str) -> None:
-        self._check_channel()
-        self._logger.debug(f"Write:\n>>>{data}<<<\n")
+    def _write(self, data: str, secret: bool = False) -> None:
+        self._recorder.record(FlightRecorder.WRITE, FlightRecorder.SECRET if secret else data)
         self._terminal.stdin.write(data)
 
+    async def write_channel(self, data: str, secret: bool = False) -> None:
+        self._check_channel()
+        self._write(data, secret)
+
+    async def exec_command(self, command: str, timeout: float = 10) -> str:
+        """ Run a command over a non-PTY exec channel of the connection
+
+        The output ends with the EOF of the channel, so there is no prompt, echo or pager to handle.
+        The exec channels run concurrently with the interactive shell.
+        :return: the stdout and stderr of the command
+        :raises asyncssh.ChannelOpenError: if the device rejects the exec channel
+        :raises asyncssh.TimeoutError: if the command is not finished in time
+        """
+        self._check_channel()
+        self._recorder.record(FlightRecorder.EXEC, command)
+        result = await self._conn.run(command, check=False, timeout=timeout,
+                                      encoding=self._encode, errors='replace')
+        output = (result.stdout or '') + (result.stderr or '')
+        self._recorder.record(FlightRecorder.READ, output)
+        return output
+
+    def get_ssh_algs(self) -> Dict[str, str]:
+        """ Get the encryption and host key algorithms negotiated with the device
+
+        asyncssh does not keep the key exchange algorithm after the key exchange, so the key
+        exchange algorithms are always offered in the order of preference.
+        """
+        if not isinstance(self._conn, asyncssh.SSHClientConnection):
+            return {}
+        host_key = self._conn.get_server_host_key()
+        return {
+            "encryption_alg": self._conn.get_extra_info("send_cipher"),
+            "server_host_key_alg": host_key.get_algorithm() if host_key else None,
+        }
+
     async def close(self) -> None:
         self._terminal.close()
-        self._conn.close()
+        if self._owns_conn:
+            self._conn.close()
 
     def is_alive(self) -> bool:
         return not self._conn.is_closed() and not self._terminal.is_closing()
@@ -276,86 +539,231 @@ class SSHChannel(Channel):
         return self._terminal.stdout.at_eof() if self._terminal.stdout else True
 
 
-class ReadBuffer:
-    """ Read buffer for streaming data from stdout and check whether the pattern matched """
-    _buffer: List[str]
-    # record the last checked line position in the buffer
-    _last_line_pos: Tuple[int, int]
-    _line_break: str
-    # the previous command that used to make sure the prompt is correct
-    # because the echo "prompt: {cmd}" may be checked as a matched pattern
-    _cmd: str
-    _is_cmd_displayed: bool = False
+class BytesSSHChannel(SSHChannel):
+    """ AsyncSSH Channel in bytes mode
 
-    def __init__(self, cmd: str = '', line_break: str = '\n', encode: str = None) -> None:
-        """ Initialize read buffer """
-        self._buffer = []
-        self._last_line_pos = (0, 0)
-        self._line_break = line_break
+    The process is opened without encoding, so asyncssh does not decode every chunk. Command outputs
+    are collected in a BytesReadBuffer, the prompt is matched on bytes, and the output is decoded
+    once by an incremental decoder after the command completed. read_channel still returns str for
+    the interactive flows (enable, config, auto confirms...), decoded by the same decoder, so a
+    multi-byte char split across chunks is kept until its last byte arrives.
+    """
+
+    def __init__(self, conn: asyncssh.SSHClientConnection,
+                 terminal: asyncssh.SSHClientProcess,
+                 logger: object = None,
+                 encode: str = "utf-8",
+                 spill_threshold: int = None,
+                 **kwargs) -> None:
+        """ Bytes SSH Channel
+        :param spill_threshold: int, spill the output of a command to a temp file once it exceeds the
+            threshold (unit: bytes), if None, keep the output in memory
+        :param kwargs: the coalescing options of SSHChannel
+        """
+        super().__init__(conn, terminal, logger=logger, encode=encode, **kwargs)
+        self._decoder = codecs.getincrementaldecoder(encode)(errors='replace')
+        self._spill_threshold = spill_threshold
+
+    @classmethod
+    async def create_terminal(cls, conn: asyncssh.SSHClientConnection, encode: str = "utf-8",
+                              term_size: tuple = ()) -> asyncssh.SSHClientProcess:
+        """ Create an interactive shell process without encoding """
+        return await conn.create_process(term_type="ansi", term_size=term_size, encoding=None)
+
+    async def open_shell(self) -> "BytesSSHChannel":
+        channel = await super().open_shell()
+        channel._decoder = codecs.getincrementaldecoder(self._encode)(errors='replace')
+        return channel
+
+    def _create_read_buffer(self, cmd: str) -> "BytesReadBuffer":
+        if self._spill_threshold:
+            return SpillReadBuffer(cmd=cmd, encode=self._encode, spill_threshold=self._spill_threshold)
+        return BytesReadBuffer(cmd=cmd, encode=self._encode)
+
+    async def read_channel_bytes(self, buffer_size: int = None) -> bytes:
+        """ read the available bytes of buff size """
+        self._check_channel()
+        buf_size = buffer_size if buffer_size else self._read_buffer_size
+        ret = await self._terminal.stdout.read(buf_size)
+        self._recorder.record(FlightRecorder.READ, ret)
+        await self._stream_output(ret)
+        return ret
+
+    async def read_channel(self, buffer_size: int = None) -> str:
+        return self._decoder.decode(await self.read_channel_bytes(buffer_size))
+
+    async def read_channel_coalesced(self, buffer_size: int = None) -> str:
+        return self._decoder.decode(await self._read_coalesced(
+            buffer_size if buffer_size else self._read_buffer_size))
+
+    @async_timeout()
+    async def read_channel_until(
+        self, cmd, union_pattern: Pattern, more_pattern: Pattern, more_cmd: str = '',
+        prompt: str = None, timeout: float = 10) -> str:
+        """ Read bytes until pattern or timeout, see SSHChannel.read_channel_until """
+        self._check_channel()
+        if not to_bytes_pattern(union_pattern, self._encode) or \
+                (more_pattern and not to_bytes_pattern(more_pattern, self._encode)):
+            # the patterns can not be matched on bytes, fallback to read str. The timeout of the caller
+            # is already applied by async_timeout of this method, so the str read is not timed again
+            return await SSHChannel.read_channel_until.__wrapped__(
+                self, cmd, union_pattern, more_pattern, more_cmd, prompt, timeout=timeout)
+        output = self._create_read_buffer(cmd)
+        read_size = 0
+        try:
+            while not self.read_at_eof():
+                if self._is_coalescing(read_size):
+                    chunk = await self._read_coalesced(self._read_buffer_size)
+                else:
+                    chunk = await self.read_channel_bytes(self._read_buffer_size)
+                read_size += len(chunk)
+                output.append(chunk)
+                if self._check_prompt(output, union_pattern, prompt):
+                    self._logger.debug(f"Found prompt, stop reading")
+                    break
+                if more_pattern and self._check_more(output, more_pattern, prompt):
+                    self._logger.debug(f"More data detected, sending command: {more_cmd}")
+                    self._write(more_cmd)
+                    continue
+            return self._decoder.decode(output.get_bytes())
+        finally:
+            output.close()
+
+    def _write(self, data: str, secret: bool = False) -> None:
+        self._recorder.record(FlightRecorder.WRITE, FlightRecorder.SECRET if secret else data)
+        self._terminal.stdin.write(data.encode(self._encode))
+
+
+class CmdEchoMatcher:
+    """ Check whether a line of output is the echo of a command
+
+    The matcher is built once per command and encoding, see get_cmd_echo_matcher. The vendor
+    quirks are handled by precompiled regexes:
+    - Topsec outputs extra ' \\r' and Fortinet outputs extra ' \\x08'
+    - Juniper removes the extra spaces of the input
+    - Fortinet outputs Chinese as octal escapes
+    - Topsec fails to escape Chinese and replaces it by '\\ufffd'
+    - Array and Cisco scroll ultra wide input and mark it with '$'
+    """
+    # the prompt is expected to end within the first chars of the echo line
+    _MAX_PROMPT_LEN = 256
+    _RE_CR_BS_NOISE = re.compile(r'\s[\r\x08]')
+    _RE_BELL_SPACES = re.compile(r'[\x07\s]')
+    _RE_OCTAL = re.compile(r'\\\d{3}')
+    _RE_REPLACED_LINE_BREAK = re.compile(r'(\s\r|\r\n)')
+    # a prompt ends after a non-word char, such as '#', '>', ']', '$' or a space
+    _RE_PROMPT_END = re.compile(r'\W')
+
+    def __init__(self, cmd: str, encode: str = None) -> None:
         self._cmd = cmd
-        self._is_cmd_displayed = False
+        self._cmd_no_space = cmd.replace(' ', '')
         self._encode = encode
 
-    def _check_cmd_displayed(self, pattern: Pattern, line: str = '') -> bool:
-        if not self._is_cmd_displayed and self._cmd and line:
-            # check if the command is displayed in the line
-            if self._cmd_in_line(pattern, line):
-                self._is_cmd_displayed = True
-                log.trace(f"Command '{self._cmd}' is displayed in the line: {line}")
+    @classmethod
+    def strip_prompt(cls, pattern: Pattern, line: str) -> str:
+        """ Remove the shortest leading prompt matched by pattern from the line """
+        limit = min(len(line), cls._MAX_PROMPT_LEN + 1)
+        for matched in cls._RE_PROMPT_END.finditer(line, 0, limit):
+            index = matched.end()
+            if index >= len(line):
+                break
+            if pattern.match(line, 0, index):
+                return line[index:].lstrip()
+        return line
 
-    def _cmd_in_line(self, pattern: Pattern, line: str = '') -> bool:
-        """check if the line contains cmd"""
+    def match(self, pattern: Pattern, line: str) -> bool:
+        """ Check if the line contains the command echo
 
-        log.trace(f"Line repr = {repr(line)}")
-        log.trace(f"Line escape = {line.encode('unicode_escape').decode('ascii')}")
+        :param pattern: Pattern, the prompt pattern used to remove the prompt from the line
+        :param line: str, the line to check
+        """
+        cmd = self._cmd
+        if cmd in line:
+            return True
 
         # Topsec output extra ' \r' char
         # Fortinet output extra ' \x08' char
-        if self._cmd in re.sub(r'\s[\r\x08]', '', line):
+        if cmd in self._RE_CR_BS_NOISE.sub('', line):
             return True
 
         # Juniper input extra spaces, and the output will remove the extra spaces
-        if self._cmd.replace(' ', '') in re.sub(r'[\x07\s]', '', line):
+        if self._cmd_no_space in self._RE_BELL_SPACES.sub('', line):
             return True
 
         # Fortinet input Chinese and output octal char
-        chinese = simulate_output_oct_to_chinese(output=line, encoding=self._encode)
-        log.trace(f"Line oct to chinese: {repr(chinese)}")
-        if self._cmd in chinese:
+        if self._RE_OCTAL.search(line) and \
+                cmd in simulate_output_oct_to_chinese(output=line, encoding=self._encode):
             return True
 
-        # Line Remove prompt
-        for index in range(1, len(line)):
-            if re.match(pattern, line[:index]):
-                line = line[index:].lstrip()
-                break
-        log.trace(f"Line remove prompt = {repr(line)}")
+        # the checks below need the prompt removed, skip it for lines which can not match
+        if '\ufffd' not in line and '$' not in line:
+            return False
+        line = self.strip_prompt(pattern, line)
 
         # Topsec chinese escape failed, character ignored
         if '\ufffd' in line:
-            line_splits = re.sub(r"(\s\r|\r\n)", '', line).split('\ufffd')
-            log.trace(f"Line split by \\ufffd = {line_splits}")
+            line_splits = self._RE_REPLACED_LINE_BREAK.sub('', line).split('\ufffd')
             for line_split in line_splits:
-                if line_split not in self._cmd:
+                if line_split not in cmd:
                     return False
             return True
 
-        line = simulate_output(line)
-        log.trace(f"Line simulate output = {repr(line)}")
-
-        # Line simulate output remove prompt
-        for index in range(1, len(line)):
-            if re.match(pattern, line[:index]):
-                line = line[index:].lstrip()
-                break
-        log.trace(f"Line simulate output remove prompt = {repr(line)}")
-
         # Array or Cisco display ultra wide processing
-        if '$' in line and line.replace('\x08', '').split('$')[0] in self._cmd:
-            return True
+        if '$' in line:
+            line = self.strip_prompt(pattern, simulate_output(line))
+            if '$' in line and line.replace('\x08', '').split('$')[0] in cmd:
+                return True
 
         return False
-    
+
+
+@functools.lru_cache(maxsize=1024)
+def get_cmd_echo_matcher(cmd: str, encode: str = None) -> CmdEchoMatcher:
+    """ Get the cached command echo matcher of cmd """
+    return CmdEchoMatcher(cmd, encode)
+
+
+class ReadBuffer:
+    """ Read buffer for streaming data from stdout and check whether the pattern matched
+
+    The buffer keeps a streaming line index: every appended chunk is split into complete lines
+    once, and the unfinished tail is kept apart until its line break arrives. Each pattern owns
+    a cursor into that index, so checking several patterns against the same buffer never
+    rescans lines that pattern has already checked.
+    """
+    # complete lines, each one keeps its trailing line break
+    _lines: List[str]
+    # the unfinished last line, which has no line break yet
+    _partial: str
+    # next unchecked position of each pattern: (line index, offset in that line)
+    _cursors: Dict[Pattern, Tuple[int, int]]
+    # next line index to be checked for the command echo
+    _echo_line_pos: int
+    _line_break: str
+    # the previous command that used to make sure the prompt is correct
+    # because the echo "prompt: {cmd}" may be checked as a matched pattern
+    _cmd: str
+    _echo_matcher: "CmdEchoMatcher"
+    _is_cmd_displayed: bool = False
+
+    def __init__(self, cmd: str = '', line_break: str = '\n', encode: str = None) -> None:
+        """ Initialize read buffer """
+        self._lines = []
+        self._partial = ''
+        self._cursors = {}
+        self._echo_line_pos = 0
+        self._line_break = line_break
+        self._cmd = cmd
+        self._is_cmd_displayed = False
+        self._encode = encode
+        self._echo_matcher = get_cmd_echo_matcher(cmd, encode) if cmd else None
+
+    def _check_cmd_displayed(self, pattern: Pattern, line: str = '') -> bool:
+        if not self._is_cmd_displayed and self._cmd and line:
+            # check if the command is displayed in the line
+            if self._echo_matcher.match(pattern, line):
+                self._is_cmd_displayed = True
+
     def _is_real_prompt(self) -> bool:
         if self._cmd:
             return self._is_cmd_displayed
@@ -365,65 +773,453 @@ class ReadBuffer:
         return self.get_data()
 
     def append(self, data: str) -> None:
-        """ Append data to the buffer """
-        if data:
-            self._buffer.append(data)
-    
+        """ Append data to the buffer and index the completed lines """
+        if not data:
+            return
+        line_break = self._line_break
+        if self._partial:
+            # the line break may be split across chunks, so search from the pending tail
+            data = self._partial + data
+            self._partial = ''
+        start = 0
+        lb_pos = data.find(line_break)
+        while lb_pos != -1:
+            end = lb_pos + len(line_break)
+            self._lines.append(data[start:end])
+            start = end
+            lb_pos = data.find(line_break, start)
+        self._partial = data[start:] if start else data
+
     def get_data(self) -> str:
         """ Get the joined data from the buffer """
-        return ''.join(self._buffer)
+        if self._partial:
+            return ''.join(self._lines) + self._partial
+        return ''.join(self._lines)
+
+    def _check_echo(self, pattern: Pattern, line_pos: int) -> None:
+        """ Run the command echo detection once for every complete line up to line_pos """
+        while not self._is_cmd_displayed and self._echo_line_pos <= line_pos:
+            self._check_cmd_displayed(pattern, self._lines[self._echo_line_pos])
+            self._echo_line_pos += 1
 
     def check_pattern(self, pattern: Pattern, is_update_checkpos: bool = True) -> Match:
         """
         Check if the pattern is matched with the unchecked buffer
-        Start from the last checked position, and check each line in the buffer
+        Start from the cursor of the pattern, and check each line in the buffer
 
         :param pattern: Pattern, the pattern to match
-        :param is_update_checkpos: bool, whether to update the last checked position. Set it to False, when you check
-            multiple patterns in the same buffer, such as cisco enable with password prompt
+        :param is_update_checkpos: bool, kept for compatibility. Every pattern has its own cursor, so
+            checking multiple patterns in the same buffer, such as cisco enable with password prompt,
+            does not affect each other any more
         :return: Match object if matched, otherwise None
         """
-        if not self._buffer or len(self._buffer) == 0:
+        if not self._lines and not self._partial:
             return None
 
-        start_index = self._last_line_pos[0]
-        buffer_size = len(self._buffer)
-        line = ''
-        log.trace(f"Checking start from [{self._last_line_pos[0]}][{self._last_line_pos[1]}]")
-        for i in range(start_index, buffer_size):
-            line_start_pos = self._last_line_pos[1] if i == start_index else 0
-            # concat the fist line in current buffer item
-            lb_pos = self._buffer[i].find(self._line_break, line_start_pos)
-            while lb_pos != -1:
-                # found a line break, concat the line
-                line = ''.join([line, self._buffer[i][line_start_pos:lb_pos], self._line_break])
-                self._check_cmd_displayed(pattern, line)
-                line_start_pos = lb_pos + len(self._line_break)
-                log.trace(f"Checking buffer[{i}][:{line_start_pos}]: {line}")
-                matched = pattern.search(line)
-                if matched and self._is_real_prompt():
-                    # if matched, update the last line position
-                    self._last_line_pos = (i, line_start_pos)
-                    return matched
-                else:
-                    # update the last line position if is_update_checkpos is True
-                    if is_update_checkpos:
-                        self._last_line_pos = (i, line_start_pos)
-                # next line start position
-                lb_pos = self._buffer[i].find(self._line_break, line_start_pos)
-                line = ''
-            
-            # no line break found, check the rest of buffer item
-            line = ''.join([line, self._buffer[i][line_start_pos:]])
+        line_pos, offset = self._cursors.get(pattern, (0, 0))
+        line_count = len(self._lines)
+        while line_pos < line_count:
+            line = self._lines[line_pos]
+            if offset:
+                line = line[offset:]
+                offset = 0
+            if self._cmd:
+                self._check_echo(pattern, line_pos)
+            line_pos += 1
+            matched = pattern.search(line)
+            if matched and self._is_real_prompt():
+                self._cursors[pattern] = (line_pos, 0)
+                return matched
+
+        # the unfinished last line will be checked again once more data arrives
+        if len(self._partial) > offset:
+            line = self._partial[offset:]
             self._check_cmd_displayed(pattern, line)
-            line_start_pos += len(line)
-            if i == buffer_size - 1:
-                # if no line break found and no more buffer, check the last line
-                log.trace(f"Checking buffer[{i}][:{line_start_pos}]: {line}")
-                matched = pattern.search(line)
+            matched = pattern.search(line)
+            if matched and self._is_real_prompt():
+                self._cursors[pattern] = (line_count, len(self._partial))
+                return matched
+        self._cursors[pattern] = (line_count, offset)
+        return None
+
+    def _get_last_line_pos(self) -> int:
+        """ Get the index of the last non-blank line, the unfinished line is at len(self._lines) """
+        if self._partial.strip() or not self._lines:
+            return len(self._lines)
+        return len(self._lines) - 1
+
+    def _get_last_line(self) -> str:
+        line_pos = self._get_last_line_pos()
+        return self._partial if line_pos == len(self._lines) else self._lines[line_pos]
+
+    def _has_unchecked(self, pattern: Pattern, literal: str) -> bool:
+        """ Check if the literal is in the lines unchecked by pattern """
+        line_pos, offset = self._cursors.get(pattern, (0, 0))
+        if line_pos < len(self._lines):
+            return literal in ''.join(self._lines[line_pos:]) or literal in self._partial
+        return literal in self._partial[offset:]
+
+    def check_tail_pattern(self, pattern: Pattern) -> Match:
+        """
+        Check if the pattern is matched with the last line, skip the other unchecked lines
+        It is used for the prompts waiting for input, which are always at the end of the output
+
+        :param pattern: Pattern, the pattern to match
+        :return: Match object if matched, otherwise None
+        """
+        if not (self._cmd and not self._is_cmd_displayed):
+            line_pos = self._get_last_line_pos()
+            cursor = self._cursors.get(pattern, (0, 0))
+            if cursor[0] < line_pos:
+                self._cursors[pattern] = (line_pos, 0)
+        return self.check_pattern(pattern)
+
+    def check_learned_prompt(self, prompt: str, pattern: Pattern) -> bool:
+        """
+        Check if the output is completed by the learned prompt
+
+        The learned prompt is the literal prompt of the current mode and vsys, it is compared with the
+        tail of the output first. The pattern runs only when the literal misses: on all the unchecked
+        lines if they contain the literal, otherwise on the last line only, where a changed prompt,
+        such as after a mode switch, shows up.
+
+        :param prompt: str, the literal prompt learned by the session
+        :param pattern: Pattern, the union pattern of all the prompts
+        :return: True if the prompt is matched
+        """
+        if self._cmd and not self._is_cmd_displayed:
+            # the command echo is detected by the full check
+            return self.check_pattern(pattern) is not None
+        if self._get_last_line()[-_PROMPT_TAIL_SIZE:].rstrip().endswith(prompt):
+            return True
+        if self._has_unchecked(pattern, prompt):
+            # the prompt is inside the output, such as followed by a log message
+            return self.check_pattern(pattern) is not None
+        return self.check_tail_pattern(pattern) is not None
+
+
+class PromptSplitter:
+    """ Split the output of pipelined commands on the prompts
+
+    The commands are written ahead without waiting for the prompts, so the output of a command ends
+    at the next prompt. A prompt is found at the start of a line, alone or followed by the echo or
+    the output of the next command: some devices echo the input as it arrives, others as the CLI
+    reads it after the prompt.
+    """
+    # the prompt is expected to end within the first chars of a line
+    _MAX_PROMPT_LEN = 256
+    # a prompt ends after a non-word char, such as '#', '>', ']', '$' or a space
+    _RE_PROMPT_END = re.compile(r'\W')
+
+    def __init__(self, pattern: Pattern, line_break: str = '\n') -> None:
+        """
+        :param pattern: Pattern, the union pattern of all the prompts
+        """
+        self._pattern = pattern
+        self._line_break = line_break
+        # the data not returned yet
+        self._data = ''
+        # next position to check in _data
+        self._pos = 0
+        # whether _pos is at the start of a line
+        self._is_line_start = True
+
+    def _match_prompt(self, start: int, end: int) -> int:
+        """ Get the end of the shortest prompt at start of the line, -1 if no prompt """
+        limit = min(end, start + self._MAX_PROMPT_LEN + 1)
+        for matched in self._RE_PROMPT_END.finditer(self._data, start, limit):
+            if self._pattern.match(self._data, start, matched.end()):
+                return matched.end()
+        return -1
+
+    def feed(self, data: str) -> List[str]:
+        """ Feed the data read from the channel
+
+        :return: the outputs completed by the prompts in the data, each one ends with its prompt
+        """
+        self._data += data
+        outputs = []
+        size = len(self._data)
+        while self._pos < size:
+            lb_pos = self._data.find(self._line_break, self._pos)
+            end = lb_pos if lb_pos != -1 else size
+            prompt_end = self._match_prompt(self._pos, end) if self._is_line_start else -1
+            if prompt_end != -1:
+                outputs.append(self._data[:prompt_end])
+                self._data = self._data[prompt_end:]
+                size = len(self._data)
+                # the rest of the line is the echo or the output of the next command
+                self._pos = 0
+                self._is_line_start = False
+            elif lb_pos == -1:
+                # the unfinished line is checked again once more data arrives
+                break
+            else:
+                self._pos = lb_pos + len(self._line_break)
+                self._is_line_start = True
+        return outputs
+
+    def get_data(self) -> str:
+        """ Get the data after the last prompt """
+        return self._data
+
+
+@functools.lru_cache(maxsize=256)
+def to_bytes_pattern(pattern: Pattern, encode: str = "utf-8") -> Optional[Pattern]:
+    """ Compile the bytes version of a str pattern
+
+    Only ASCII patterns are converted. ASCII chars are encoded to the same single byte in utf-8 and
+    gb18030, but a non-ASCII char in a char class would become several bytes.
+
+    :return: the bytes pattern, or None if the pattern can not be matched on bytes
+    """
+    if not pattern.pattern.isascii():
+        return None
+    try:
+        return re.compile(pattern.pattern.encode("ascii"), pattern.flags & ~re.UNICODE)
+    except re.error:
+        return None
+
+
+class BytesReadBuffer(ReadBuffer):
+    """ Read buffer of raw bytes, used by BytesSSHChannel
+
+    The data is kept in a single bytearray and the cursor of each pattern is a byte offset in it.
+    Lines are matched through memoryview slices without copying. A bytes match is confirmed by
+    decoding the matched line and searching the str pattern, because in gb18030 an ASCII byte may
+    be the trail byte of a multi-byte char. So the returned Match is on str, same as ReadBuffer.
+    Lines are split on b'\\n', which is never a part of a multi-byte char in utf-8 or gb18030.
+    """
+    _data: bytearray
+    _byte_cursors: Dict[Pattern, int]
+    # next byte offset to be checked for the command echo
+    _echo_pos: int
+
+    def __init__(self, cmd: str = '', line_break: str = '\n', encode: str = "utf-8") -> None:
+        super().__init__(cmd=cmd, line_break=line_break, encode=encode)
+        self._data = bytearray()
+        self._byte_cursors = {}
+        self._echo_pos = 0
+        self._byte_line_break = line_break.encode(encode)
+
+    def append(self, data: bytes) -> None:
+        """ Append bytes to the buffer """
+        if data:
+            self._data += data
+
+    def _get_source(self) -> bytearray:
+        """ Get the buffer object holding the data """
+        return self._data
+
+    def get_bytes(self) -> bytearray:
+        """ Get the raw bytes of the buffer """
+        return self._get_source()
+
+    def get_data(self) -> str:
+        """ Get the decoded data from the buffer """
+        return str(self._get_source(), self._encode, 'replace')
+
+    def close(self) -> None:
+        """ Release the resources of the buffer """
+
+    def _decode(self, line: memoryview, final: bool = True) -> str:
+        """ Decode a line, an unfinished line may end with an incomplete multi-byte char """
+        if final:
+            return str(line, self._encode, 'replace')
+        return codecs.getincrementaldecoder(self._encode)(errors='replace').decode(line, final=False)
+
+    def check_pattern(self, pattern: Pattern, is_update_checkpos: bool = True) -> Match:
+        """
+        Check if the pattern is matched with the unchecked buffer, see ReadBuffer.check_pattern
+
+        :param pattern: Pattern, the str pattern to match, must be convertible by to_bytes_pattern
+        :param is_update_checkpos: bool, kept for compatibility
+        :return: Match object on the decoded line if matched, otherwise None
+        """
+        bytes_pattern = to_bytes_pattern(pattern, self._encode)
+        data = self._get_source()
+        size = len(data)
+        pos = self._byte_cursors.get(pattern, 0)
+        if pos >= size:
+            return None
+        line_break = self._byte_line_break
+        with memoryview(data) as view:
+            while pos < size:
+                lb_pos = data.find(line_break, pos)
+                is_complete = lb_pos != -1
+                end = lb_pos + len(line_break) if is_complete else size
+                if self._cmd and not self._is_cmd_displayed and self._echo_pos <= pos:
+                    with view[self._echo_pos:end] as line:
+                        self._check_cmd_displayed(pattern, self._decode(line, is_complete))
+                    if is_complete:
+                        self._echo_pos = end
+                with view[pos:end] as line:
+                    matched = bytes_pattern.search(line) is not None
+                    # confirm the match on the decoded line
+                    matched = matched and pattern.search(self._decode(line, is_complete))
                 if matched and self._is_real_prompt():
-                    # if matched, update the last line position
-                    self._last_line_pos = (i, line_start_pos)
+                    self._byte_cursors[pattern] = end
                     return matched
-        
-        return None
\ No newline at end of file
+                if not is_complete:
+                    # the unfinished last line will be checked again once more data arrives
+                    break
+                pos = end
+        self._byte_cursors[pattern] = pos
+        return None
+
+    def _get_tail(self) -> bytes:
+        data = self._get_source()
+        return bytes(data[max(0, len(data) - _PROMPT_TAIL_SIZE):])
+
+    def check_tail_pattern(self, pattern: Pattern) -> Match:
+        """ Check if the pattern is matched with the last line, see ReadBuffer.check_tail_pattern """
+        if not (self._cmd and not self._is_cmd_displayed):
+            data = self._get_source()
+            tail = self._get_tail()
+            content_end = len(data) - (len(tail) - len(tail.rstrip()))
+            pos = self._byte_cursors.get(pattern, 0)
+            lb_pos = data.rfind(self._byte_line_break, pos, content_end)
+            if lb_pos != -1:
+                self._byte_cursors[pattern] = lb_pos + len(self._byte_line_break)
+        return self.check_pattern(pattern)
+
+    def check_learned_prompt(self, prompt: str, pattern: Pattern) -> bool:
+        """ Check if the output is completed by the learned prompt, see ReadBuffer.check_learned_prompt """
+        if self._cmd and not self._is_cmd_displayed:
+            return self.check_pattern(pattern) is not None
+        literal = prompt.encode(self._encode, 'replace')
+        if self._get_tail().rstrip().endswith(literal):
+            return True
+        if self._get_source().find(literal, self._byte_cursors.get(pattern, 0)) != -1:
+            return self.check_pattern(pattern) is not None
+        return self.check_tail_pattern(pattern) is not None
+
+
+class ReadBufferBudget:
+    """ Global memory budget of the SpillReadBuffers (Singleton)
+
+    Tracks the bytes held in memory by all the spillable read buffers. Once the total exceeds the
+    limit, the largest buffers are spilled to temp files first, until the total is under the limit.
+    """
+    _instance = None
+    _limit: int
+    _in_memory: int
+    # in-memory size and weak reference of each buffer, keyed by id
+    _sizes: Dict[int, int]
+    _refs: Dict[int, weakref.ref]
+
+    def __new__(cls, limit: int = None) -> "ReadBufferBudget":
+        if not cls._instance:
+            log.info("Creating ReadBufferBudget instance")
+            cls._instance = super(ReadBufferBudget, cls).__new__(cls)
+            cls._instance._limit = limit or _DEFAULT_READ_BUFFER_MEMORY_LIMIT
+            cls._instance._in_memory = 0
+            cls._instance._sizes = {}
+            cls._instance._refs = {}
+        return cls._instance
+
+    @property
+    def in_memory(self) -> int:
+        return self._in_memory
+
+    def register(self, buffer: "SpillReadBuffer") -> None:
+        """ Track a buffer, it is forgotten when released or garbage collected """
+        key = id(buffer)
+        self._sizes[key] = 0
+        self._refs[key] = weakref.ref(buffer)
+        weakref.finalize(buffer, self._forget, key)
+
+    def grow(self, buffer: "SpillReadBuffer", size: int) -> None:
+        """ Record the growth of an in-memory buffer, and spill buffers if over the limit """
+        key = id(buffer)
+        if key not in self._sizes:
+            return
+        self._sizes[key] += size
+        self._in_memory += size
+        if self._in_memory <= self._limit:
+            return
+        for key in sorted(self._sizes, key=self._sizes.get, reverse=True):
+            largest = self._refs[key]()
+            if largest is not None:
+                largest.spill()
+            if self._in_memory <= self._limit:
+                break
+
+    def release(self, buffer: "SpillReadBuffer") -> None:
+        """ Release the memory recorded for a buffer, after spilled or closed """
+        self._forget(id(buffer))
+
+    def _forget(self, key: int) -> None:
+        self._in_memory -= self._sizes.pop(key, 0)
+        self._refs.pop(key, None)
+
+
+class SpillReadBuffer(BytesReadBuffer):
+    """ Bytes read buffer that spills to a temp file
+
+    The buffer is kept in memory until it exceeds the spill threshold of the session, or the
+    ReadBufferBudget asks it to spill. Then the data is moved to a temp file, the following chunks
+    are appended to the file, and the pattern checks and the response read it back through mmap.
+    """
+    _file: Optional[tempfile.TemporaryFile]
+    _mmap: Optional[mmap.mmap]
+    _file_size: int
+
+    def __init__(self, cmd: str = '', line_break: str = '\n', encode: str = "utf-8",
+                 spill_threshold: int = _DEFAULT_SPILL_THRESHOLD) -> None:
+        super().__init__(cmd=cmd, line_break=line_break, encode=encode)
+        self._spill_threshold = spill_threshold
+        self._file = None
+        self._mmap = None
+        self._file_size = 0
+        self._budget = ReadBufferBudget()
+        self._budget.register(self)
+
+    @property
+    def is_spilled(self) -> bool:
+        return self._file is not None
+
+    def append(self, data: bytes) -> None:
+        """ Append bytes to the memory or the temp file """
+        if not data:
+            return
+        if self._file:
+            self._file.write(data)
+            self._file_size += len(data)
+            return
+        self._data += data
+        self._budget.grow(self, len(data))
+        if not self._file and len(self._data) > self._spill_threshold:
+            self.spill()
+
+    def spill(self) -> None:
+        """ Move the in-memory data to a temp file """
+        if self._file:
+            return
+        log.debug(f"Spill read buffer of {len(self._data)} bytes to temp file")
+        self._file = tempfile.TemporaryFile()
+        self._file.write(self._data)
+        self._file_size = len(self._data)
+        self._data = bytearray()
+        self._budget.release(self)
+
+    def _get_source(self) -> bytearray | mmap.mmap:
+        if not self._file:
+            return self._data
+        if self._mmap is None or len(self._mmap) != self._file_size:
+            # remap to cover the appended data
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), self._file_size, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self) -> None:
+        """ Close the temp file and release the memory budget """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file:
+            self._file.close()
+        self._data = bytearray()
+        self._budget.release(self)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+from dataclasses import dataclass
+from re import Pattern
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Optional, Tuple
+
+from netdriver_core.dev.mode import Mode
+from netdriver_core.log import logman
+
+
+log = logman.logger
+
+# getters of the session compiled into the pattern set, and the field of each one
+PATTERN_GETTERS = {
+    "get_union_pattern": "union",
+    "get_mode_prompt_patterns": "mode_prompts",
+    "get_more_pattern": "more",
+    "get_error_patterns": "errors",
+    "get_ignore_error_patterns": "ignore_errors",
+    "get_auto_confirm_patterns": "auto_confirms",
+    "get_enable_password_prompt_pattern": "enable_password_prompt",
+    "get_ignore_password_change_patterns": "ignore_password_change",
+}
+# the flags can be scoped to a group of the merged pattern
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+# a back reference by group number, which is shifted by the groups of the merged pattern
+_NUMBERED_REF = re.compile(r"\\[1-9]|\(\?P=\d")
+
+
+@dataclass(frozen=True)
+class PatternSet:
+    """ Compiled patterns of a plugin class, shared by all its sessions
+
+    The error patterns and the ignore error patterns are each merged into a single alternation
+    with a named group per pattern, so the output is scanned once rather than once per pattern.
+    """
+    union: Optional[Pattern]
+    mode_prompts: Mapping[Mode, Pattern]
+    more: Tuple[Optional[Pattern], str]
+    errors: Tuple[Pattern, ...]
+    ignore_errors: Tuple[Pattern, ...]
+    auto_confirms: Mapping[Pattern, str]
+    enable_password_prompt: Optional[Pattern]
+    ignore_password_change: Mapping[Pattern, str]
+
+    @classmethod
+    def compile(cls, getters: Mapping[str, Callable[[], Any]]) -> "PatternSet":
+        """ Compile the pattern set by the getters of PATTERN_GETTERS
+
+        :raises NotImplementedError: if a getter is not implemented
+        """
+        values = {field: getters[name]() for name, field in PATTERN_GETTERS.items()}
+        return cls(
+            union=values["union"],
+            mode_prompts=MappingProxyType(dict(values["mode_prompts"] or {})),
+            more=tuple(values["more"]),
+            errors=merge_patterns(values["errors"] or [], "error"),
+            ignore_errors=merge_patterns(values["ignore_errors"] or [], "ignore"),
+            auto_confirms=MappingProxyType(dict(values["auto_confirms"] or {})),
+            enable_password_prompt=values["enable_password_prompt"],
+            ignore_password_change=MappingProxyType(dict(values["ignore_password_change"] or {})),
+        )
+
+
+def merge_patterns(patterns: Iterable[Pattern], prefix: str) -> Tuple[Pattern, ...]:
+    """ Merge the patterns into one alternation, the group {prefix}{i} is the pattern i
+
+    At a position of the text, the alternation prefers the pattern listed first. The patterns are
+    kept apart if they can not be merged, e.g. a group name is defined by two of them, or a pattern
+    refers to a group by number.
+    """
+    patterns = tuple(patterns)
+    if len(patterns) < 2:
+        return patterns
+    scoped = re.UNICODE | sum(flag for flag, _ in _SCOPED_FLAGS)
+    if any(pattern.flags & ~scoped or _NUMBERED_REF.search(pattern.pattern) for pattern in patterns):
+        return patterns
+    groups = []
+    for i, pattern in enumerate(patterns):
+        flags = "".join(flag_str for flag, flag_str in _SCOPED_FLAGS if pattern.flags & flag)
+        regex = f"(?{flags}:{pattern.pattern})" if flags else pattern.pattern
+        groups.append(f"(?P<{prefix}{i}>{regex})")
+    try:
+        return (re.compile("|".join(groups)),)
+    except re.error as e:
+        log.warning(f"Can not merge the {prefix} patterns, keep them apart: {e}")
+        return patterns
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import asyncio
-from typing import Dict, Optional
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 from pydantic import IPvAnyAddress
-from tabulate import tabulate
 from dependency_injector.providers import Configuration
 from netdriver_agent.client.session import Session, gen_session_key
+from netdriver_core.dev.mode import Mode
 from netdriver_core.exception.errors import PluginNotFound, SessionInitFailed
 from netdriver_core.log import logman
 from netdriver_agent.plugins.engine import PluginEngine
@@ -13,6 +16,49 @@ from netdriver_agent.plugins.engine import PluginEngine
 
 log = logman.logger
 
+_DEFAULT_PREWARM_CONCURRENCY = 8
+_DEFAULT_CLEANUP_CONCURRENCY = 32
+_DEFAULT_ALIVE_CHECK_INTERVAL = 300
+
+
+class PrewarmProgress:
+    """ Progress of the sessions pre-warmed since the agent started """
+    total: int
+    created: int
+    failed: int
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.created = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.created - self.failed
+
+    def __str__(self) -> str:
+        return f"{self.created} created, {self.failed} failed, {self.pending} pending of {self.total}"
+
+
+class PoolStats:
+    """ Aggregated status of the sessions in the pool """
+    devices: int
+    sessions: int
+    busy: int
+    queued: int
+    scheduled: int
+
+    def __init__(self) -> None:
+        self.devices = 0
+        self.sessions = 0
+        self.busy = 0
+        self.queued = 0
+        self.scheduled = 0
+
+    def __str__(self) -> str:
+        return (f"{self.sessions} sessions of {self.devices} devices, {self.busy} busy, "
+                f"{self.queued} tasks queued, {self.scheduled} checks scheduled")
+
 
 class SessionPool:
     """Session Manager Singleton Class
@@ -26,13 +72,35 @@ class SessionPool:
     - _key_locks: one independent lock per session key
     - Connection creation for device A does not block requests for device B
     - Serialization only occurs on the same key, avoiding duplicate creation and connection leaks
+
+    A device key may hold up to sessions_per_device sessions of the session profile, each over its
+    own connection and closed on its own. A request runs on the idle session already in its vsys
+    and mode, or another idle one, a new session is opened while all are busy, then the session
+    with the shortest queue is used.
+
+    The sessions are checked by a heap of their next check time, the earliest time they may
+    exceed the max idle time or expire, or session.alive_check_interval for a broken connection.
+    Each check_interval only the sessions due are checked, and closed with at most
+    session.cleanup_concurrency at a time.
     """
 
     _instance = None
-    _pool: Dict[str, Session] = {}
+    _pool: Dict[str, List[Session]] = {}
     _key_locks: Dict[str, asyncio.Lock]
     _check_interval: float
     _config: Optional[Configuration]
+    # the devices kept warm, their sessions are created again once closed
+    _hot_devices: Dict[str, Dict[str, Any]]
+    # the session keys being pre-warmed, and the tasks to keep them referenced
+    _prewarming: Set[str]
+    _prewarm_tasks: Set[asyncio.Task]
+    _prewarm_semaphore: asyncio.Semaphore
+    _prewarm_progress: PrewarmProgress
+    # (next check time, sequence, session), the sessions no more in the pool are skipped when due
+    _check_heap: List[Tuple[float, int, Session]]
+    _check_sequence: itertools.count
+    _alive_check_interval: float
+    _cleanup_semaphore: asyncio.Semaphore
 
     def __new__(cls, config: Configuration | None = None) -> "SessionPool":
 
@@ -43,6 +111,18 @@ class SessionPool:
             cls._instance._key_locks = {}
             cls._instance._config = config
             cls._instance._check_interval = config.session.check_interval() or 30
+            cls._instance._hot_devices = {}
+            cls._instance._prewarming = set()
+            cls._instance._prewarm_tasks = set()
+            cls._instance._prewarm_semaphore = asyncio.Semaphore(
+                config.session.prewarm.concurrency() or _DEFAULT_PREWARM_CONCURRENCY)
+            cls._instance._prewarm_progress = PrewarmProgress()
+            cls._instance._check_heap = []
+            cls._instance._check_sequence = itertools.count()
+            cls._instance._alive_check_interval = (config.session.alive_check_interval()
+                                                   or _DEFAULT_ALIVE_CHECK_INTERVAL)
+            cls._instance._cleanup_semaphore = asyncio.Semaphore(
+                config.session.cleanup_concurrency() or _DEFAULT_CLEANUP_CONCURRENCY)
             asyncio.create_task(
                 cls._instance.monitor_sessions(), name="SessionPoolMonitor"
             )
@@ -58,25 +138,71 @@ class SessionPool:
         if lock and not lock.locked() and session_key not in self._pool:
             del self._key_locks[session_key]
 
-    async def _get_session_by_key(self, session_key: str) -> Optional[Session]:
-        session = self._pool.get(session_key)
-        if session:
-            close_reason = None
-            if not await session.is_alive():
-                close_reason = "not alive"
-            elif session.check_expiration_time():
-                close_reason = "expired"
-            elif session.check_idle_time():
-                close_reason = "idle timeout"
+    async def _get_sessions_by_key(self, session_key: str) -> List[Session]:
+        """ Get the alive sessions of the key, the others are closed and removed one by one. The sessions
+        still initializing are returned without waiting for them, they are checked once initialized
+        """
+        sessions = []
+        for session in list(self._pool.get(session_key, [])):
+            if not session._init_task_done.done():
+                sessions.append(session)
+                continue
+            close_reason = await self._get_close_reason(session)
             if close_reason:
                 await self._handle_closed_session(session)
-                log.info(f"Session {session_key} is {close_reason}, removed from pool.")
-                return None
-            log.debug(f"Got alive session by key: {session_key}")
-            return session
+                log.info(f"Session {session_key}#{session.member} is {close_reason}, removed from pool.")
+            else:
+                sessions.append(session)
+        if sessions:
+            log.debug(f"Got {len(sessions)} alive sessions by key: {session_key}")
         else:
             log.debug(f"No session found by key: {session_key}")
+        return sessions
+
+    @staticmethod
+    async def _get_close_reason(session: Session) -> Optional[str]:
+        """ Get the reason to close the session, None if it is kept """
+        if not await session.is_alive():
+            return "not alive"
+        if session.check_expiration_time():
+            return "expired"
+        if session.check_idle_time():
+            return "idle timeout"
+        return None
+
+    @staticmethod
+    def _select_session(sessions: List[Session], vsys: Optional[str] = None,
+                        mode: Optional[Mode] = None) -> Optional[Session]:
+        """ Select the session to run a request, None if a new session should be opened
+
+        The idle session in the vsys and mode runs the request without switching, then any idle
+        session. Once all the initialized ones are busy, a session still initializing and not used
+        yet is taken rather than opening another, then a new session is opened below
+        sessions_per_device, otherwise the session with the shortest queue is used.
+        """
+        if not sessions:
+            return None
+        idle = [session for session in sessions if session._init_task_done.done() and session.is_idle]
+        for session in idle:
+            if session.is_in(vsys, mode):
+                return session
+        if idle:
+            return idle[0]
+        for session in sessions:
+            if not session._init_task_done.done() and session.is_idle:
+                return session
+        if len(sessions) < sessions[0].sessions_per_device:
             return None
+        return min(sessions, key=lambda session: session.load)
+
+    def find_session(self, protocol: str, username: str, ip: IPvAnyAddress, port: int) -> Optional[Session]:
+        """ Find the first session in the pool by the session key, without checking or creating it """
+        sessions = self.find_sessions(protocol, username, ip, port)
+        return sessions[0] if sessions else None
+
+    def find_sessions(self, protocol: str, username: str, ip: IPvAnyAddress, port: int) -> List[Session]:
+        """ Find all the sessions in the pool by the session key, without checking or creating them """
+        return list(self._pool.get(gen_session_key(protocol, username, ip, port), []))
 
     async def get_session(
         self,
@@ -90,11 +216,14 @@ class SessionPool:
         enable_password: Optional[str] = "",
         version: str = "base",
         encode: str = "utf-8",
+        vsys: Optional[str] = None,
+        mode: Optional[Mode] = None,
         **kwargs: dict,
     ) -> Optional[Session]:
         """
         Get or create a session. Uses per-key lock to prevent duplicate creation
         for the same key, while different keys run fully in parallel without blocking.
+        The session of the key is selected by vsys and mode and the queue size.
 
         :param protocol: protocol, default is ssh
         :param ip: ipv4 or ipv6 address
@@ -104,6 +233,8 @@ class SessionPool:
         :param enable_password: enable password, only for cisco, arista..
         :param vendor: vendor of device, e.g. cisco, huawei
         :param model: model of device, e.g. asa, ios
+        :param vsys: vsys of the request, the session already in it is preferred
+        :param mode: mode of the request, the session already in it is preferred
         :param args: other args
         :param kwargs: other kwargs
 
@@ -128,16 +259,16 @@ class SessionPool:
 
         session_key = gen_session_key(protocol, username, ip, port)
 
-        _session = await self._get_session_by_key(session_key)
+        _sessions = await self._get_sessions_by_key(session_key)
 
-        if _session and not _session.is_same(
+        if _sessions and not _sessions[0].is_same(
             vendor, model, version, password, enable_password, encode
         ):
             log.warning(f"Session {session_key} is not same, try to remove it.")
-            if _session.is_idle is True:
+            if all(_session.is_idle is True for _session in _sessions):
                 log.warning(f"Session {session_key} is idle, close and regenerate it.")
-                await self._handle_closed_session(_session)
-                _session = None
+                await asyncio.gather(*[self._handle_closed_session(_session) for _session in _sessions])
+                _sessions = []
             else:
                 log.warning(
                     f"Session {session_key} is not idle, raise SessionInitFailed."
@@ -148,19 +279,21 @@ class SessionPool:
                     + "parameters and try again!"
                 )
 
+        _session = self._select_session(_sessions, vsys, mode)
         if _session:
-            log.info(f"Got session by key: {session_key}")
-            return _session
+            log.info(f"Got session by key: {session_key}#{_session.member}")
+            return await self._wait_for_init(_session)
 
         key_lock = self._get_key_lock(session_key)
         async with key_lock:
             # Double-check: re-verify after acquiring the lock, as another coroutine may have already created it
-            _session = self._pool.get(session_key)
+            _sessions = self._pool.get(session_key, [])
+            _session = self._select_session(_sessions, vsys, mode)
             if _session:
                 log.info(
-                    f"Session {session_key} created by another coroutine, reuse it."
+                    f"Session {session_key}#{_session.member} created by another coroutine, reuse it."
                 )
-                return _session
+                return await self._wait_for_init(_session)
 
             session_clz: Session = PluginEngine().get_plugin(vendor, model, version)
             if not session_clz:
@@ -183,68 +316,184 @@ class SessionPool:
                 config=self._config,
                 **kwargs,
             )
-            self._pool[_session.session_key] = _session
+            members = {session.member for session in _sessions}
+            _session.member = next(i for i in range(len(_sessions) + 1) if i not in members)
+            if _sessions:
+                # a write on any session of the device invalidates the cached outputs
+                _session._result_cache = _sessions[0]._result_cache
+            self._pool.setdefault(session_key, []).append(_session)
+            self._schedule_check(_session)
 
-        log.info(f"Session {_session.session_key} added to pool.")
+        log.info(f"Session {_session.session_key}#{_session.member} added to pool.")
         self._cleanup_key_lock(session_key)
 
-        log.info(
-            f"Waiting for session {_session.session_key} initialization to complete."
-        )
-        await _session._init_task_done
-        if _session._init_task.exception():
+        await self._wait_for_init(_session)
+        log.info(f"Created new session for: {_session.session_key}")
+        return _session
+
+    async def _wait_for_init(self, session: Session) -> Session:
+        """ Wait for the session to be initialized, the session failed to log in is removed and its
+        error is raised to every request waiting for it, as no consumer runs the commands queued on it
+        """
+        if not session._init_task_done.done():
+            log.info(
+                f"Waiting for session {session.session_key}#{session.member} initialization to complete."
+            )
+            await session._init_task_done
+        if session._init_task.exception():
             log.error(
-                f"Session initialization failed: {_session._init_task.exception()}"
+                f"Session initialization failed: {session._init_task.exception()}"
             )
-            self._pool.pop(_session.session_key, None)
-            self._cleanup_key_lock(session_key)
-            raise _session._init_task.exception()
+            self._remove_session(session)
+            raise session._init_task.exception()
+        return session
 
-        log.info(f"Created new session for: {_session.session_key}")
-        return _session
+    @property
+    def prewarm_progress(self) -> PrewarmProgress:
+        return self._prewarm_progress
 
-    async def _handle_closed_session(self, session: Session):
-        log.debug(f"Removing {session.session_key} from pool and closing it.")
+    def prewarm(self, devices: List[Dict[str, Any]]) -> PrewarmProgress:
+        """
+        Create the sessions of the devices in the background, so the first request to a device
+        does not wait for the login. At most session.prewarm.concurrency sessions are created at
+        a time, the failures are logged and counted in the progress.
+
+        :param devices: the parameters of get_session for each device, and hot: bool, whether to
+            keep the session warm, it is created again once closed by idle timeout, expiration or
+            a broken connection
+        :return: the progress of all the pre-warming since the agent started
+        """
+        for device in devices:
+            device = dict(device)
+            hot = device.pop("hot", False)
+            session_key = gen_session_key(device.get("protocol", "ssh"), device.get("username"),
+                                          device.get("ip"), device.get("port", 22))
+            if hot:
+                self._hot_devices[session_key] = device
+            self._start_prewarm(session_key, device)
+        return self._prewarm_progress
+
+    def _start_prewarm(self, session_key: str, device: Dict[str, Any]) -> None:
+        if session_key in self._prewarming:
+            return
+        self._prewarming.add(session_key)
+        self._prewarm_progress.total += 1
+        task = asyncio.create_task(self._prewarm_session(session_key, device),
+                                   name=f"{session_key}_prewarm")
+        self._prewarm_tasks.add(task)
+        task.add_done_callback(self._prewarm_tasks.discard)
+
+    async def _prewarm_session(self, session_key: str, device: Dict[str, Any]) -> None:
         try:
+            async with self._prewarm_semaphore:
+                await self.get_session(**device)
+            self._prewarm_progress.created += 1
+        except Exception as e:
+            self._prewarm_progress.failed += 1
+            log.warning(f"Pre-warm session {session_key} failed: {e}")
+        finally:
+            self._prewarming.discard(session_key)
+        log.info(f"Pre-warm session {session_key} done, progress: {self._prewarm_progress}")
+
+    def _refill_hot_sessions(self) -> None:
+        """ Create the sessions of the hot devices again once all their sessions are removed from the
+        pool. The liveness is not checked here, the broken sessions are removed when due for a check
+        """
+        for session_key, device in list(self._hot_devices.items()):
+            if session_key not in self._prewarming and not self._pool.get(session_key):
+                log.info(f"Session {session_key} of hot device is gone, pre-warm it again.")
+                self._start_prewarm(session_key, device)
+
+    def _remove_session(self, session: Session) -> None:
+        """ Remove the session from the sessions of its key, the other sessions are kept """
+        sessions = self._pool.get(session.session_key, [])
+        if session in sessions:
+            sessions.remove(session)
+        if not sessions:
             self._pool.pop(session.session_key, None)
-            self._cleanup_key_lock(session.session_key)
+        self._cleanup_key_lock(session.session_key)
+
+    async def _handle_closed_session(self, session: Session):
+        log.debug(f"Removing {session.session_key}#{session.member} from pool and closing it.")
+        try:
+            self._remove_session(session)
             await asyncio.wait_for(session.close(), timeout=1)
         except Exception as e:
             log.error(f"Error closing session {session.session_key}: {e}")
 
+    def _schedule_check(self, session: Session) -> None:
+        """ Schedule the next check of the session, at most alive_check_interval later """
+        now = time.time()
+        check_time = now + self._alive_check_interval
+        if session._init_task_done.done():
+            check_time = min(check_time, session.get_next_check_time() or check_time)
+        else:
+            # the times are not known before the session is initialized
+            check_time = now + self._check_interval
+        heapq.heappush(self._check_heap, (check_time, next(self._check_sequence), session))
+
+    async def _check_session(self, session: Session) -> None:
+        async with self._cleanup_semaphore:
+            if not session._init_task_done.done():
+                self._schedule_check(session)
+                return
+            close_reason = await self._get_close_reason(session)
+            if close_reason:
+                await self._handle_closed_session(session)
+                log.info(f"Session {session.session_key}#{session.member} is {close_reason}, removed from pool.")
+            else:
+                self._schedule_check(session)
+
+    async def _check_due_sessions(self) -> None:
+        """ Check the sessions due, the expired ones are closed concurrently """
+        now = time.time()
+        due = []
+        while self._check_heap and self._check_heap[0][0] <= now:
+            _, _, session = heapq.heappop(self._check_heap)
+            if session in self._pool.get(session.session_key, []):
+                due.append(session)
+        if due:
+            log.info(f"Checking {len(due)} sessions due.")
+            await asyncio.gather(*[self._check_session(session) for session in due])
+
+    def get_stats(self) -> PoolStats:
+        """ Get the aggregated status of the sessions, without waiting for any session """
+        stats = PoolStats()
+        stats.devices = len(self._pool)
+        for sessions in self._pool.values():
+            for session in sessions:
+                stats.sessions += 1
+                stats.busy += 0 if session.is_idle else 1
+                stats.queued += session.load
+        stats.scheduled = len(self._check_heap)
+        return stats
+
+    async def list_sessions(self, offset: int = 0, limit: int = 100) -> Tuple[int, List[List[Any]]]:
+        """ List a page of the sessions by the order added to the pool
+
+        :return: the total number of the sessions, and the display info of the page, see
+            Session.get_info_headers
+        """
+        sessions = [session for members in list(self._pool.values()) for session in members]
+        page = sessions[offset:offset + limit]
+        return len(sessions), list(await asyncio.gather(*[session.get_display_info() for session in page]))
+
     async def close_all(self):
+        for task in list(self._prewarm_tasks):
+            task.cancel()
+        self._hot_devices.clear()
         await asyncio.gather(
             *[
                 self._handle_closed_session(session)
-                for session in list(self._pool.values())
+                for sessions in list(self._pool.values())
+                for session in list(sessions)
             ]
         )
         self._key_locks.clear()
 
-    async def _display_sessions_info(self):
-        """Display session information in a table."""
-        table = []
-        for session in self._pool.values():
-            table.append(await session.get_display_info())
-        log.info(
-            "\n########## Session Pool Status ########## \n"
-            + tabulate(
-                table,
-                headers=Session.get_info_headers(),
-            )
-        )
-
-    async def _remove_closed_sessions(self):
-        # list() is used to avoid RuntimeError: dictionary changed size during iteration
-        log.info("Start removing closed sessions from pool.")
-        for session_key in list(self._pool):
-            session = self._pool.get(session_key)
-            if session and not await session.is_alive():
-                await self._handle_closed_session(session)
-        log.info("Finished removing closed sessions from pool.")
-
     async def monitor_sessions(self) -> None:
         while True:
             await asyncio.sleep(self._check_interval)
-            await self._display_sessions_info()
-            await self._remove_closed_sessions()
+            log.info(f"Session pool status: {self.get_stats()}")
+            await self._check_due_sessions()
+            self._refill_hot_sessions()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+from typing import Any, Dict
+
+from netdriver_core.log import logman
+
+
+log = logman.logger
+
+
+class DeviceProfileCache:
+    """ On-disk cache of what a session learned about a device (Singleton)
+
+    Keyed by the session key, each entry keeps the SSH algorithms negotiated with the device and
+    the prompt shown after login. A new session of the device offers the proven algorithms first,
+    and decides the init mode from the banner if it ends with the cached prompt, instead of probing
+    the prompt again. The entries are hints only, a stale entry costs nothing but the probe.
+    """
+    _instance = None
+    _path: str
+    _entries: Dict[str, Dict[str, Any]]
+
+    def __new__(cls, path: str = None) -> "DeviceProfileCache":
+        if not cls._instance:
+            log.info("Creating DeviceProfileCache instance")
+            cls._instance = super(DeviceProfileCache, cls).__new__(cls)
+            cls._instance._path = path
+            cls._instance._entries = cls._instance._load()
+        return cls._instance
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self._path or not os.path.exists(self._path):
+            return {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError) as e:
+            log.warning(f"Load device profile cache {self._path} failed, start with empty cache: {e}")
+            return {}
+
+    def _save(self) -> None:
+        """ Write the cache to a temp file and then rename it, so a crash never leaves a broken file """
+        if not self._path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            tmp_path = f"{self._path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            log.warning(f"Save device profile cache {self._path} failed: {e}")
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """ Get the cached profile of the device, empty if unknown """
+        return dict(self._entries.get(key, {}))
+
+    def update(self, key: str, **fields: Any) -> None:
+        """ Merge the fields into the cached profile, the None fields are unknown and skipped
+
+        The file is written only if the profile changed, so a known device costs no write.
+        """
+        entry = self._entries.get(key, {})
+        changed = {k: v for k, v in fields.items() if v is not None and entry.get(k) != v}
+        if not changed:
+            return
+        self._entries[key] = {**entry, **changed, "update_time": time.time()}
+        self._save()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Tuple
+
+
+class FlightRecorder:
+    """ Ring buffer of the recent I/O of a channel
+
+    The hot path only appends the chunk as it is read or written, with the timestamp and the
+    direction, no string is formatted. Once the total size exceeds the capacity, the oldest records
+    are dropped, so the memory of a session is bounded. The records are formatted by dump, when a
+    task fails or an operator asks for them.
+    """
+    READ = "<<<"
+    WRITE = ">>>"
+    EXEC = "$$$"
+    # recorded instead of the data of a secret write, e.g. a password
+    SECRET = "<secret>"
+
+    def __init__(self, capacity: int = 65536) -> None:
+        """
+        :param capacity: int, max size of the kept records (unit: bytes, or chars for the str
+            chunks), 0 disables the recorder
+        """
+        self._capacity = capacity
+        self._records: Deque[Tuple[float, str, str | bytes]] = deque()
+        self._size = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def record(self, direction: str, data: str | bytes) -> None:
+        """ Record a chunk, a chunk larger than the capacity keeps only its tail """
+        if not data or not self._capacity:
+            return
+        if len(data) > self._capacity:
+            data = data[-self._capacity:]
+        self._records.append((time.time(), direction, data))
+        self._size += len(data)
+        while self._size > self._capacity:
+            self._size -= len(self._records.popleft()[2])
+
+    def records(self) -> List[Tuple[float, str, str | bytes]]:
+        """ Get the records from the oldest, each one is (timestamp, direction, data) """
+        return list(self._records)
+
+    def dump(self) -> str:
+        """ Format the records from the oldest, the data is escaped to show the control chars """
+        return "\n".join(
+            f"{datetime.fromtimestamp(ts).strftime('%H:%M:%S.%f')[:-3]} {direction} {data!r}"
+            for ts, direction, data in self._records)
+
+    def clear(self) -> None:
+        self._records.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
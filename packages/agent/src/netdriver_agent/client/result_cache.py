@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import time
+from re import Pattern
+from typing import Dict, List, Optional, Tuple
+
+from netdriver_core.dev.mode import Mode
+from netdriver_core.log import logman
+
+
+log = logman.logger
+
+# key of a cached output: (vsys, mode, command)
+CacheKey = Tuple[Optional[str], Optional[Mode], str]
+
+
+class ResultCache:
+    """ Cache of the outputs of the read-only commands of a device, shared by the shells of the session
+
+    The ttl of a command is the ttl of the first pattern of the session profile that fully matches it,
+    the commands match no pattern are not cached. An output expires after its ttl, and all the outputs
+    are invalidated once the config of the device may change.
+    """
+    _ttls: List[Tuple[Pattern, float]]
+    _entries: Dict[CacheKey, Tuple[float, str]]
+
+    def __init__(self, ttls: Dict[str, float] = None) -> None:
+        """
+        :param ttls: dict, the ttl (unit: seconds) by the pattern of the commands
+        """
+        self._ttls = []
+        for pattern, ttl in (ttls or {}).items():
+            try:
+                self._ttls.append((re.compile(pattern), float(ttl)))
+            except re.error as e:
+                log.warning(f"Invalid result cache pattern [{pattern}] ignored: {e}")
+        self._entries = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._ttls)
+
+    def ttl_of(self, command: str) -> float:
+        """ Get the ttl of the command, 0 if it is not cached """
+        command = command.strip()
+        for pattern, ttl in self._ttls:
+            if pattern.fullmatch(command):
+                return ttl
+        return 0
+
+    def get(self, key: CacheKey) -> Optional[Tuple[str, float]]:
+        """ Get the cached output and its age (unit: seconds), None if not cached or expired """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.time() - entry[0]
+        if age > self.ttl_of(key[2]):
+            del self._entries[key]
+            return None
+        return entry[1], age
+
+    def put(self, key: CacheKey, output: str) -> None:
+        ttl = self.ttl_of(key[2])
+        if ttl <= 0:
+            return
+        now = time.time()
+        # the expired outputs of the commands not run again are dropped here
+        for expired in [k for k, (ts, _) in self._entries.items() if now - ts > self.ttl_of(k[2])]:
+            del self._entries[expired]
+        self._entries[key] = (now, output)
+
+    def invalidate(self) -> None:
+        """ Drop all the cached outputs """
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
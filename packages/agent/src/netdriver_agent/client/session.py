@@ -3,22 +3,28 @@
 
 import abc
 import asyncio
-from datetime import datetime
+import math
+import re
+import time
+from datetime import date, datetime, timedelta
 from re import Pattern
 from typing import Dict, Optional, List, Any, Tuple
 
-from asyncio import CancelledError, Queue, QueueFull, get_event_loop
+from asyncio import CancelledError, QueueFull, get_event_loop
 from asgi_correlation_id import correlation_id
-from asyncssh import PermissionDenied
+from asyncssh import ChannelOpenError, PermissionDenied
 from dependency_injector.providers import Configuration
 from pydantic import IPvAnyAddress
 
 from netdriver_core import utils
-from netdriver_agent.client.channel import DEFAULT_SESSION_PROFILE, Channel, ReadBuffer
+from netdriver_agent.client.channel import DEFAULT_SESSION_PROFILE, Channel, PromptSplitter, ReadBuffer
+from netdriver_agent.client.profile_cache import DeviceProfileCache
+from netdriver_agent.client.result_cache import CacheKey, ResultCache
 from netdriver_core.dev.mode import Mode
-from netdriver_agent.client.task import CmdTask, CmdTaskResult
-from netdriver_core.exception.errors import (ConnectTimeout, ExecCmdError, ExecCmdTimeout, ExecError, GetPromptFailed,
-    LoginFailed, QueueFullError, SessionInitFailed)
+from netdriver_agent.client.task import BatchTask, CmdTask, CmdTaskResult, Priority, Task
+from netdriver_agent.client.task_queue import QueueTimeStats, TaskQueue
+from netdriver_core.exception.errors import (ChannelError, ConnectTimeout, DeadlineExceeded, ExecCmdError,
+    ExecCmdTimeout, ExecError, GetPromptFailed, LoginFailed, QueueFullError, SessionInitFailed)
 from netdriver_core.log.logman import create_session_logger
 from netdriver_core.utils.asyncu import AsyncTimeoutError, async_timeout
 
@@ -44,13 +50,19 @@ class Session:
 
     _logger = None
     _config: Configuration
-    _cmd_queue: Queue
+    _cmd_queue: TaskQueue
     _cmd_task_consumer: asyncio.Task
     _channel: Channel
     # current mode
     _mode: Mode
     # current vsys
     _vsys: str = "default"
+    # literal prompts learned by (mode, vsys)
+    _prompts: Dict[Tuple[Mode, str], str]
+    # sessions running on the extra shells of the connection
+    _shells: List["Session"]
+    # index of the session among the sessions of the device in the pool
+    member: int = 0
     _create_time: float
     _last_use: float
     _idle: bool = True
@@ -58,8 +70,29 @@ class Session:
     # cmd hook map
     _cmd_hooks: dict
     _handle_more: bool = False
+    # the plugin supports commands over SSH exec channels, see exec_channel of the session profile
+    _SUPPORT_EXEC_CHANNEL: bool = False
+    # the read-only commands allowed over exec channels
+    _EXEC_CMD_PATTERN: Pattern = re.compile(r"^show\s")
+    # the read-only commands, which the identical tasks in flight share the output of
+    _READ_ONLY_CMD_PATTERN: Pattern = re.compile(r"^show\b", re.IGNORECASE)
+    # the commands may change the config, which invalidate the result cache, as well as the config mode
+    _WRITE_CMD_PATTERN: Pattern = re.compile(
+        r"^(conf(igure)?|write|copy|reload|clear|commit|save|delete|erase)\b", re.IGNORECASE)
+    # the outputs of the read-only commands, see result_cache of the session profile
+    _result_cache: ResultCache
+    # the read-only tasks queued or running by their keys, which the identical tasks attach to
+    _inflight: Dict[Tuple, CmdTask]
+    # the mode of the exec channels, which is the mode after login
+    _exec_mode: Mode = None
+    # the device rejected the exec channel
+    _exec_rejected: bool = False
     _init_task: asyncio.Task
     _init_task_done: asyncio.Future
+    # the prompt at the end of the last task, which ended cleanly, None if the state is unknown
+    _clean_prompt: Optional[str] = None
+    # the cache of the device profiles, None if session.device_profile_cache is not set
+    _device_cache: DeviceProfileCache = None
 
     @abc.abstractmethod
     def decide_current_mode(self, prompt: str):
@@ -178,13 +211,21 @@ class Session:
         self._config = kwargs.get("config", Configuration())
         profiles = self._config.session.profiles() if self._config else {}
         self._session_profile = self.load_session_profile(profiles)
-        self._cmd_queue = Queue(queue_size)
+        self._cmd_queue = TaskQueue(queue_size, starvation_time=self._session_profile.get(
+            "queue_starvation_time", DEFAULT_SESSION_PROFILE.get("queue_starvation_time")))
+        self._result_cache = ResultCache(self._session_profile.get(
+            "result_cache", DEFAULT_SESSION_PROFILE.get("result_cache")))
         self._create_time = datetime.now().timestamp()
         self._last_use = None
         self._cmd_hooks = {}
         self._mode = None
+        self._prompts = {}
+        self._shells = []
         self._init_task = None
         self._channel = None
+        cache_file = self._config.session.device_profile_cache() if self._config else None
+        self._device_cache = DeviceProfileCache(cache_file) if cache_file else None
+        self._inflight = {}
 
     @property
     def session_key(self) -> str:
@@ -194,7 +235,22 @@ class Session:
     @property
     def is_idle(self) -> bool:
         """ Check if session is idle """
-        return self._cmd_queue.empty() and self._idle
+        return self._cmd_queue.empty() and self._idle and all(shell.is_idle for shell in self._shells)
+
+    @property
+    def load(self) -> int:
+        """ Number of the tasks queued or running on the session and its shells """
+        return sum(shell._cmd_queue.qsize() + (0 if shell._idle else 1) for shell in [self] + self._shells)
+
+    @property
+    def sessions_per_device(self) -> int:
+        """ Max sessions of the device kept in the pool, each over its own connection """
+        return max(1, int(self._session_profile.get(
+            "sessions_per_device", DEFAULT_SESSION_PROFILE.get("sessions_per_device"))))
+
+    def is_in(self, vsys: Optional[str] = None, mode: Optional[Mode] = None) -> bool:
+        """ Check if the session is in the vsys and mode, None matches any """
+        return vsys in (None, self._vsys) and mode in (None, self._mode)
 
     def load_session_profile(self, profiles: Dict[str, Any]) -> Dict[str, Any]:
         """ Load session profile
@@ -257,7 +313,8 @@ class Session:
             await self._init_session()
             self._cmd_task_consumer = asyncio.create_task(self._consume_cmd_queue(),
                                                           name=f"{self.session_key}_cmd_consumer")
-        except ConnectTimeout as e:
+            await self._open_shells()
+        except (ConnectTimeout, LoginFailed) as e:
             raise e
         except ExecError as e:
             raise e
@@ -273,25 +330,150 @@ class Session:
         finally:
             self._init_task_done.set_result(True)
 
+    def _get_device_profile(self) -> dict:
+        return self._device_cache.get(self.session_key) if self._device_cache else {}
+
     async def _create_channel(self) -> None:
         self._channel = await Channel.create(
             ip=self.ip, port=self.port, protocol=self.protocol, username=self.username, password=self.password,
             encode=self.encode, logger=self._logger, profile=self._session_profile,
-            config=self._config)
+            config=self._config, device_profile=self._get_device_profile())
+        if self._device_cache:
+            self._device_cache.update(self.session_key, **self._channel.get_ssh_algs())
+
+    def _fork(self) -> "Session":
+        """ Create a session of the same device, to run on another shell of the connection """
+        return type(self)(ip=self.ip, port=self.port, protocol=self.protocol, username=self.username,
+                          password=self.password, enable_password=self.enable_password,
+                          vendor=self.vendor, model=self.model, version=self.version,
+                          encode=self.encode, queue_size=self._cmd_queue.maxsize, config=self._config)
+
+    async def _open_shell(self, index: int) -> "Session":
+        shell = self._fork()
+        # the shells run the commands on the same device
+        shell._result_cache = self._result_cache
+        shell._init_task_done = asyncio.Future()
+        shell._init_task_done.set_result(True)
+        shell._channel = await self._channel.open_shell()
+        try:
+            await shell._init_session()
+        except BaseException:
+            await shell._channel.close()
+            raise
+        shell._cmd_task_consumer = asyncio.create_task(shell._consume_cmd_queue(),
+                                                       name=f"{self.session_key}_shell{index}_cmd_consumer")
+        return shell
+
+    async def _open_shells(self) -> None:
+        """ Open the extra shells over the connection, see shell_channels of the session profile """
+        count = self._session_profile.get("shell_channels", DEFAULT_SESSION_PROFILE.get("shell_channels")) - 1
+        if count < 1:
+            return
+        if self.protocol != "ssh":
+            self._logger.warning(f"Multiple shell channels are not supported by {self.protocol}, ignored")
+            return
+        results = await asyncio.gather(*[self._open_shell(i) for i in range(1, count + 1)],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                # the device may limit the channels per connection, keep the opened ones
+                self._logger.warning(f"Open shell channel failed: {result}")
+            else:
+                self._shells.append(result)
+        self._logger.info(f"Opened {len(self._shells)} extra shell channels")
+
+    def _select_shell(self) -> "Session":
+        """ Select the least busy alive shell to run a task """
+        if not self._shells:
+            return self
+        shells = [self] + [shell for shell in self._shells if shell._channel.is_alive()]
+        return min(shells, key=lambda shell: shell._cmd_queue.qsize() + (0 if shell._idle else 1))
 
     async def _decide_init_state(self) -> str:
         prompt = await self._get_prompt()
+        self._decide_state(prompt)
+        return prompt
+
+    def _track_prompt(self, output: str) -> Optional[str]:
+        """ Decide mode and vsys by the prompt at the end of the output
+
+        :return: the prompt line, None if the output does not end with a known prompt
+        """
+        lines = output.splitlines()
+        if not lines or not self.get_union_pattern().search(lines[-1]):
+            return None
+        try:
+            self._decide_state(lines[-1])
+        except ExecError as e:
+            self._logger.info(f"Track prompt failed, probe it before the next task: {e}")
+            return None
+        return lines[-1]
+
+    def _decide_state(self, prompt: str) -> None:
+        """ Decide current mode and vsys by the prompt """
         self.decide_current_mode(prompt)
         self.decide_current_vsys(prompt)
-        return prompt
+
+    def _get_cached_prompt(self, banner: str) -> Optional[str]:
+        """ Get the last line of the banner if it is the prompt cached for the device
+
+        Then the banner ends at the real prompt rather than a prompt-like line of the banner, and
+        the init state is decided without probing the prompt.
+        """
+        cached_prompt = self._get_device_profile().get("prompt")
+        if not cached_prompt or not banner:
+            return None
+        lines = banner.splitlines()
+        if lines and lines[-1].strip() == cached_prompt:
+            return lines[-1]
+        return None
+
+    def _learn_prompt(self, prompt: str) -> None:
+        """ Cache the literal prompt of current mode and vsys, called after _decide_init_state """
+        prompt = prompt.strip()
+        if prompt and self._session_profile.get(
+                "learned_prompt", DEFAULT_SESSION_PROFILE.get("learned_prompt")):
+            self._prompts[(self._mode, self._vsys)] = prompt
+
+    def get_learned_prompt(self) -> Optional[str]:
+        """ Get the literal prompt learned for current mode and vsys """
+        return self._prompts.get((self._mode, self._vsys))
 
     async def _init_session(self) -> None:
         self._logger.info(f"Init session")
-        await self._ignore_password_change()
-        await self._decide_init_state()
+        # the plugins ignoring the password change read the banner on the way
+        banner = ""
+        if not self.get_ignore_password_change_patterns():
+            banner = await self._read_banner()
+        banner += await self._ignore_password_change()
+        prompt = self._get_cached_prompt(banner)
+        if prompt:
+            self._logger.info(f"Banner ends with the cached prompt, skip probing the prompt")
+            self._decide_state(prompt)
+        else:
+            prompt = await self._decide_init_state()
+        self._learn_prompt(prompt)
+        if self._device_cache:
+            self._device_cache.update(self.session_key, prompt=prompt.strip())
+        self._exec_mode = self._mode
         await self.disable_pagging()
         self._logger.info(f"Session init done")
 
+    async def _read_banner(self) -> str:
+        """ Read the banner up to the prompt shown after login
+
+        Otherwise the first prompt check ends at the prompt of the banner, and the response of the
+        check is left to the next read. The read ends at the prompt, go on if no prompt shows up
+        until banner_timeout of the session profile.
+        """
+        timeout = self._session_profile.get("banner_timeout", DEFAULT_SESSION_PROFILE.get("banner_timeout"))
+        try:
+            return await self._channel.read_channel_until(cmd='', union_pattern=self.get_union_pattern(),
+                                                          more_pattern=None, timeout=timeout)
+        except AsyncTimeoutError:
+            self._logger.info(f"No prompt in the banner after {timeout}s")
+            return ""
+
     def is_same(self, vendor: str, model: str, version: str, password: str, enable_password: str,
                 encode: str) -> bool:
         """ Check if session is same """
@@ -322,76 +504,231 @@ class Session:
     async def _exec_cmd_task(self, task: CmdTask) -> str:
         self._logger.info(f"Start exec cmd task: {task} in session: {self.session_key}")
         start_time = asyncio.get_event_loop().time()
-        output = ""
+        output = ReadBuffer()
+        # the output is written to the stream rather than kept, only the last line is tracked
+        stream = task.output_stream
         err_msg = ""
         has_error = False
+        # the prompt is probed again unless the task ends cleanly
+        prompt, self._clean_prompt = self._clean_prompt, None
+        self._invalidate_cache_by(task)
         try:
-            # decide mode and vsys before exec cmd
-            output += await self._decide_init_state()
-            output += await self._switch_vsys_and_mode(vsys=task.vsys, mode=task.mode)
+            # decide mode and vsys before exec cmd, the last task ended at a known prompt decided them
+            if prompt is None:
+                prompt = await self._decide_init_state()
+            else:
+                self._logger.info(f"Last task ended at prompt [{prompt.strip()}], skip probing the prompt")
+            self._learn_prompt(prompt)
+            switch_output = prompt + await self._switch_vsys_and_mode(vsys=task.vsys, mode=task.mode)
             # if no need detail output, use last line of output as detail output
-            if not task.detail_output and output:
-                output = output.splitlines()[-1]
+            if not task.detail_output and switch_output:
+                switch_output = switch_output.splitlines()[-1]
+            if stream is None:
+                output.append(switch_output)
+            else:
+                await stream.write(switch_output)
+                self._channel.output_stream = stream
+            # the last line before the output of a line, which has the prompt of the line
+            last_line = switch_output[switch_output.rfind("\n") + 1:]
 
             # exec cmd line-by-line, check error line-by-line, stop on error
             lines = task.command.splitlines()
             line_size = len(lines)
+            window = self._get_pipeline_window(task, lines)
+            if window > 1:
+                pipelined_output, err_msg = await self._exec_lines_pipelined(lines, window, task.catch_error)
+                if stream is None:
+                    output.append(pipelined_output)
+                last_line = pipelined_output[pipelined_output.rfind("\n") + 1:]
+                has_error = bool(err_msg)
+                line_size = 0
             i = 0
             while not has_error and i < line_size:
                 line = lines[i].strip()
                 self._logger.info((f"Exec cmd[{i}]: {line}"))
-                output += await self.exec_cmd(line)
+                line_output = await self.exec_cmd(line)
+                if stream is None:
+                    output.append(line_output)
                 if task.catch_error:
-                    error = utils.regex.catch_error_of_output(output,
+                    # only the output of the line is checked, the output before is checked already
+                    error = utils.regex.catch_error_of_output(last_line + line_output,
                                                               self.get_error_patterns(),
                                                               self.get_ignore_error_patterns())
                     if error:
                         err_msg = error
                         has_error = True
                         self._logger.error(f"Exec cmd[{i}]: {line}, error: {error}")
+                if line_output:
+                    last_line = line_output[line_output.rfind("\n") + 1:]
                 self._logger.info(f"Finished exec cmd[{i}]: {line}")
                 i += 1
+            data = output.get_data()
+            if not has_error:
+                self._clean_prompt = self._track_prompt(data if stream is None else last_line)
+                if stream is None:
+                    self._cache_result(task, data)
             time_consumed: float = asyncio.get_event_loop().time() - start_time
             self._logger.info(f"Finished exec cmd task: {task}, cost: {time_consumed:.3f}s")
-            task.set_result(output=output,
-                            exception=ExecCmdError(err_msg, output=output) if has_error else None)
+            task.set_result(output=data,
+                            exception=ExecCmdError(err_msg, output=data) if has_error else None)
+            return data
         except asyncio.CancelledError as e:
             self._logger.exception(e)
-            task.set_result(output=output, exception=ExecCmdTimeout(
-                msg=f"Exec timed out after {task.timeout} seconds", output=output))
+            data = output.get_data()
+            task.set_result(output=data, exception=ExecCmdTimeout(
+                msg=f"Exec timed out after {task.timeout} seconds", output=data))
         except AsyncTimeoutError as e:
-            task.set_result(output=output, exception=e)
+            data = output.get_data()
+            task.set_result(output=data, exception=e)
         except ExecError as e:
-            output += e.output
-            e.output = output
-            task.set_result(output=output, exception=e)
+            if stream is None:
+                output.append(e.output)
+            data = output.get_data()
+            e.output = data
+            task.set_result(output=data, exception=e)
         except BaseException as e:
             # catch all exception
+            self._logger.exception(e)
+            data = output.get_data()
+            task.set_result(output=data, exception=ExecError(e, output=data))
+        finally:
+            if stream is not None:
+                self._channel.output_stream = None
+            self._invalidate_cache_by(task)
+        return data
+
+    def _can_exec(self, task: CmdTask, exec_channel: Optional[bool] = None) -> bool:
+        """ Check if the task can run over an exec channel
+
+        Only a read-only single line command without hook, in the default vsys of the plugin and the
+        mode after login, is run over an exec channel, which starts from the login state of the device.
+        The vsys and mode not set are the current ones of the session.
+        :param exec_channel: enable exec channel for the task, if None, use the session profile
+        """
+        if exec_channel is None:
+            exec_channel = self._session_profile.get("exec_channel", DEFAULT_SESSION_PROFILE.get("exec_channel"))
+        if not exec_channel or not self._SUPPORT_EXEC_CHANNEL or self._exec_rejected or self.protocol != "ssh":
+            return False
+        command = task.command.strip()
+        return bool(command) and "\n" not in command and command not in self._cmd_hooks and \
+            (task.vsys or self._vsys) == self._DEFAULT_VSYS and (task.mode or self._mode) == self._exec_mode and \
+            bool(self._EXEC_CMD_PATTERN.match(command))
+
+    async def _exec_cmd_task_over_exec(self, task: CmdTask) -> bool:
+        """ Run the task over an exec channel
+
+        :return: False if the device rejects the exec channel, the task is not run
+        """
+        self._logger.info(f"Start exec cmd task: {task} over exec channel in session: {self.session_key}")
+        self._last_use = datetime.now().timestamp()
+        task.set_enqueue_timestamp()
+        task.set_dequeue_timestamp()
+        task.set_exec_start_timestamp()
+        output = ""
+        try:
+            output = await self._channel.exec_command(task.command.strip(), timeout=task.timeout)
+            err_msg = ""
+            if task.catch_error:
+                err_msg = utils.regex.catch_error_of_output(output, self.get_error_patterns(),
+                                                            self.get_ignore_error_patterns())
+            if not err_msg:
+                self._cache_result(task, output)
+            if task.output_stream is not None:
+                await task.output_stream.write(output)
+                output = ""
+            task.set_result(output=output, exception=ExecCmdError(err_msg, output=output) if err_msg else None)
+        except ChannelOpenError as e:
+            self._logger.warning(f"Exec channel rejected, disabled for the session: {e}")
+            self._exec_rejected = True
+            return False
+        except asyncio.TimeoutError as e:
+            # the output read before the timeout
+            output = (getattr(e, "stdout", None) or '') + (getattr(e, "stderr", None) or '')
+            task.set_result(output=output, exception=ExecCmdTimeout(
+                msg=f"Exec timed out after {task.timeout} seconds", output=output))
+        except BaseException as e:
             self._logger.exception(e)
             task.set_result(output=output, exception=ExecError(e, output=output))
-        return output
+        if task.exception:
+            self._log_io_records(task)
+        self._logger.info(f"Finished exec cmd task: {task} over exec channel")
+        return True
+
+    def _get_pipeline_window(self, task: CmdTask, lines: List[str]) -> int:
+        """ Get the pipeline window of the task, 0 if the lines run one by one """
+        window = task.pipeline_window
+        if window is None:
+            window = self._session_profile.get("pipeline_window", DEFAULT_SESSION_PROFILE.get("pipeline_window"))
+        if not window or window < 2 or len(lines) < 2:
+            return 0
+        # the hooks handle the prompts of their commands
+        if any(line.strip() in self._cmd_hooks for line in lines):
+            return 0
+        return window
+
+    async def _exec_lines_pipelined(self, lines: List[str], window: int,
+                                    catch_error: bool = True) -> Tuple[str, str]:
+        """ Execute the lines pipelined
+
+        Up to window lines are written ahead of the prompts. The output is split on the prompts into
+        the output of each line, which is checked by the error patterns, so the error is attributed
+        to the line. On the first error no more lines are written, the lines in flight are still
+        run by the device and their outputs are read.
+        :return: the output and the error message, empty if no error
+        """
+        splitter = PromptSplitter(self.get_union_pattern())
+        error_patterns = self.get_error_patterns()
+        ignore_error_patterns = self.get_ignore_error_patterns()
+        output = ReadBuffer()
+        err_msg = ""
+        line_size = len(lines)
+        sent = 0
+        done = 0
+        while True:
+            while not err_msg and sent < line_size and sent - done < window:
+                await self.write_channel(lines[sent].strip())
+                sent += 1
+            if done >= sent:
+                break
+            if self._channel.read_at_eof():
+                raise ChannelError("Channel closed while executing pipelined lines.", output=output.get_data())
+            chunk = await self.read_channel()
+            output.append(chunk)
+            for line_output in splitter.feed(chunk):
+                if done >= sent:
+                    break
+                line = lines[done].strip()
+                if catch_error and not err_msg:
+                    error = utils.regex.catch_error_of_output(line_output, error_patterns, ignore_error_patterns)
+                    if error:
+                        err_msg = f"Line {done + 1} [{line}]: {error}"
+                        self._logger.error(f"Exec cmd[{done}]: {line}, error: {error}, "
+                                           f"{sent - done - 1} lines in flight")
+                self._logger.info(f"Finished exec cmd[{done}]: {line}")
+                done += 1
+        return output.get_data(), err_msg
 
     async def _consume_cmd_queue(self):
         self._logger.info(f"Start consuming cmd queue")
         while not self._is_closing:
-            output = ""
             task = await self._dequeue()
             if task is None:
                 continue
             correlation_id.set(task.context_id)
             self._idle = False
             try:
-                # run task withtimeout
-                output = await asyncio.wait_for(self._exec_cmd_task(task), timeout=task.timeout)
+                if task.is_expired():
+                    self._drop_expired_task(task)
+                    continue
+                start_time = time.monotonic()
+                if isinstance(task, BatchTask):
+                    await self._run_batch_task(task)
+                else:
+                    await self._run_cmd_task(task)
+                self._cmd_queue.record_exec_time(time.monotonic() - start_time)
             except asyncio.CancelledError as e:
                 self._logger.warning(f"_consume_cmd_queue cancelled: {e}", exc_info=True)
                 break
-            except asyncio.TimeoutError as e:
-                self._logger.exception(e)
-                task.set_result(output=output, exception=ExecCmdTimeout(e, output=output))
-            except BaseException as e:
-                self._logger.exception(e)
-                task.set_result(output=output, exception=ExecCmdError(e, output=output))
             finally:
                 self._idle = True
                 try:
@@ -399,6 +736,191 @@ class Session:
                 except Exception as e:
                     self._logger.warning("Called task_done too many times.")
 
+    async def _run_cmd_task(self, task: CmdTask) -> None:
+        """ Run the task with its timeout
+        :raises asyncio.CancelledError: if the consumer is cancelled
+        """
+        output = ""
+        try:
+            # run task withtimeout
+            output = await asyncio.wait_for(self._exec_cmd_task(task), timeout=task.timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError as e:
+            self._logger.exception(e)
+            task.set_result(output=output, exception=ExecCmdTimeout(e, output=output))
+        except BaseException as e:
+            self._logger.exception(e)
+            task.set_result(output=output, exception=ExecCmdError(e, output=output))
+        finally:
+            if getattr(task, "exception", None):
+                self._log_io_records(task)
+
+    async def _run_batch_task(self, batch: BatchTask) -> None:
+        """ Run the commands of the batch one by one
+
+        The prompt is probed only if the last command does not end cleanly at a known prompt, and the
+        mode and vsys are switched only if the command differs from the last one.
+        :raises asyncio.CancelledError: if the consumer is cancelled
+        """
+        self._logger.info(f"Start exec batch task: {batch} in session: {self.session_key}")
+        if batch.reorder:
+            batch.reorder_tasks(self._vsys, self._mode)
+            self._logger.info(f"Reordered batch task: {batch} by vsys and mode, "
+                              f"{batch.transitions_saved} transitions saved")
+        try:
+            for i, task in enumerate(batch.tasks):
+                correlation_id.set(task.context_id)
+                if task.is_expired():
+                    for expired in batch.tasks[i:]:
+                        self._drop_expired_task(expired)
+                    break
+                if await self._serve_from_cache(task):
+                    continue
+                task.set_exec_start_timestamp()
+                if not (self._can_exec(task, task.exec_channel) and await self._exec_cmd_task_over_exec(task)):
+                    await self._run_cmd_task(task)
+                if task.exception and not batch.continue_on_error:
+                    self._logger.info(f"Batch task stopped at cmd[{i}]: {task}, "
+                                      f"{len(batch.tasks) - i - 1} cmds not run")
+                    for skipped in batch.tasks[i + 1:]:
+                        skipped.cacnel()
+                    break
+        finally:
+            batch.set_result()
+            self._logger.info(f"Finished exec batch task: {batch}")
+
+    def _inflight_key(self, task: CmdTask) -> Optional[Tuple]:
+        """ Get the key of the identical tasks, None if the task is not read-only """
+        command = task.command.strip()
+        if "\n" in command or command in self._cmd_hooks or task.output_stream is not None or \
+                not self._is_read_only_task(task):
+            return None
+        return task.vsys, task.mode, command, task.detail_output, task.catch_error
+
+    def _get_inflight(self, task: CmdTask) -> Optional[CmdTask]:
+        """ Get the identical task queued or running, which the task can wait for
+
+        The task waits only for a task of the same or a higher priority, which does not expire before it.
+        """
+        key = self._inflight_key(task)
+        leader = self._inflight.get(key) if key else None
+        if leader is None or leader.future.done():
+            return None
+        priorities = list(Priority)
+        if priorities.index(leader.priority) > priorities.index(task.priority):
+            return None
+        if leader.deadline and (not task.deadline or leader.deadline < task.deadline):
+            return None
+        return leader
+
+    async def _attach_inflight(self, task: CmdTask, leader: CmdTask) -> Optional[CmdTaskResult]:
+        """ Wait for the result of the identical task rather than run the task again
+
+        :return: the result of the leader, None if the leader is cancelled by its caller
+        """
+        self._logger.info(f"Attach task: {task} to the in-flight task: {leader}")
+        try:
+            # the caller of the task gives up without cancelling the leader
+            await asyncio.shield(leader.future)
+        except CancelledError:
+            if not leader.future.cancelled():
+                raise
+            self._logger.info(f"In-flight task: {leader} cancelled, run task: {task}")
+            return None
+        return await leader.get_result()
+
+    def _track_inflight(self, task: CmdTask) -> None:
+        """ Track the task until it is done, the identical tasks sent meanwhile attach to it """
+        key = self._inflight_key(task)
+        if key is None:
+            return
+        self._inflight[key] = task
+
+        def untrack(_):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+        task.future.add_done_callback(untrack)
+
+    def _cache_key(self, task: CmdTask) -> Optional[CacheKey]:
+        """ Get the key by the vsys and mode the task runs in, the ones not set are the current ones of
+        the session, None if they are unknown
+        """
+        vsys, mode = task.vsys or self._vsys, task.mode or self._mode
+        return (vsys, mode, task.command.strip()) if vsys and mode else None
+
+    async def _serve_from_cache(self, task: CmdTask) -> bool:
+        """ Serve the task by the cached output of the same command in the same vsys and mode
+
+        :return: False if the output is not cached or the task does not use the cache
+        """
+        if not task.use_cache or not self._result_cache.enabled:
+            return False
+        key = self._cache_key(task)
+        cached = self._result_cache.get(key) if key else None
+        if cached is None:
+            return False
+        output, task.cache_age = cached
+        self._logger.info(f"Serve task: {task} from the result cache, age: {task.cache_age:.3f}s")
+        if task.output_stream is not None:
+            await task.output_stream.write(output)
+            output = ""
+        task.set_result(output=output)
+        return True
+
+    def _cache_result(self, task: CmdTask, output: str) -> None:
+        """ Cache the output of the task if its command has a ttl """
+        key = self._cache_key(task)
+        if self._result_cache.enabled and key and self._is_read_only_task(task):
+            self._result_cache.put(key, output)
+
+    def _is_read_only_task(self, task: CmdTask) -> bool:
+        """ Check if the task is read-only, by _READ_ONLY_CMD_PATTERN or the result cache ttl of its commands,
+        the commands matching _WRITE_CMD_PATTERN are never read-only
+        """
+        return not self._is_write_task(task) and all(
+            self._READ_ONLY_CMD_PATTERN.match(line) or self._result_cache.ttl_of(line) > 0
+            for line in (line.strip() for line in task.command.splitlines()) if line)
+
+    def _is_write_task(self, task: CmdTask) -> bool:
+        return task.mode == Mode.CONFIG or \
+            any(self._WRITE_CMD_PATTERN.match(line.strip()) for line in task.command.splitlines())
+
+    def _invalidate_cache_by(self, task: CmdTask) -> None:
+        """ Invalidate the result cache if the task may change the config of the device, i.e. it is
+        not known as read-only
+        """
+        if len(self._result_cache) and (self._mode == Mode.CONFIG or not self._is_read_only_task(task)):
+            self._logger.info(f"Invalidate the result cache by task: {task}")
+            self._result_cache.invalidate()
+
+    def _drop_expired_task(self, task: Task) -> None:
+        """ Drop the task whose deadline passed in the queue, the client is no longer waiting """
+        queue_time = time.time() - task.enqueue_timestamp
+        self._logger.warning(f"Drop task: {task}, deadline exceeded after {queue_time:.3f}s in the queue")
+        exception = DeadlineExceeded(f"Deadline exceeded after {queue_time:.3f}s in the session queue.")
+        for cmd_task in task.tasks if isinstance(task, BatchTask) else [task]:
+            cmd_task.set_result(output="", exception=exception)
+        if isinstance(task, BatchTask):
+            task.set_result(exception=exception)
+
+    def _admit(self, task: Task) -> None:
+        """ Admit the task to the queue unless it is estimated not to start before its deadline
+
+        The wait is estimated by the exec times of the recent tasks of the session.
+        :raises QueueFullError: if the estimated wait exceeds the deadline, with the seconds to retry after
+        """
+        if not task.deadline:
+            return
+        wait = self._cmd_queue.estimate_wait(task.priority, busy=not self._idle)
+        remaining = task.deadline - time.time()
+        if wait > remaining:
+            raise QueueFullError(
+                f"Estimated queue time {wait:.3f}s exceeds the deadline in {max(remaining, 0):.3f}s, "
+                f"please retry later. Session: {self.session_key}",
+                retry_after=math.ceil(wait - max(remaining, 0)))
+
     async def _get_prompt(self, write_return: bool = True) -> str:
         """ Get current prompt """
         if write_return:
@@ -416,6 +938,22 @@ class Session:
                 return line
         raise GetPromptFailed("Get prompt failed, no union pattern matched in the output.", ret)
 
+    def dump_io_records(self) -> str:
+        """ Dump the recent I/O of the session and its shells, see flight_recorder_size of the
+        session profile
+        """
+        dumps = []
+        for index, shell in enumerate([self] + self._shells):
+            recorder = shell._channel.recorder if shell._channel else None
+            if recorder:
+                dumps.append(f"[shell {index}]\n{recorder.dump()}")
+        return "\n".join(dumps)
+
+    def _log_io_records(self, task: CmdTask) -> None:
+        recorder = self._channel.recorder if self._channel else None
+        if recorder:
+            self._logger.warning(f"Task {task} failed, recent I/O of the session:\n{recorder.dump()}")
+
     async def is_alive(self) -> bool:
         """ Check if session is alive """
         await self._init_task_done
@@ -423,6 +961,8 @@ class Session:
 
     async def close(self) -> None:
         """ Close session """
+        for shell in self._shells:
+            await shell.close()
         try:
             self._is_closing = True
             self._cmd_task_consumer.cancel()
@@ -441,17 +981,19 @@ class Session:
     async def read_channel_util_prompt(self, cmd: str = '') -> str:
         """ read channel util prompt """
         self._last_use = datetime.now().timestamp()
+        more_pattern, more_cmd = self.get_more_pattern()
         return await self._channel.read_channel_until(
             cmd=cmd,
             union_pattern=self.get_union_pattern(),
-            more_pattern=self.get_more_pattern()[0],
-            more_cmd=self.get_more_pattern()[1])
+            more_pattern=more_pattern,
+            more_cmd=more_cmd,
+            prompt=self.get_learned_prompt())
 
-    async def write_channel(self, data: str, auto_enter: bool = True) -> None:
-        """ Write data to channel"""
+    async def write_channel(self, data: str, auto_enter: bool = True, secret: bool = False) -> None:
+        """ Write data to channel, the data of a secret write, e.g. a password, is not recorded """
         if auto_enter and not data.endswith(self.get_default_return()):
             data += self.get_default_return()
-        await self._channel.write_channel(data)
+        await self._channel.write_channel(data, secret)
         self._last_use = datetime.now().timestamp()
 
     async def _switch_vsys_and_mode(self, vsys: str = None, mode: Mode = None) -> str:
@@ -488,7 +1030,9 @@ class Session:
         Execute command in specific vsys and mode with output
         """
         output = ""
-        output += await self._decide_init_state()
+        prompt = await self._decide_init_state()
+        self._learn_prompt(prompt)
+        output += prompt
         output += await self._switch_vsys_and_mode(vsys=vsys, mode=mode)
         lines = command.splitlines()
         line_size = len(lines)
@@ -516,25 +1060,55 @@ class Session:
         return output
 
     async def send_cmd(self, command: str, vsys: str = None, mode: Mode = None,
-                       timeout: float = 10, catch_error: bool = True, detail_output: bool = True) -> CmdTaskResult:
+                       timeout: float = 10, catch_error: bool = True, detail_output: bool = True,
+                       exec_channel: bool = None, pipeline_window: int = None,
+                       priority: Priority = Priority.NORMAL, deadline: float = None,
+                       use_cache: bool = True) -> CmdTaskResult:
         """
         Execute command in specific mode with output
         :param command: command to execute, supoort multi-line command
         :param vsys: vsys to execute, if not set, use current vsys
         :param mode: mode to execute, if not set, use current mode
         :param detail_output: is the detailed output
+        :param exec_channel: run the read-only command over an exec channel without queuing,
+            if None, use exec_channel of the session profile
+        :param pipeline_window: max lines of the multi-line command written ahead of the prompts,
+            if None, use pipeline_window of the session profile
+        :param priority: priority of the command in the session queue
+        :param deadline: unix timestamp the client stops waiting, the command is rejected if it is
+            estimated not to start before, or dropped if it does not start before
+        :param use_cache: serve the output from the result cache if it is cached, see result_cache of the
+            session profile
         :return: Future, result of command, need to await to get result
         """
         task: CmdTask= CmdTask(command, vsys=vsys, mode=mode, timeout=timeout,
                           catch_error=catch_error, detail_output=detail_output,
-                          future=get_event_loop().create_future())
+                          future=get_event_loop().create_future(), pipeline_window=pipeline_window,
+                          exec_channel=exec_channel, priority=priority, deadline=deadline,
+                          use_cache=use_cache)
         try:
             if self._is_closing:
                 _msg = f"Session is closing, please try again later. Session: {self.session_key}"
                 self._logger.warning(_msg)
                 raise ExecCmdError(_msg)
-            self._enqueue(task)
+            # the current vsys and mode are the ones the task runs in only if no other task runs before it
+            if ((task.vsys and task.mode) or self.is_idle) and await self._serve_from_cache(task):
+                return await task.get_result()
+            leader = self._get_inflight(task)
+            if leader is not None:
+                result = await self._attach_inflight(task, leader)
+                if result is not None:
+                    return result
+            self._track_inflight(task)
+            if self._can_exec(task, task.exec_channel) and await self._exec_cmd_task_over_exec(task):
+                return await task.get_result()
+            shell = self._select_shell()
+            shell._admit(task)
+            shell._enqueue(task)
             self._logger.info(f"Send task: {task} to session queue: {self.session_key}")
+        except QueueFullError as e:
+            self._logger.warning(f"Send cmd rejected! Cmd: [{ task }]; Reason: {e}")
+            task.set_result(exception=e)
         except QueueFull:
             _msg = f"Send cmd failed! Session: {self.session_key} Cmd: [{ task }]; \
                 Reason: Queue is full, please retry or check the agent."
@@ -543,6 +1117,54 @@ class Session:
 
         return await task.get_result()
 
+    async def send_cmds(self, tasks: List[CmdTask], continue_on_error: bool = False,
+                        priority: Priority = Priority.NORMAL, deadline: float = None,
+                        reorder: bool = False) -> List[CmdTaskResult]:
+        """
+        Execute the commands as one task of the session, no other task runs in between
+        :param tasks: command tasks to execute in order, the futures are created here unless given
+        :param continue_on_error: go on with the next command if a command fails
+        :param priority: priority of the commands in the session queue
+        :param deadline: unix timestamp the client stops waiting, see send_cmd
+        :param reorder: the commands are order-independent, run them grouped by vsys and mode to save
+            the switches, see BatchTask.reorder_tasks
+        :return: results in the order of the tasks, one per task. The commands after the first failure
+            are not run unless continue_on_error, their results are skipped
+        """
+        loop = get_event_loop()
+        for task in tasks:
+            task.future = task.future or loop.create_future()
+            task.deadline = deadline
+        batch = BatchTask(tasks, continue_on_error=continue_on_error, future=loop.create_future(),
+                          priority=priority, deadline=deadline, reorder=reorder)
+        try:
+            if self._is_closing:
+                _msg = f"Session is closing, please try again later. Session: {self.session_key}"
+                self._logger.warning(_msg)
+                raise ExecCmdError(_msg)
+            shell = self._select_shell()
+            shell._admit(batch)
+            shell._enqueue(batch)
+            self._logger.info(f"Send task: {batch} to session queue: {self.session_key}")
+        except QueueFullError as e:
+            self._logger.warning(f"Send cmds rejected! Cmds: [{ batch }]; Reason: {e}")
+            tasks[0].set_result(exception=e)
+            return [await tasks[0].get_result()] + [task.get_skipped_result() for task in tasks[1:]]
+        except QueueFull:
+            _msg = f"Send cmds failed! Session: {self.session_key} Cmds: [{ batch }]; \
+                Reason: Queue is full, please retry or check the agent."
+            self._logger.error(_msg)
+            tasks[0].set_result(exception=QueueFullError(_msg))
+            return [await tasks[0].get_result()] + [task.get_skipped_result() for task in tasks[1:]]
+
+        await batch.future
+        # with reorder, the commands not run may be anywhere in the order of the tasks
+        results = [await task.get_result() if task.future.done() and not task.future.cancelled()
+                   else task.get_skipped_result() for task in tasks]
+        for result in results:
+            result.transitions_saved = batch.transitions_saved
+        return results
+
     async def get_display_info(self) -> List[Any]:
         """Return session information."""
         await self._init_task_done
@@ -550,14 +1172,25 @@ class Session:
         last_use = "N/A"
         if self._last_use:
             last_use = datetime.fromtimestamp(self._last_use).strftime('%Y-%m-%d %H:%M:%S')
-        return [self.session_key, self._mode, self._vsys, await self.is_alive(), self._idle,
-            self._cmd_queue.qsize(), create_time, last_use]
+        queue_size = self._cmd_queue.qsize() + sum(shell._cmd_queue.qsize() for shell in self._shells)
+        queue_time = ", ".join(f"{priority}: {stats.avg:.3f}/{stats.max:.3f}s"
+                               for priority, stats in self.get_queue_time_stats().items() if stats.count)
+        return [self.session_key, self.member, self._mode, self._vsys, await self.is_alive(), self.is_idle,
+            queue_size, queue_time or "N/A", create_time, last_use]
 
     @classmethod
     def get_info_headers(cls) -> List[str]:
         """ Return session information headers """
-        return ["Session", "Mode", "Vsys", "Alive", "Idle", "Queue Size", "Create Time",
-                "Last Use"]
+        return ["Session", "Member", "Mode", "Vsys", "Alive", "Idle", "Queue Size", "Queue Time (avg/max)",
+                "Create Time", "Last Use"]
+
+    def get_queue_time_stats(self) -> Dict[Priority, QueueTimeStats]:
+        """ Queue time of the tasks dispatched by the session and its shells, by priority """
+        stats = {priority: QueueTimeStats() for priority in Priority}
+        for shell in [self] + self._shells:
+            for priority, shell_stats in shell._cmd_queue.stats.items():
+                stats[priority].merge(shell_stats)
+        return stats
 
     def register_hook(self, command: str, handler):
         """ Register a hook for a specific command """
@@ -624,13 +1257,46 @@ class Session:
           self._logger.info(f"Do not ignore password change")
         return output.get_data()
 
+    def _get_last_use(self) -> float:
+        # the session is in use while any of its shells is
+        # a session never used, such as a pre-warmed one, is idle since created
+        return max([self._last_use or self._create_time] +
+                   [shell._last_use for shell in self._shells if shell._last_use])
+
+    def _get_expiration_time(self, day: date) -> Optional[float]:
+        """ Get the expiration time of the session profile on the day, None if not set or invalid """
+        expiration_time_str = self._session_profile.get("expiration_time")
+        if expiration_time_str is None:
+            return None
+        try:
+            expiration_time = datetime.strptime(expiration_time_str, "%H:%M").time()
+        except Exception:
+            return None
+        return datetime.combine(day, expiration_time).timestamp()
+
+    def get_next_check_time(self) -> Optional[float]:
+        """ Get the earliest time the session may exceed the max idle time or expire, None if never.
+        The session may still be in use by then, so it is checked again at the time.
+        """
+        check_times = []
+        max_idle_time = self._session_profile.get("max_idle_time")
+        if max_idle_time is not None:
+            check_times.append(self._get_last_use() + max_idle_time)
+        today_expiration = self._get_expiration_time(datetime.now().date())
+        if today_expiration is not None:
+            if self._create_time < today_expiration:
+                check_times.append(today_expiration)
+            else:
+                check_times.append(self._get_expiration_time(datetime.now().date() + timedelta(days=1)))
+        return min(check_times) if check_times else None
+
     def check_idle_time(self) -> bool:
         """Check whether the session needs to be closed due to prolonged idle time"""
         max_idle_time = self._session_profile.get("max_idle_time")
         if max_idle_time is None:
             return False
         now = datetime.now().timestamp()
-        idle_time = now - self._last_use
+        idle_time = now - self._get_last_use()
         if idle_time > max_idle_time:
             self._logger.info(f"Session idle time {idle_time:.1f}s exceeds maximum allowed {max_idle_time}s")
             return True
@@ -638,15 +1304,10 @@ class Session:
 
     def check_expiration_time(self) -> bool:
         """Check if the session was created before today's expiration time"""
-        expiration_time_str = self._session_profile.get("expiration_time")
-        if expiration_time_str is None:
-            return False
-        try:
-            expiration_time = datetime.strptime(expiration_time_str, "%H:%M").time()
-        except Exception:
+        today_expiration = self._get_expiration_time(datetime.now().date())
+        if today_expiration is None:
             return False
         now = datetime.now().timestamp()
-        today_expiration = datetime.combine(datetime.now().date(), expiration_time).timestamp()
         if today_expiration <= now and self._create_time < today_expiration:
             create_time_strf = datetime.fromtimestamp(self._create_time).strftime('%Y-%m-%d %H:%M:%S')
             today_expiration_strf = datetime.fromtimestamp(today_expiration).strftime('%Y-%m-%d %H:%M:%S')
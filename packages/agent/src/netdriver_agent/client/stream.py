@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import codecs
+from collections import deque
+from typing import Deque, Optional
+
+from netdriver_core.utils.terminal import simulate_output
+
+
+# max chars of an unfinished line kept before it is sent as it is
+_MAX_PARTIAL_SIZE = 65536
+
+
+class OutputStream:
+    """ Stream of the output of a command task, from the channel to the client
+
+    The channel writes every chunk as it is read. The chunks are split into complete lines, which
+    are normalized by simulate_output, so the lines read by the client join to the output returned
+    by the cmd api. The unfinished last line, e.g. the prompt, is sent on close.
+
+    The writer waits once max_pending lines are not read yet, so a slow client slows down the
+    reading of the channel instead of growing the memory of the agent.
+    """
+    _chunks: Deque[str]
+    _partial: str
+    _closed: bool
+    _aborted: bool
+
+    def __init__(self, encode: str = "utf-8", max_pending: int = 64) -> None:
+        """
+        :param encode: str, encoding of the bytes chunks
+        :param max_pending: int, max normalized chunks not read by the client
+        """
+        self._decoder = codecs.getincrementaldecoder(encode)(errors="replace")
+        self._max_pending = max_pending
+        self._chunks = deque()
+        self._partial = ""
+        self._closed = False
+        self._aborted = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _push(self, data: str) -> None:
+        if data and not self._aborted:
+            self._chunks.append(data)
+            self._readable.set()
+
+    async def write(self, chunk: str | bytes) -> None:
+        """ Write a chunk read from the channel, the complete lines are sent normalized """
+        if self._closed or self._aborted or not chunk:
+            return
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        data = self._partial + chunk
+        end = data.rfind("\n")
+        if end >= 0:
+            self._partial = data[end + 1:]
+            self._push(simulate_output(data[:end + 1]) + "\n")
+        elif len(data) < _MAX_PARTIAL_SIZE:
+            self._partial = data
+            return
+        else:
+            # a very long line is sent in pieces rather than kept
+            self._partial = ""
+            self._push(simulate_output(data))
+        if len(self._chunks) >= self._max_pending:
+            self._writable.clear()
+            await self._writable.wait()
+
+    def close(self) -> None:
+        """ Send the unfinished line and end the stream """
+        if self._closed:
+            return
+        self._partial += self._decoder.decode(b"", final=True)
+        if self._partial:
+            self._push(simulate_output(self._partial))
+            self._partial = ""
+        self._closed = True
+        self._readable.set()
+
+    def abort(self) -> None:
+        """ Stop the stream when the client is gone, the writes are discarded """
+        self._aborted = True
+        self._chunks.clear()
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
+
+    async def read(self) -> Optional[str]:
+        """ Read the next normalized chunk, None once the stream is closed and drained """
+        while not self._chunks:
+            if self._closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+        chunk = self._chunks.popleft()
+        if len(self._chunks) < self._max_pending:
+            self._writable.set()
+        return chunk
+
+    def __aiter__(self) -> "OutputStream":
+        return self
+
+    async def __anext__(self) -> str:
+        chunk = await self.read()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
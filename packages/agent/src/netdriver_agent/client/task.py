@@ -1,18 +1,39 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import enum
 import time
 from asyncio import Future
+from typing import Dict, List, Optional, Tuple
 
 from asgi_correlation_id import correlation_id
+from netdriver_agent.client.stream import OutputStream
 from netdriver_core.dev.mode import Mode
 from netdriver_core.exception.errors import BaseError
 
 
+class Priority(enum.StrEnum):
+    """ Priority of the task in the session queue, from the highest to the lowest """
+    # interactive commands, e.g. troubleshooting
+    HIGH = "high"
+    NORMAL = "normal"
+    # bulk jobs, e.g. config pushes and fleet-wide collections
+    LOW = "low"
+
+
 class TaskResult:
     """ Task result of session exec """
     queue_time: float
     exec_time: float
     total_time: float
+    # unix timestamps of the exec start and end, None if not executed
+    start_time: float
+    end_time: float
+    # age of the output served from the result cache (unit: seconds), None if executed
+    cache_age: float = None
+    # vsys and mode transitions saved by reordering the batch of the command, None if not reordered
+    transitions_saved: int = None
+    # the task was not run, e.g. the commands of a batch after the failed one
+    skipped: bool = False
     output: str
     exception: BaseError
 
@@ -31,13 +52,22 @@ class Task:
     vsys: str
     exception: BaseError
     future: Future
+    priority: Priority
+    # unix timestamp the client stops waiting for the result, None if no deadline
+    deadline: float
 
     def __init__(self, vsys: str = None, timeout: float = 10, catch_error: bool = True,
-                 future: Future = None):
+                 future: Future = None, priority: Priority = Priority.NORMAL, deadline: float = None):
         self.vsys = vsys
         self.timeout = timeout
         self.catch_error = catch_error
         self.future = future
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueue_timestamp = None
+        self.dequeue_timestamp = None
+        self.exec_start_timestamp = None
+        self.exec_end_timestamp = None
 
     def set_enqueue_timestamp(self):
         self.enqueue_timestamp = time.time()
@@ -51,6 +81,10 @@ class Task:
     def set_exec_end_timestamp(self):
         self.exec_end_timestamp = time.time()
 
+    def is_expired(self) -> bool:
+        """ Check if the deadline has passed """
+        return bool(self.deadline) and time.time() > self.deadline
+
     def cacnel(self):
         if self.future and not self.future.done():
             self.future.cancel()
@@ -65,15 +99,32 @@ class CmdTask(Task):
     mode: Mode
     command: str
     detail_output: bool
+    # max lines written ahead of the prompts, None for the session profile
+    pipeline_window: int
+    # run over an exec channel if possible, None for the session profile
+    exec_channel: bool
+    # the output is written to the stream as it is read rather than kept, None to keep it
+    output_stream: OutputStream
+    # serve the output from the result cache of the session if it is cached
+    use_cache: bool
+    # age of the cached output served, None if executed
+    cache_age: float
     context_id: str
 
     def __init__(self, command: str, vsys: str = None, mode: Mode = None,
                  timeout: float = 10, catch_error: bool = True, 
-                 detail_output: bool = True, future: Future = None):
-        super().__init__(vsys, timeout, catch_error, future)
+                 detail_output: bool = True, future: Future = None, pipeline_window: int = None,
+                 exec_channel: bool = None, priority: Priority = Priority.NORMAL, deadline: float = None,
+                 output_stream: OutputStream = None, use_cache: bool = True):
+        super().__init__(vsys, timeout, catch_error, future, priority, deadline)
         self.command = command
         self.mode = mode
         self.detail_output = detail_output
+        self.pipeline_window = pipeline_window
+        self.exec_channel = exec_channel
+        self.output_stream = output_stream
+        self.use_cache = use_cache
+        self.cache_age = None
         self.context_id = correlation_id.get()
 
     def __str__(self):
@@ -82,9 +133,16 @@ class CmdTask(Task):
     def set_result(self, output: str = None, exception: BaseError = None):
         self.set_exec_end_timestamp()
         self.exception = exception
+        if self.output_stream:
+            self.output_stream.close()
         if self.future and not self.future.done():
             self.future.set_result(output)
 
+    def cacnel(self):
+        super().cacnel()
+        if self.output_stream:
+            self.output_stream.close()
+
     async def get_result(self) -> CmdTaskResult:
         output = await self.future
         result = CmdTaskResult()
@@ -98,6 +156,102 @@ class CmdTask(Task):
             result.exec_time = 0.0
         else:
             result.exec_time = self.exec_end_timestamp - self.exec_start_timestamp
+        result.start_time = self.exec_start_timestamp
+        result.end_time = self.exec_end_timestamp
+        result.cache_age = self.cache_age
         result.exception = self.exception
         result.output = output
-        return result
\ No newline at end of file
+        return result
+
+    def get_skipped_result(self) -> CmdTaskResult:
+        """ Get the result of the task not run, whose future is cancelled or never set """
+        result = CmdTaskResult()
+        result.queue_time = 0.0
+        result.exec_time = 0.0
+        result.start_time = None
+        result.end_time = None
+        result.exception = None
+        result.output = ""
+        result.skipped = True
+        return result
+
+
+class BatchTask(Task):
+    """ Batch of command tasks, run one by one by the session without other tasks in between
+
+    Each command task keeps its own timeout and result. The batch stops at the first failed
+    command unless continue_on_error, the futures of the commands not run are cancelled.
+    """
+    tasks: List[CmdTask]
+    continue_on_error: bool
+    # the commands are order-independent, and run grouped by vsys and mode
+    reorder: bool
+    # vsys and mode transitions saved by reordering, None if not reordered
+    transitions_saved: Optional[int]
+    context_id: str
+
+    def __init__(self, tasks: List[CmdTask], continue_on_error: bool = False, future: Future = None,
+                 priority: Priority = Priority.NORMAL, deadline: float = None, reorder: bool = False):
+        super().__init__(timeout=sum(task.timeout for task in tasks), future=future, priority=priority,
+                         deadline=deadline)
+        self.tasks = tasks
+        self.continue_on_error = continue_on_error
+        self.reorder = reorder
+        self.transitions_saved = None
+        self.context_id = correlation_id.get()
+
+    def __str__(self):
+        return f"[batch of {len(self.tasks)} cmds]"
+
+    def reorder_tasks(self, vsys: str, mode: Mode) -> None:
+        """ Reorder the tasks from the current vsys and mode, see plan_tasks """
+        self.tasks, self.transitions_saved = plan_tasks(self.tasks, vsys, mode)
+
+    def set_enqueue_timestamp(self):
+        super().set_enqueue_timestamp()
+        for task in self.tasks:
+            task.enqueue_timestamp = self.enqueue_timestamp
+
+    def set_dequeue_timestamp(self):
+        super().set_dequeue_timestamp()
+        for task in self.tasks:
+            task.dequeue_timestamp = self.dequeue_timestamp
+
+    def set_result(self, exception: BaseError = None):
+        self.set_exec_end_timestamp()
+        self.exception = exception
+        if self.future and not self.future.done():
+            self.future.set_result(None)
+
+def count_transitions(tasks: List[CmdTask], vsys: str = None, mode: Mode = None) -> int:
+    """ Count the vsys and mode switches to run the tasks in order from the vsys and mode """
+    count = 0
+    for task in tasks:
+        if task.vsys and task.vsys != vsys:
+            count += 1
+            vsys = task.vsys
+        if task.mode and task.mode != mode:
+            count += 1
+            mode = task.mode
+    return count
+
+
+def plan_tasks(tasks: List[CmdTask], vsys: str = None, mode: Mode = None) -> Tuple[List[CmdTask], int]:
+    """ Group the order-independent tasks by vsys and mode to save the switches
+
+    The groups run from the current vsys and mode, the next group is the one with the fewest switches
+    from the last group. The groups of the same switches, as well as the tasks of a group, keep their
+    order. The task without vsys or mode runs in the current one.
+    :param vsys: the current vsys, None if unknown
+    :param mode: the current mode, None if unknown
+    :return: the tasks reordered, and the switches saved
+    """
+    groups: Dict[Tuple[str, Mode], List[CmdTask]] = {}
+    for task in tasks:
+        groups.setdefault((task.vsys or vsys, task.mode or mode), []).append(task)
+    ordered = []
+    state = (vsys, mode)
+    while groups:
+        state = min(groups, key=lambda key: (key[0] != state[0]) + (key[1] != state[1]))
+        ordered.extend(groups.pop(state))
+    return ordered, count_transitions(tasks, vsys, mode) - count_transitions(ordered, vsys, mode)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+from asyncio import Queue
+from collections import deque
+from typing import Deque, Dict
+
+from netdriver_agent.client.task import Priority, Task
+
+
+class QueueTimeStats:
+    """ Queue time of the tasks dispatched, for one priority """
+    count: int
+    total: float
+    max: float
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, queue_time: float) -> None:
+        self.count += 1
+        self.total += queue_time
+        self.max = max(self.max, queue_time)
+
+    def merge(self, other: "QueueTimeStats") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def __str__(self) -> str:
+        return f"{self.count} tasks, avg {self.avg:.3f}s, max {self.max:.3f}s"
+
+
+# number of the recent exec times kept to estimate the wait of a new task
+_EXEC_TIME_HISTORY = 32
+
+
+class TaskQueue(Queue):
+    """ Queue of the session tasks, dispatched by strict priority with starvation protection
+
+    The tasks of a higher priority are dispatched first, and the tasks of the same priority in
+    FIFO order. Once the head task of a lower priority has waited for starvation_time, it is
+    dispatched first, so the bulk jobs still make progress under a steady stream of interactive
+    commands. The maxsize bounds the tasks of all the priorities.
+
+    The exec times of the recent tasks are kept, to estimate how long a new task waits.
+    """
+    _queues: Dict[Priority, Deque[Task]]
+    _stats: Dict[Priority, QueueTimeStats]
+    _starvation_time: float
+    _exec_times: Deque[float]
+
+    def __init__(self, maxsize: int = 0, starvation_time: float = 30) -> None:
+        """
+        :param starvation_time: float, max queue time of the head task of a lower priority, before
+            it is dispatched ahead of the higher priorities (unit: seconds), 0 disables it
+        """
+        self._starvation_time = starvation_time
+        self._stats = {priority: QueueTimeStats() for priority in Priority}
+        self._exec_times = deque(maxlen=_EXEC_TIME_HISTORY)
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        self._queues = {priority: deque() for priority in Priority}
+
+    def qsize(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def empty(self) -> bool:
+        return not self.qsize()
+
+    def _put(self, task: Task) -> None:
+        self._queues[getattr(task, "priority", Priority.NORMAL)].append(task)
+
+    def _get(self) -> Task:
+        now = time.time()
+        queue = None
+        if self._starvation_time:
+            starving = [queue for queue in self._queues.values()
+                        if queue and now - self._enqueue_time(queue[0], now) >= self._starvation_time]
+            if starving:
+                queue = min(starving, key=lambda queue: self._enqueue_time(queue[0], now))
+        if queue is None:
+            # priorities are iterated from the highest
+            queue = next(queue for queue in self._queues.values() if queue)
+        task = queue.popleft()
+        self._stats[getattr(task, "priority", Priority.NORMAL)].add(now - self._enqueue_time(task, now))
+        return task
+
+    @staticmethod
+    def _enqueue_time(task: Task, now: float) -> float:
+        return getattr(task, "enqueue_timestamp", now)
+
+    def qsize_of(self, priority: Priority) -> int:
+        return len(self._queues[priority])
+
+    @property
+    def stats(self) -> Dict[Priority, QueueTimeStats]:
+        """ Queue time of the tasks dispatched, by priority """
+        return self._stats
+
+    def record_exec_time(self, exec_time: float) -> None:
+        """ Record the exec time of a task dispatched by the queue """
+        self._exec_times.append(exec_time)
+
+    def estimate_wait(self, priority: Priority, busy: bool = False) -> float:
+        """ Estimate the queue time of a new task by the average exec time of the recent tasks
+
+        :param priority: priority of the new task, which waits for the tasks of the same or higher
+            priorities
+        :param busy: a task is running, the new task waits for it too
+        :return: the estimated wait (unit: seconds), 0 if no exec time is recorded
+        """
+        if not self._exec_times:
+            return 0.0
+        ahead = 1 if busy else 0
+        for queue_priority, queue in self._queues.items():
+            ahead += len(queue)
+            if queue_priority == priority:
+                break
+        return ahead * sum(self._exec_times) / len(self._exec_times)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import codecs
+import re
+from typing import Optional, Tuple
+
+from netdriver_core.exception.errors import ChannelError, LoginFailed
+from netdriver_core.log import logman
+from netdriver_core.utils import telnet
+from netdriver_core.utils.telnet import TelnetParser
+
+
+log = logman.logger
+
+_DEFAULT_READ_SIZE = 8192
+# a bare CR must be sent as CR NUL
+_RE_BARE_CR = re.compile(rb"\r(?!\n)")
+
+
+class TelnetClientConnection:
+    """ Telnet client connection
+
+    Provides the parts of asyncssh.SSHClientConnection used by SSHChannel, so a telnet session
+    shares the read loop of SSH. The options are negotiated while reading: the server may echo
+    and suppress go ahead, the client reports the terminal size by NAWS and the terminal type.
+    """
+    _PATTERN_LOGIN = re.compile(r"(login|username|user name)\s*:\s*$", re.IGNORECASE)
+    _PATTERN_PASSWORD = re.compile(r"password\s*:\s*$", re.IGNORECASE)
+    _PATTERN_LOGIN_FAILED = re.compile(
+        r"(login incorrect|login invalid|authentication failed|access denied|bad password)", re.IGNORECASE)
+    _TERM_TYPE = b"ANSI"
+    # options enabled by the client and the server
+    _LOCAL_OPTIONS = (telnet.NAWS, telnet.TTYPE, telnet.SGA)
+    _REMOTE_OPTIONS = (telnet.ECHO, telnet.SGA)
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 encoding: str = "utf-8", term_size: Tuple[int, int] = (),
+                 logger: object = None) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._encoding = encoding
+        self._term_size = term_size
+        self._logger = logger or log
+        self._parser = TelnetParser()
+        self._local = set()
+        self._remote = set()
+        # the data read after the password, returned by the first read of the shell
+        self._pending = b''
+        self._process = None
+
+    @classmethod
+    async def connect(cls, host: str, port: int = 23, username: str = None, password: str = None,
+                      encoding: str = "utf-8", term_size: Tuple[int, int] = (),
+                      connect_timeout: float = 10.0, login_timeout: float = 3.0,
+                      logger: object = None) -> "TelnetClientConnection":
+        """ Open a telnet connection and login
+
+        :raises asyncio.TimeoutError: if connect or login timeout
+        :raises LoginFailed: if the login prompt shows up again after the password
+        """
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+        conn = cls(reader, writer, encoding=encoding, term_size=term_size, logger=logger)
+        try:
+            await asyncio.wait_for(conn._login(username, password), login_timeout)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def create_process(self, term_type: str = None, term_size: Tuple[int, int] = None,
+                             encoding: Optional[str] = ()) -> "TelnetClientProcess":
+        """ Get the interactive shell of the connection
+
+        The terminal type and size are negotiated on connect, so term_type and term_size are ignored.
+        :param encoding: the encoding of the shell, None for bytes, the connection encoding by default
+        :raises ChannelError: if the shell is already created, telnet has only one shell per connection
+        """
+        if self._process:
+            raise ChannelError("Telnet connection supports only one shell.")
+        self._process = TelnetClientProcess(self, self._encoding if encoding == () else encoding)
+        return self._process
+
+    async def _login(self, username: str, password: str) -> None:
+        text = ''
+        password_sent = False
+        while True:
+            data = await self.read_raw(_DEFAULT_READ_SIZE)
+            if not data:
+                raise LoginFailed("Telnet connection closed during login.")
+            text = (text + str(data, self._encoding, 'replace'))[-1024:]
+            if password_sent:
+                self._pending += data
+                if self._PATTERN_LOGIN_FAILED.search(text) or self._PATTERN_LOGIN.search(text) or \
+                        self._PATTERN_PASSWORD.search(text):
+                    raise LoginFailed("Telnet login failed, please check your username and password.")
+                if text.strip():
+                    self._logger.info("Telnet login done")
+                    return
+            elif self._PATTERN_LOGIN.search(text):
+                self._logger.debug("Got telnet login prompt, sending username")
+                self.write(f"{username or ''}\r\n".encode(self._encoding))
+                text = ''
+            elif self._PATTERN_PASSWORD.search(text):
+                self._logger.debug("Got telnet password prompt, sending password")
+                self.write(f"{password or ''}\r\n".encode(self._encoding))
+                text = ''
+                password_sent = True
+
+    async def read_raw(self, n: int) -> bytes:
+        """ Read the data bytes, the commands are handled on the way """
+        while True:
+            chunk = await self._reader.read(n)
+            if not chunk:
+                return b''
+            data, cmds = self._parser.feed(chunk)
+            for cmd, option, payload in cmds:
+                self._negotiate(cmd, option, payload)
+            if data:
+                return data
+
+    async def read(self, n: int = -1) -> bytes:
+        """ Read the data bytes, the data left by login is returned first """
+        if self._pending:
+            data, self._pending = self._pending, b''
+            return data
+        return await self.read_raw(n if n > 0 else _DEFAULT_READ_SIZE)
+
+    def _send(self, data: bytes) -> None:
+        if not self._writer.is_closing():
+            self._writer.write(data)
+
+    def _negotiate(self, cmd: int, option: int, payload: bytes) -> None:
+        """ Answer the option negotiation, only when the state of the option changes """
+        if cmd == telnet.DO:
+            if option in self._LOCAL_OPTIONS and not (option == telnet.NAWS and not self._term_size):
+                if option not in self._local:
+                    self._local.add(option)
+                    self._send(telnet.build_cmd(telnet.WILL, option))
+                if option == telnet.NAWS:
+                    self._send(telnet.build_naws(*self._term_size))
+            else:
+                self._send(telnet.build_cmd(telnet.WONT, option))
+        elif cmd == telnet.DONT:
+            if option in self._local:
+                self._local.discard(option)
+                self._send(telnet.build_cmd(telnet.WONT, option))
+        elif cmd == telnet.WILL:
+            if option in self._REMOTE_OPTIONS:
+                if option not in self._remote:
+                    self._remote.add(option)
+                    self._send(telnet.build_cmd(telnet.DO, option))
+            else:
+                self._send(telnet.build_cmd(telnet.DONT, option))
+        elif cmd == telnet.WONT:
+            if option in self._remote:
+                self._remote.discard(option)
+                self._send(telnet.build_cmd(telnet.DONT, option))
+        elif cmd == telnet.SB and option == telnet.TTYPE and payload[:1] == bytes([telnet.TTYPE_SEND]):
+            self._send(telnet.build_sb(telnet.TTYPE, bytes([telnet.TTYPE_IS]) + self._TERM_TYPE))
+
+    def write(self, data: bytes) -> None:
+        """ Write the data bytes """
+        self._send(_RE_BARE_CR.sub(b"\r\x00", telnet.escape_iac(data)))
+
+    def at_eof(self) -> bool:
+        return not self._pending and self._reader.at_eof()
+
+    def is_closed(self) -> bool:
+        return self._writer.is_closing()
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class TelnetClientProcess:
+    """ Interactive shell of a telnet connection
+
+    Provides the parts of asyncssh.SSHClientProcess used by SSHChannel. The process is its own stdin
+    and stdout. Reads return str decoded by the encoding, or bytes if the encoding is None.
+    """
+
+    def __init__(self, conn: TelnetClientConnection, encoding: Optional[str] = "utf-8") -> None:
+        self._conn = conn
+        self._encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace') if encoding else None
+
+    @property
+    def stdin(self) -> "TelnetClientProcess":
+        return self
+
+    @property
+    def stdout(self) -> "TelnetClientProcess":
+        return self
+
+    async def read(self, n: int = -1) -> str | bytes:
+        data = await self._conn.read(n)
+        if self._decoder:
+            return self._decoder.decode(data, final=not data)
+        return data
+
+    def write(self, data: str | bytes) -> None:
+        if isinstance(data, str):
+            data = data.encode(self._encoding or "utf-8")
+        self._conn.write(data)
+
+    def at_eof(self) -> bool:
+        return self._conn.at_eof()
+
+    def is_closing(self) -> bool:
+        return self._conn.is_closed()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -4,15 +4,21 @@
 import os
 from dependency_injector.containers import DeclarativeContainer
 from dependency_injector.providers import Factory, Configuration
-from netdriver_agent.handlers.cmd_req_handler import CommandRequestHandler
+from netdriver_agent.handlers.cmd_req_handler import CommandRequestHandler, CommandStreamRequestHandler
 from netdriver_agent.handlers.conn_req_handler import ConnectRequestHandler
+from netdriver_agent.handlers.session_req_handler import (SessionListRequestHandler, SessionPrewarmRequestHandler,
+    SessionRecordsRequestHandler)
 
 
 class Container(DeclarativeContainer):
     """ IoC container of netdriver agent. """
     config = Configuration()
     cmd_req_handler = Factory(CommandRequestHandler)
+    cmd_stream_req_handler = Factory(CommandStreamRequestHandler)
     conn_req_handler = Factory(ConnectRequestHandler)
+    session_records_req_handler = Factory(SessionRecordsRequestHandler)
+    session_prewarm_req_handler = Factory(SessionPrewarmRequestHandler)
+    session_list_req_handler = Factory(SessionListRequestHandler)
 
 
 def get_config_file() -> str:
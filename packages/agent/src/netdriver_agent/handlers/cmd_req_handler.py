@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import asyncio
+import time
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List
 
-from netdriver_agent.models.cmd import CommandRequest, CommandResponse, CommandRet
+from fastapi.responses import StreamingResponse
+
+from netdriver_agent.models.cmd import (Command, CommandEndRecord, CommandOutputRecord, CommandRequest,
+    CommandResponse, CommandRet, CommandStatusRecord)
 from netdriver_agent.client.channel import ReadBuffer
 from netdriver_agent.client.pool import SessionPool
 from netdriver_agent.client.session import Session
-from netdriver_agent.client.task import CmdTaskResult
+from netdriver_agent.client.stream import OutputStream
+from netdriver_agent.client.task import CmdTask, CmdTaskResult, plan_tasks
 from netdriver_core.exception.error_code import ErrorCode
 from netdriver_core.exception.errors import ExecError
 from netdriver_textfsm import TextFSMParser
@@ -16,6 +22,15 @@ from netdriver_core import utils
 
 class CommandRequestHandler:
 
+    @staticmethod
+    def _format_time(timestamp: float) -> str:
+        dt = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+        return dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    @staticmethod
+    def _cache_info(task_ret: CmdTaskResult) -> dict:
+        return {"from_cache": task_ret.cache_age is not None, "cache_age": task_ret.cache_age}
+
     async def handle(self, command: CommandRequest) -> CommandResponse:
         """ Handle command request """
         if not command:
@@ -23,19 +38,42 @@ class CommandRequestHandler:
 
         result: List[CommandRet] = []
         total_time: float = 0.0
+        transitions_saved = None
         output = ReadBuffer()
 
+        # the deadline counts from the arrival of the request
+        deadline = time.time() + command.deadline if command.deadline else None
         try:
-            session: Session = await SessionPool().get_session(**vars(command))
+            # the session of the device already in the mode of the first command is preferred
+            session: Session = await SessionPool().get_session(
+            **vars(command), mode=command.commands[0].mode if command.commands else None)
             cmd_total: int = len(command.commands)
             cmd_exec_except: int = 0
             cmd_exec_success: int = 0
-            for cmd in command.commands:
-                task_ret: CmdTaskResult = await session.send_cmd(
-                    cmd.command, command.vsys, cmd.mode, timeout=command.timeout, detail_output=cmd.detail_output)
-                output.append(f"\n===== start exec cmd: [{cmd.command}] {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')} =====\n")
+            tasks = [CmdTask(cmd.command, vsys=command.vsys, mode=cmd.mode, timeout=command.timeout,
+                             detail_output=cmd.detail_output, pipeline_window=cmd.pipeline_window,
+                             exec_channel=cmd.exec_channel, priority=command.priority, use_cache=cmd.use_cache)
+                     for cmd in command.commands]
+            if cmd_total > 1:
+                # run the commands as one task, no other request runs in between
+                task_rets = await session.send_cmds(tasks, continue_on_error=command.continue_on_error,
+                                                    priority=command.priority, deadline=deadline,
+                                                    reorder=command.reorder)
+                transitions_saved = task_rets[0].transitions_saved if task_rets else None
+            else:
+                task_rets = [await session.send_cmd(
+                    tasks[0].command, tasks[0].vsys, tasks[0].mode, timeout=tasks[0].timeout,
+                    detail_output=tasks[0].detail_output, exec_channel=tasks[0].exec_channel,
+                    pipeline_window=tasks[0].pipeline_window, priority=command.priority, deadline=deadline,
+                    use_cache=tasks[0].use_cache)]
+            error = None
+            # the results are one per command, in the order of the commands
+            for cmd, task_ret in zip(command.commands, task_rets):
+                if task_ret.skipped:
+                    continue
+                output.append(f"\n===== start exec cmd: [{cmd.command}] {self._format_time(task_ret.start_time)} =====\n")
                 output.append(task_ret.output)
-                output.append(f"\n===== end exec cmd: [{cmd.command}] {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')} =====\n")
+                output.append(f"\n===== end exec cmd: [{cmd.command}] {self._format_time(task_ret.end_time)} =====\n")
                 # If catch_error is False, the error will be raised
                 if task_ret.exception:
                     cmd_exec_except += 1
@@ -43,30 +81,142 @@ class CommandRequestHandler:
                     if isinstance(task_ret.exception, ExecError):
                         result.append(CommandRet(ret_code=task_ret.exception.code, command=cmd.command,
                                                  ret=utils.terminal.simulate_output(task_ret.output)))
-                        task_ret.exception.output = output.get_data()
                     if not command.continue_on_error or cmd_total < 2:
-                        raise task_ret.exception
+                        # with reorder, the commands after it in the request may have run before it
+                        error = error or task_ret.exception
                 else:
                     cmd_exec_success += 1
                     # raw
                     if cmd.type == "raw":
                         result.append(CommandRet(ret_code="OK", command=cmd.command,
-                                                 ret=utils.terminal.simulate_output(task_ret.output)))
+                                                 ret=utils.terminal.simulate_output(task_ret.output),
+                                                 **self._cache_info(task_ret)))
                     # textfsm
                     elif cmd.type == "textfsm":
                         parsed_objs = TextFSMParser(cmd.template).parse(task_ret.output)
-                        result.append(CommandRet(ret_code="OK", command=cmd.command, ret=parsed_objs))
+                        result.append(CommandRet(ret_code="OK", command=cmd.command, ret=parsed_objs,
+                                                 **self._cache_info(task_ret)))
                     else:
                         raise ValueError(f"Unsupported command type: {cmd.type}")
                 total_time += task_ret.get_total_time()
+            if error:
+                if isinstance(error, ExecError):
+                    error.output = output.get_data()
+                raise error
 
             handled_output = utils.terminal.simulate_output(output.get_data())
             if cmd_total > 1 and cmd_exec_except > 0 :
                 msg = f"Batch exec: {cmd_exec_success}/{cmd_total} succeeded, {cmd_exec_except} failures!"
                 return CommandResponse.from_error(code=ErrorCode.EXEC_CMD_PARTIAL_ERROR, msg=msg, output=handled_output,
-                                                  result=result, time=total_time)
-            return CommandResponse.ok(time=total_time, result=result, output=handled_output)
+                                                  result=result, time=total_time, transitions_saved=transitions_saved)
+            return CommandResponse.ok(time=total_time, result=result, output=handled_output,
+                                      transitions_saved=transitions_saved)
         except ExecError as exec:
             handled_output = utils.terminal.simulate_output(exec.output)
             return CommandResponse.from_error(
-                code=exec.code, msg=exec.message, output=handled_output, result=result, time=total_time)
+                code=exec.code, msg=exec.message, output=handled_output, result=result, time=total_time,
+                transitions_saved=transitions_saved)
+
+
+class CommandStreamRequestHandler:
+    """ Handle the command request, and stream the output of the commands as it is read
+
+    The response is NDJSON, one record per line: the output records of a command, then its status
+    record, and an end record at last. The output of the raw commands is not kept by the agent,
+    the textfsm commands are parsed once finished, so only their status records are sent.
+    """
+
+    async def handle(self, command: CommandRequest) -> StreamingResponse:
+        """ Handle command request, the errors before the first command runs are raised """
+        if not command:
+            raise ValueError("CommandRequest is empty")
+
+        # the deadline counts from the arrival of the request
+        deadline = time.time() + command.deadline if command.deadline else None
+        session: Session = await SessionPool().get_session(
+            **vars(command), mode=command.commands[0].mode if command.commands else None)
+        loop = asyncio.get_running_loop()
+        tasks = [CmdTask(cmd.command, vsys=command.vsys, mode=cmd.mode, timeout=command.timeout,
+                         detail_output=cmd.detail_output, pipeline_window=cmd.pipeline_window,
+                         exec_channel=cmd.exec_channel, priority=command.priority,
+                         future=loop.create_future(), use_cache=cmd.use_cache,
+                         output_stream=OutputStream(command.encode) if cmd.type == "raw" else None)
+                 for cmd in command.commands]
+        commands = command.commands
+        transitions_saved = None
+        if command.reorder:
+            # the records follow the order the commands run, so it is planned ahead of the stream
+            cmd_of_task = {id(task): cmd for cmd, task in zip(commands, tasks)}
+            tasks, transitions_saved = plan_tasks(tasks)
+            commands = [cmd_of_task[id(task)] for task in tasks]
+        return StreamingResponse(self._stream(session, command, commands, tasks, deadline, transitions_saved),
+                                 media_type="application/x-ndjson")
+
+    @staticmethod
+    async def _send(session: Session, command: CommandRequest, tasks: List[CmdTask], deadline: float) -> None:
+        try:
+            # run the commands as one task, no other request runs in between
+            await session.send_cmds(tasks, continue_on_error=command.continue_on_error,
+                                    priority=command.priority, deadline=deadline)
+        finally:
+            # the commands not run end their streams
+            for task in tasks:
+                task.cacnel()
+
+    async def _stream(self, session: Session, command: CommandRequest, commands: List[Command],
+                      tasks: List[CmdTask], deadline: float, transitions_saved: int = None) -> AsyncIterator[str]:
+        sender = asyncio.create_task(self._send(session, command, tasks, deadline))
+        cmd_total: int = len(tasks)
+        cmd_exec_success: int = 0
+        total_time: float = 0.0
+        error = None
+        aborted = False
+        try:
+            for cmd, task in zip(commands, tasks):
+                if task.output_stream:
+                    async for data in task.output_stream:
+                        yield CommandOutputRecord(command=cmd.command, data=data).model_dump_json() + "\n"
+                await asyncio.wait([task.future])
+                if task.future.cancelled():
+                    # the commands left are not run, after an error or as the sending failed
+                    aborted = error is None
+                    break
+                task_ret = await task.get_result()
+                total_time += task_ret.get_total_time()
+                ret = task_ret.output
+                if task_ret.exception:
+                    error = task_ret.exception
+                    ret = utils.terminal.simulate_output(ret) if ret else ""
+                    yield CommandStatusRecord(ret_code=getattr(error, "code", ErrorCode.SERVER_ERROR),
+                                              msg=str(error), command=cmd.command, ret=ret,
+                                              time=task_ret.get_total_time()).model_dump_json() + "\n"
+                    continue
+                cmd_exec_success += 1
+                if cmd.type == "textfsm":
+                    ret = TextFSMParser(cmd.template).parse(task_ret.output)
+                yield CommandStatusRecord(ret_code="OK", command=cmd.command, ret=ret or "",
+                                          time=task_ret.get_total_time(),
+                                          **CommandRequestHandler._cache_info(task_ret)).model_dump_json() + "\n"
+            await asyncio.wait([sender])
+            if not sender.cancelled() and sender.exception():
+                error = sender.exception()
+                aborted = True
+            elif aborted:
+                error = ExecError("The commands were not run to the end")
+            if error is None:
+                end = CommandEndRecord(code="OK", time=total_time, transitions_saved=transitions_saved)
+            elif cmd_total > 1 and command.continue_on_error and not aborted:
+                end = CommandEndRecord(
+                    code=ErrorCode.EXEC_CMD_PARTIAL_ERROR, time=total_time, transitions_saved=transitions_saved,
+                    msg=f"Batch exec: {cmd_exec_success}/{cmd_total} succeeded, "
+                        f"{cmd_total - cmd_exec_success} failures!")
+            else:
+                end = CommandEndRecord(code=getattr(error, "code", ErrorCode.SERVER_ERROR),
+                                       msg=str(error), time=total_time, transitions_saved=transitions_saved)
+            yield end.model_dump_json() + "\n"
+        finally:
+            if not sender.done():
+                # the client is gone, the commands go on without streaming the output
+                for task in tasks:
+                    if task.output_stream:
+                        task.output_stream.abort()
@@ -8,7 +8,7 @@ from fastapi.responses import JSONResponse
 from netdriver_agent.models.cmd import CommandResponse
 from netdriver_agent.models.common import CommonResponse
 from netdriver_core.exception.error_code import ErrorCode
-from netdriver_core.exception.errors import BaseError, ExecError
+from netdriver_core.exception.errors import BaseError, ExecError, QueueFullError
 from netdriver_core.log import logman
 from netdriver_core.utils.terminal import simulate_output
 
@@ -50,10 +50,14 @@ async def exec_error_handler(request: Request, exc: ExecError):
 
 async def netdriver_errors_handler(request: Request, exc: BaseError):
     log.error(f"NetDriver error: {exc}")
+    headers = None
+    if isinstance(exc, QueueFullError) and exc.retry_after is not None:
+        headers = {"Retry-After": str(exc.retry_after)}
     return JSONResponse(
         status_code=exc.status_code,
         content=jsonable_encoder(
-            CommonResponse.from_error(exc.code, msg=exc.message))
+            CommonResponse.from_error(exc.code, msg=exc.message)),
+        headers=headers
     )
 
 
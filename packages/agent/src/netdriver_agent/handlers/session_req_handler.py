@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from netdriver_agent.client.pool import SessionPool
+from netdriver_agent.client.session import gen_session_key
+from netdriver_agent.models.session import (PrewarmRequest, PrewarmResponse, SessionListRequest,
+    SessionListResponse, SessionRecordsRequest, SessionRecordsResponse)
+
+
+class SessionRecordsRequestHandler:
+
+    async def handle(self, request: SessionRecordsRequest) -> SessionRecordsResponse:
+        """ Handle session records request, the session is not created if it does not exist """
+        if not request:
+            raise ValueError("SessionRecordsRequest is empty")
+
+        sessions = SessionPool().find_sessions(request.protocol, request.username, request.ip, request.port)
+        if not sessions:
+            raise ValueError(
+                f"Session {gen_session_key(request.protocol, request.username, request.ip, request.port)} not found")
+        if len(sessions) == 1:
+            return SessionRecordsResponse.ok(records=sessions[0].dump_io_records())
+        # the records of each session of the device, by its member index
+        return SessionRecordsResponse.ok(records="\n".join(
+            f"########## Member {session.member} ##########\n{session.dump_io_records()}" for session in sessions))
+
+
+class SessionPrewarmRequestHandler:
+
+    async def handle(self, request: PrewarmRequest) -> PrewarmResponse:
+        """ Handle session prewarm request, the sessions are created in the background """
+        if not request:
+            raise ValueError("PrewarmRequest is empty")
+
+        progress = SessionPool().prewarm(request.get_devices())
+        return PrewarmResponse.ok(total=progress.total, created=progress.created, failed=progress.failed,
+                                  pending=progress.pending)
+
+
+class SessionListRequestHandler:
+
+    async def handle(self, request: SessionListRequest) -> SessionListResponse:
+        """ Handle session list request, only the sessions of the page are waited for """
+        if not request:
+            raise ValueError("SessionListRequest is empty")
+
+        pool = SessionPool()
+        stats = pool.get_stats()
+        total, sessions = await pool.list_sessions(request.offset, request.limit)
+        return SessionListResponse.ok(devices=stats.devices, total=total, busy=stats.busy, queued=stats.queued,
+                                      sessions=sessions)
@@ -18,6 +18,7 @@ from netdriver_agent.api import rest
 from netdriver_agent.containers import container
 from netdriver_agent.handlers.error_handlers import global_exception_handlers
 from netdriver_agent.client.pool import SessionPool
+from netdriver_agent.models.session import PrewarmRequest
 from netdriver_agent.plugins.engine import PluginEngine
 from netdriver_core.log import logman
 
@@ -42,6 +43,16 @@ async def on_startup() -> None:
     PluginEngine()
     # load session manager
     SessionPool(config=container.config)
+    # pre-warm the sessions of the inventory
+    inventory = container.config.session.prewarm.inventory()
+    if inventory:
+        try:
+            devices = PrewarmRequest.from_yaml(inventory).get_devices()
+        except Exception as e:
+            log.error(f"Load inventory {inventory} failed, skip pre-warming: {e}")
+        else:
+            log.info(f"Pre-warming {len(devices)} sessions of inventory {inventory}")
+            SessionPool().prewarm(devices)
 
 
 async def on_shutdown() -> None:
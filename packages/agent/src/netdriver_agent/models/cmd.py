@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import List, Any
+from typing import List, Any, Literal, Optional
 from asgi_correlation_id import correlation_id
 from pydantic import BaseModel, Field
 
+from netdriver_agent.client.task import Priority
 from netdriver_agent.models.common import CommonRequest, CommonResponse
 from netdriver_core.dev.mode import Mode
 
@@ -13,28 +14,59 @@ class CommandRet(BaseModel):
     command: str = Field("", description="Command", examples=["show version"])
     ret: Any = Field("", description="Return value, raw type returns string, textfsm returns list",
                      examples=["1.1.1"])
+    from_cache: bool = Field(False, description="Whether the output is served from the result cache",
+                             examples=[False])
+    cache_age: Optional[float] = Field(None, description="Age of the cached output (seconds), None if the "
+                                       "command is run on the device", examples=[None, 3.2])
 
 
 class CommandResponse(CommonResponse):
     time: float = Field(0.0, description="Execution time (seconds)", examples=[0])
     result: List[CommandRet] | None = Field(None, description="Command execution result")
     output: str | None = Field(None, description="Device CLI output")
+    transitions_saved: Optional[int] = Field(
+        None, description="Vsys and mode switches saved by reordering the commands, None if not reordered",
+        examples=[None, 2])
 
     @classmethod
     def from_error(cls, code: str, msg: str, cor_id: str = None, time: float=0.0, result:
-                   list = None, output: str = None) -> "CommandResponse":
+                   list = None, output: str = None, transitions_saved: int = None) -> "CommandResponse":
         """ Create a CommandResponse object with error """
         _cor_id = cor_id if cor_id else correlation_id.get()
         return cls(code=code, msg=msg, correlation_id=_cor_id, time=time, result=result,
-                   output=output)
+                   output=output, transitions_saved=transitions_saved)
 
     @classmethod
     def ok(cls, time: float, result: List[CommandRet], output: str,
-           cor_id: str = None) -> "CommandResponse":
+           cor_id: str = None, transitions_saved: int = None) -> "CommandResponse":
         """ Create a CommandResponse object with ok """
         _cor_id = cor_id if cor_id else correlation_id.get()
         return cls(code="OK", msg="", correlation_id=_cor_id, time=time, result=result,
-                   output=output)
+                   output=output, transitions_saved=transitions_saved)
+
+
+class CommandOutputRecord(BaseModel):
+    """ Output record of the streaming cmd api, a chunk of normalized output lines """
+    type: Literal["output"] = Field("output", description="Record type")
+    command: str = Field(description="Command", examples=["show version"])
+    data: str = Field(description="Device CLI output, the records of a command join to its output",
+                      examples=["hostname# show version\n"])
+
+
+class CommandStatusRecord(CommandRet):
+    """ Status record of the streaming cmd api, sent once a command finishes """
+    type: Literal["status"] = Field("status", description="Record type")
+    msg: str = Field("", description="Detail message about the error code.", examples=[""])
+    time: float = Field(0.0, description="Queue and execution time of the command (seconds)", examples=[0])
+
+
+class CommandEndRecord(CommonResponse):
+    """ Last record of the streaming cmd api """
+    type: Literal["end"] = Field("end", description="Record type")
+    time: float = Field(0.0, description="Execution time (seconds)", examples=[0])
+    transitions_saved: Optional[int] = Field(
+        None, description="Vsys and mode switches saved by reordering the commands, None if not reordered",
+        examples=[None, 2])
 
 
 class Command(BaseModel):
@@ -48,9 +80,40 @@ class Command(BaseModel):
         True, description="Whether to show detailed output, such as auto switch mode and vsys log.",
         examples=[True, False]
     )
+    exec_channel: Optional[bool] = Field(
+        None, description="Whether to run the read-only command over an SSH exec channel without queuing, "
+        "if the plugin supports it. Default to the exec_channel option of the session profile.",
+        examples=[None, True, False]
+    )
+    pipeline_window: Optional[int] = Field(
+        None, ge=0, description="Max lines of the multi-line command written ahead of the prompts, "
+        "0 or 1 runs the lines one by one. Default to the pipeline_window option of the session profile.",
+        examples=[None, 0, 32]
+    )
+    use_cache: bool = Field(
+        True, description="Whether to serve the output from the result cache of the session, if the command "
+        "has a ttl in the result_cache of the session profile. The output run on the device is cached anyway.",
+        examples=[True, False]
+    )
 
 
 class CommandRequest(CommonRequest):
     """ Command Request Model """
     continue_on_error: bool = Field(False, description="continue on error", examples=[True, False])
+    reorder: bool = Field(
+        False, description="The commands are order-independent. They run grouped by vsys and mode to save the "
+        "switches, the results are still in the order of the commands.", examples=[False, True]
+    )
+    priority: Priority = Field(
+        Priority.NORMAL, description="Priority of the commands in the session queue, high for the interactive "
+        "commands, low for the bulk jobs. A low priority task waits at most queue_starvation_time of the "
+        "session profile before it runs ahead of the higher priorities.",
+        examples=["high", "normal", "low"]
+    )
+    deadline: Optional[float] = Field(
+        None, gt=0, description="Time the client waits for the result (unit: seconds), from the arrival of the "
+        "request. The request is rejected with a Retry-After hint if the commands are estimated not to start "
+        "in time, and dropped if they do not start in time. Default to no deadline.",
+        examples=[None, 60]
+    )
     commands: List[Command]
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Any, Dict, List, Optional
+from asgi_correlation_id import correlation_id
+from dependency_injector.providers import Configuration
+from pydantic import BaseModel, Field, IPvAnyAddress
+
+from netdriver_agent.models.common import CommonRequest, CommonResponse
+
+
+class SessionRecordsRequest(BaseModel):
+    """ Session Records Request Model, the session is identified by the session key """
+
+    protocol: str = Field(
+        "ssh", description="Protocol", pattern="ssh|telnet", examples=["ssh"])
+    ip: IPvAnyAddress = Field(
+        description="Device IP, support IPv4 and IPv6.", examples=["192.168.60.198", "a::1"])
+    port: int = Field(22, description="Port", examples=[22], ge=1, le=65535)
+    username: str = Field(..., description="Username", examples=["admin"])
+
+
+class SessionRecordsResponse(CommonResponse):
+    """ Session Records Response Model """
+
+    records: str = Field("", description="Recent I/O of the session and its shells, from the oldest",
+                         examples=["[shell 0]\n10:00:00.000 >>> 'show version\\n'"])
+
+    @classmethod
+    def ok(cls, records: str, cor_id: str = None) -> "SessionRecordsResponse":
+        """ Create a SessionRecordsResponse object with ok """
+        _cor_id = cor_id if cor_id else correlation_id.get()
+        return cls(code="OK", msg="", correlation_id=_cor_id, records=records)
+
+
+class PrewarmDevice(CommonRequest):
+    """ Device of which the session is pre-warmed """
+
+    hot: bool = Field(False, description="Keep the session warm, it is created again once closed by "
+                      "idle timeout, expiration or a broken connection.", examples=[False])
+
+
+class PrewarmRequest(BaseModel):
+    """ Session Prewarm Request Model, also the format of the inventory file """
+
+    devices: List[PrewarmDevice] = Field(
+        [], description="Devices to pre-warm, empty to get the progress only")
+
+    def get_devices(self) -> List[Dict[str, Any]]:
+        """ Get the parameters of SessionPool.prewarm """
+        return [device.model_dump() for device in self.devices]
+
+    @classmethod
+    def from_yaml(cls, path: str) -> "PrewarmRequest":
+        """ Load the inventory file
+        :raises ValueError: if the file is not a valid inventory
+        """
+        inventory = Configuration()
+        inventory.from_yaml(path, required=True)
+        return cls.model_validate(inventory() or {})
+
+
+class PrewarmResponse(CommonResponse):
+    """ Session Prewarm Response Model, the progress since the agent started """
+
+    total: int = Field(0, description="Sessions to pre-warm", examples=[10])
+    created: int = Field(0, description="Sessions created", examples=[8])
+    failed: int = Field(0, description="Sessions failed to create, see the agent log", examples=[1])
+    pending: int = Field(0, description="Sessions waiting or being created", examples=[1])
+
+    @classmethod
+    def ok(cls, total: int, created: int, failed: int, pending: int,
+           cor_id: str = None) -> "PrewarmResponse":
+        """ Create a PrewarmResponse object with ok """
+        _cor_id = cor_id if cor_id else correlation_id.get()
+        return cls(code="OK", msg="", correlation_id=_cor_id, total=total, created=created,
+                   failed=failed, pending=pending)
+
+
+class SessionListRequest(BaseModel):
+    """ Session List Request Model, a page of the sessions in the pool """
+
+    offset: int = Field(0, ge=0, description="Sessions skipped, by the order added to the pool", examples=[0])
+    limit: int = Field(100, ge=1, le=1000, description="Max sessions returned", examples=[100])
+
+
+class SessionInfo(BaseModel):
+    """ Display info of a session, in the order of Session.get_info_headers """
+
+    session: str = Field(description="Session key", examples=["ssh://admin@192.168.60.198:22"])
+    member: int = Field(0, description="Index of the session among the sessions of the device", examples=[0])
+    mode: Optional[str] = Field(None, description="Current mode", examples=["enable"])
+    vsys: Optional[str] = Field(None, description="Current vsys", examples=["default"])
+    alive: bool = Field(description="Connection is alive", examples=[True])
+    idle: bool = Field(description="No task queued or running", examples=[True])
+    queue_size: int = Field(0, description="Tasks queued on the session and its shells", examples=[0])
+    queue_time: str = Field("N/A", description="Queue time by priority (avg/max)",
+                            examples=["normal: 0.001/0.003s"])
+    create_time: str = Field(description="Create time", examples=["2025-10-31 10:23:30"])
+    last_use: str = Field("N/A", description="Last use time", examples=["2025-10-31 10:23:30"])
+
+
+class SessionListResponse(CommonResponse):
+    """ Session List Response Model, with the aggregated status of the pool """
+
+    devices: int = Field(0, description="Devices with sessions in the pool", examples=[2])
+    total: int = Field(0, description="Sessions in the pool", examples=[3])
+    busy: int = Field(0, description="Sessions with tasks queued or running", examples=[1])
+    queued: int = Field(0, description="Tasks queued or running on all the sessions", examples=[4])
+    sessions: List[SessionInfo] = Field([], description="Sessions of the page")
+
+    @classmethod
+    def ok(cls, devices: int, total: int, busy: int, queued: int, sessions: List[List[Any]],
+           cor_id: str = None) -> "SessionListResponse":
+        """ Create a SessionListResponse object with ok, the sessions are the display info rows """
+        _cor_id = cor_id if cor_id else correlation_id.get()
+        return cls(code="OK", msg="", correlation_id=_cor_id, devices=devices, total=total, busy=busy,
+                   queued=queued, sessions=[SessionInfo(**dict(zip(SessionInfo.model_fields, row)))
+                                            for row in sessions])
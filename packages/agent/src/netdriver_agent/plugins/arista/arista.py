@@ -17,6 +17,8 @@ class AristaBase(Base):
         description="Arista Base Plugin"
     )
 
+    _SUPPORT_EXEC_CHANNEL = True
+
     def get_union_pattern(self) -> re.Pattern:
         return AristaBase.PatternHelper.get_union_pattern()
 
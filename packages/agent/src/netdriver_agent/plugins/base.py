@@ -2,15 +2,35 @@
 # -*- coding: utf-8 -*-
 
 import abc
+import functools
 import re
+from typing import Any, Callable, Optional
+
 from netdriver_agent.client.channel import ReadBuffer
+from netdriver_agent.client.patterns import PATTERN_GETTERS, PatternSet
 from netdriver_core.dev.mode import Mode
 from netdriver_agent.client.session import Session
 from netdriver_core.exception.errors import ConfigFailed, DetectCurrentModeFailed, DisableFailed, EnableFailed, ExitConfigFailed, UnsupportedMode
+from netdriver_core.log import logman
 from netdriver_core.plugin.core import PluginCore
 from netdriver_core.utils.asyncu import async_timeout
 
 
+log = logman.logger
+
+
+def _original_getter(getter: Callable) -> Callable:
+    return getattr(getter, "__wrapped__", getter)
+
+
+def _shared_getter(getter: Callable, value: Any) -> Callable:
+    """ Create a getter returns the value, the original getter is kept as __wrapped__ """
+    @functools.wraps(_original_getter(getter))
+    def shared(self):
+        return value
+    return shared
+
+
 # pylint: disable=abstract-method
 class Base(Session, PluginCore):
     """ Base Plugin """
@@ -26,6 +46,59 @@ class Base(Session, PluginCore):
     _CANCEL_MORE_VSYS = _DEFAULT_VSYS
     _CANCEL_MORE_MODE = Mode.ENABLE
     _SUPPORTED_MODES = [Mode.CONFIG, Mode.ENABLE, Mode.LOGIN]
+    # compiled patterns of the plugin class, see on_registered
+    _patterns: Optional[PatternSet] = None
+
+    def __init__(self, *args, **kwargs):
+        if "_patterns" not in type(self).__dict__:
+            type(self).compile_patterns()
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def on_registered(cls) -> None:
+        """ Compile the patterns of the plugin class once it is registered
+
+        The patterns of a class referring to itself by name, e.g. XxxBase.PatternHelper, are
+        compiled once its module is loaded instead, as the name is not bound yet on registration.
+        """
+        try:
+            cls.compile_patterns(defer_on_name_error=True)
+        except NameError as e:
+            log.debug(f"Patterns of {cls} compiled once its module is loaded: {e}")
+
+    @classmethod
+    def on_loaded(cls) -> None:
+        """ Compile the patterns deferred on registration, see on_registered. The plugins not loaded
+        by the plugin engine are compiled on their first session
+        """
+        if "_patterns" not in cls.__dict__:
+            cls.compile_patterns()
+
+    @classmethod
+    def compile_patterns(cls, defer_on_name_error: bool = False) -> None:
+        """ Compile the patterns of the plugin class
+
+        The pattern getters of the class are replaced by the ones returning the compiled patterns,
+        which are immutable and shared by all the sessions of the class. The getters are left as is
+        if the patterns can not be compiled, e.g. a getter is not implemented.
+        :raises NameError: if defer_on_name_error and a getter refers to a name not bound yet
+        """
+        plugin = cls.__new__(cls)
+        getters = {name: _original_getter(getattr(cls, name)).__get__(plugin) for name in PATTERN_GETTERS}
+        try:
+            cls._patterns = PatternSet.compile(getters)
+        except NameError:
+            if defer_on_name_error:
+                raise
+            log.warning(f"Patterns of {cls} not compiled", exc_info=True)
+            cls._patterns = None
+            return
+        except Exception as e:
+            log.debug(f"Patterns of {cls} not compiled: {e}")
+            cls._patterns = None
+            return
+        for name, field in PATTERN_GETTERS.items():
+            setattr(cls, name, _shared_getter(getattr(cls, name), getattr(cls._patterns, field)))
 
     @abc.abstractmethod
     def get_mode_prompt_patterns(self) -> dict[Mode, re.Pattern]:
@@ -146,7 +219,7 @@ class Base(Session, PluginCore):
                     raise EnableFailed("Enable failed, got login prompt", output=output.get_data())
                 if pattern_enable_password and output.check_pattern(pattern_enable_password):
                     self._logger.info("Got enable password prompt, sending password")
-                    await self.write_channel(self.enable_password or '')
+                    await self.write_channel(self.enable_password or '', secret=True)
         except EnableFailed as e:
             raise e
         except Exception as e:
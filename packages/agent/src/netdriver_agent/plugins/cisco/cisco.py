@@ -21,6 +21,8 @@ class CiscoBase(Base):
         description="Cisco Base Plugin"
     )
 
+    _SUPPORT_EXEC_CHANNEL = True
+
     def get_union_pattern(self) -> re.Pattern:
         return CiscoBase.PatternHelper.get_union_pattern()
 
@@ -70,7 +72,7 @@ class CiscoBase(Base):
                     raise EnableFailed("Enable failed, got login prompt", output=output.get_data())
                 if pattern_enable_password and output.check_pattern(pattern_enable_password):
                     self._logger.info("Got enable password prompt, sending password")
-                    await self.write_channel(self.enable_password or '')
+                    await self.write_channel(self.enable_password or '', secret=True)
         except EnableFailed as e:
             raise e
         except Exception as e:
@@ -21,6 +21,7 @@ class CiscoASA(CiscoBase):
         )
 
     _CMD_CANCEL_MORE = "terminal pager 0"
+    _SUPPORT_EXEC_CHANNEL = False
     _CMD_MAX_TERMINAL_WIDTH = "terminal width 0"
     _is_set_max_terminal_width = False
 
@@ -42,6 +42,9 @@ class PluginEngine:
                     importlib.import_module(
                         f"netdriver_agent.plugins.{dir_name}.{plugin_name}")
             plugin_count = len(IPluginRegistry.plugin_registries)
+        for plugins in IPluginRegistry.plugin_registries.values():
+            for plugin in plugins:
+                plugin.on_loaded()
         log.info(f"Loaded {plugin_count} plugins.")
 
     def get_plugins(self) -> List:
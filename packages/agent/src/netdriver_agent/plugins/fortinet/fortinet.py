@@ -22,6 +22,9 @@ class FortinetBase(Base):
     _CMD_CANCEL_MORE = "config system console\nset output standard\nend"
     _CMD_END = "end"
     _SUPPORTED_MODES = [Mode.ENABLE]
+    _READ_ONLY_CMD_PATTERN = re.compile(r"^(show|get)\b", re.IGNORECASE)
+    # the config is changed by the config blocks and the execute commands in the enable mode
+    _WRITE_CMD_PATTERN = re.compile(r"^(config|edit|set|unset|delete|purge|execute)\b", re.IGNORECASE)
 
     def get_union_pattern(self) -> re.Pattern:
         return FortinetBase.PatternHelper.get_union_pattern()
@@ -51,10 +54,16 @@ class FortinetBase(Base):
             if vsys_match and vsys_match.group(1) != self._vsys:
                 await self.write_channel(self._CMD_END)
                 prompt = await self._get_prompt(write_return=False)
+        self._decide_state(prompt)
+        return prompt
+
+    def _decide_state(self, prompt: str) -> None:
+        """ Decide current mode and vsys by the prompt
+        @override
+        """
         # keep decide vsys before decide mode
         self.decide_current_vsys(prompt)
         self.decide_current_mode(prompt)
-        return prompt
 
     class PatternHelper:
         """ Inner class for patterns """
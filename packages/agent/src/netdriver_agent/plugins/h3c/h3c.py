@@ -23,6 +23,8 @@ class H3CBase(Base):
     _CMD_EXIT_CONFIG = "return"
     _CMD_CANCEL_MORE = "screen-length disable"
     _SUPPORTED_MODES = [Mode.CONFIG, Mode.ENABLE]
+    _READ_ONLY_CMD_PATTERN = re.compile(r"^dis(play)?\b", re.IGNORECASE)
+    _WRITE_CMD_PATTERN = re.compile(r"^(system-view|save|reset|undo|reboot|startup)\b", re.IGNORECASE)
 
     def get_union_pattern(self) -> re.Pattern:
         return H3CBase.PatternHelper.get_union_pattern()
@@ -23,6 +23,8 @@ class HuaweiBase(Base):
     _CMD_EXIT_CONFIG = "return"
     _CMD_CANCEL_MORE = "screen-length 0 temporary"
     _SUPPORTED_MODES = [Mode.CONFIG, Mode.ENABLE]
+    _READ_ONLY_CMD_PATTERN = re.compile(r"^dis(play)?\b", re.IGNORECASE)
+    _WRITE_CMD_PATTERN = re.compile(r"^(system-view|save|reset|undo|reboot|startup)\b", re.IGNORECASE)
 
     def get_union_pattern(self) -> re.Pattern:
         return HuaweiBase.PatternHelper.get_union_pattern()
@@ -56,11 +58,16 @@ class HuaweiBase(Base):
         # prevent the last execution error from not exiting
         await self.write_channel(self._CMD_EXIT_CONFIG)
         prompt = await self._get_prompt()
+        self._decide_state(prompt)
+        return prompt
 
+    def _decide_state(self, prompt: str) -> None:
+        """ Decide current mode and vsys by the prompt
+        @override
+        """
         # keep decide vsys before decide mode
         self.decide_current_vsys(prompt)
         self.decide_current_mode(prompt)
-        return prompt
 
     class PatternHelper:
         """ Inner class for patterns """
@@ -22,6 +22,9 @@ class JuniperBase(Base):
     _CMD_CONFIG = "configure private"
     _CMD_EXIT_CONFIG = "exit"
     _SUPPORTED_MODES = [Mode.CONFIG, Mode.ENABLE]
+    _SUPPORT_EXEC_CHANNEL = True
+    _WRITE_CMD_PATTERN = re.compile(r"^(configure|edit|set|delete|commit|rollback|load|request|clear)\b",
+                                    re.IGNORECASE)
 
     def get_union_pattern(self) -> re.Pattern:
         return JuniperBase.PatternHelper.get_union_pattern()
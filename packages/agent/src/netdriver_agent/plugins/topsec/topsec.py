@@ -20,6 +20,8 @@ class TopSecBase(Base):
     )
 
     _SUPPORTED_MODES = [Mode.ENABLE]
+    # the object comes before the show, e.g. network route show
+    _READ_ONLY_CMD_PATTERN = re.compile(r"^(\S+\s+)*show\b", re.IGNORECASE)
 
     def get_union_pattern(self) -> re.Pattern:
         return TopSecBase.PatternHelper.get_union_pattern()
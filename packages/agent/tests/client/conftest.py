@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.client import pool as pool_module
+from netdriver_agent.client.pool import SessionPool
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+
+
+class _Session(HillstoneBase):
+    """ Session logged in at once without a connection, or failed with login_error after a while,
+    and records the concurrent closes
+    """
+    login_error: Exception = None
+    closing = {"now": 0, "max": 0}
+
+    @classmethod
+    async def create(cls, *args, **kwargs) -> "_Session":
+        session = cls(*args, **kwargs)
+        session._init_task_done = asyncio.get_running_loop().create_future()
+        if cls.login_error:
+            session._init_task = asyncio.create_task(session._async_init())
+            return session
+        session._init_task_done.set_result(None)
+        session._init_task = session._init_task_done
+        session._mode = Mode.ENABLE
+        return session
+
+    async def _async_init(self):
+        try:
+            await asyncio.sleep(0.1)
+            raise self.login_error
+        finally:
+            self._init_task_done.set_result(True)
+
+    async def close(self) -> None:
+        _Session.closing["now"] += 1
+        _Session.closing["max"] = max(_Session.closing["max"], _Session.closing["now"])
+        await asyncio.sleep(0.01)
+        _Session.closing["now"] -= 1
+
+
+@pytest_asyncio.fixture(loop_scope="function")
+async def create_pool(monkeypatch):
+    """ Create the pool by the session config in the test, the monitor runs on the loop of the test and is
+    cancelled once the test is done
+    """
+    SessionPool._instance = None
+    _Session.closing = {"now": 0, "max": 0}
+    monkeypatch.setattr(pool_module, "PluginEngine", lambda: SimpleNamespace(get_plugin=lambda *args: _Session))
+
+    def create(session: dict = None, login_error: Exception = None) -> SessionPool:
+        """
+        :param session: dict, the session config, the sessions are checked every hour by default
+        :param login_error: Exception, the error of the sessions failed to log in
+        """
+        monkeypatch.setattr(_Session, "login_error", login_error)
+        config = Configuration()
+        config.from_dict({"session": {"check_interval": 3600, **(session or {})}})
+        return SessionPool(config)
+
+    yield create
+    monitors = [task for task in asyncio.all_tasks() if task.get_name() == "SessionPoolMonitor"]
+    for task in monitors:
+        task.cancel()
+    await asyncio.gather(*monitors, return_exceptions=True)
+    SessionPool._instance = None
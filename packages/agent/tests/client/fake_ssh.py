@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+from types import SimpleNamespace
+
+
+class FakeStream:
+    """ Fake asyncssh stream returns the chunks one by one and records the writes """
+
+    def __init__(self, chunks: list = None, interval: float = 0):
+        self.chunks = list(chunks or [])
+        self.writes = []
+        self.reads = 0
+        self.interval = interval
+
+    async def read(self, n: int):
+        if self.interval:
+            await asyncio.sleep(self.interval)
+        self.reads += 1
+        return self.chunks.pop(0)
+
+    def at_eof(self) -> bool:
+        return not self.chunks
+
+    def write(self, data: bytes) -> None:
+        self.writes.append(data)
+
+
+class FakeProcess:
+    def __init__(self, chunks: list, interval: float = 0):
+        self.stdout = FakeStream(chunks, interval)
+        self.stdin = FakeStream()
+
+        self.closed = False
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeConn:
+    """ Fake asyncssh connection creates the processes with the given chunks """
+
+    def __init__(self, chunks: list = None, outputs: dict = None):
+        self.chunks = chunks or []
+        self.processes = []
+        self.closed = False
+        self.runs = []
+        self.outputs = outputs or {}
+
+    async def create_process(self, **kwargs) -> FakeProcess:
+        process = FakeProcess(self.chunks)
+        self.processes.append(process)
+        return process
+
+    async def run(self, command: str, **kwargs) -> SimpleNamespace:
+        """ Run the command over an exec channel, returns the outputs of the commands """
+        self.runs.append(command)
+        return SimpleNamespace(stdout=self.outputs.get(command, ''), stderr='', exit_status=0)
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        self.closed = True
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from netdriver_agent.client.task import CmdTask
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+from netdriver_core.exception.errors import ExecCmdError
+
+
+_ERROR = "            ^-----unrecognized keyword\r\n"
+
+
+def _session(outputs: dict, monkeypatch) -> HillstoneBase:
+    """ Create a session runs the commands by the outputs, and records the probes, switches and commands """
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session.probes = 0
+    session.switches = []
+    session.executed = []
+
+    async def decide_init_state():
+        session.probes += 1
+        session._mode = Mode.ENABLE
+        return "hostname# "
+
+    async def switch_mode(mode):
+        session.switches.append(mode)
+        session._mode = mode
+        return "config\r\nhostname(config)# " if mode == Mode.CONFIG else "end\r\nhostname# "
+
+    async def exec_cmd(command):
+        session.executed.append(command)
+        await asyncio.sleep(0)
+        return outputs[command]
+
+    monkeypatch.setattr(session, "_decide_init_state", decide_init_state)
+    monkeypatch.setattr(session, "switch_mode", switch_mode)
+    monkeypatch.setattr(session, "exec_cmd", exec_cmd)
+    session._cmd_task_consumer = asyncio.create_task(session._consume_cmd_queue())
+    return session
+
+
+async def _stop(session: HillstoneBase) -> None:
+    session._is_closing = True
+    session._cmd_task_consumer.cancel()
+    await asyncio.gather(session._cmd_task_consumer, return_exceptions=True)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_batch_runs_without_interleaving(monkeypatch):
+    session = _session({
+        "show clock": "show clock\r\n10:00:00\r\nhostname# ",
+        "show version": "show version\r\n5.5\r\nhostname# ",
+        "show this": "show this\r\nhostname(config)# ",
+        "show arp": "show arp\r\nhostname# ",
+    }, monkeypatch)
+    try:
+        tasks = [CmdTask("show clock", mode=Mode.ENABLE), CmdTask("show version", mode=Mode.ENABLE),
+                 CmdTask("show this", mode=Mode.CONFIG)]
+        batch = asyncio.create_task(session.send_cmds(tasks))
+        await asyncio.sleep(0)
+        single = asyncio.create_task(session.send_cmd("show arp", mode=Mode.ENABLE))
+        results = await batch
+        await single
+        assert session.executed == ["show clock", "show version", "show this", "show arp"]
+        # the prompt is probed once, and the mode is switched only when it differs
+        assert session.probes == 1
+        assert session.switches == [Mode.CONFIG, Mode.ENABLE]
+
+        assert [result.exception for result in results] == [None, None, None]
+        assert results[1].output == "hostname# show version\r\n5.5\r\nhostname# "
+        assert results[0].end_time <= results[1].start_time <= results[1].end_time <= results[2].start_time
+        assert all(result.exec_time >= 0 and result.queue_time >= 0 for result in results)
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_batch_stops_on_error(monkeypatch):
+    session = _session({
+        "show clock": "show clock\r\n10:00:00\r\nhostname# ",
+        "show foo": "show foo\r\n" + _ERROR + "hostname# ",
+        "show version": "show version\r\n5.5\r\nhostname# ",
+    }, monkeypatch)
+    try:
+        commands = ["show foo", "show clock", "show version"]
+        results = await session.send_cmds([CmdTask(command) for command in commands])
+        assert [result.skipped for result in results] == [False, True, True]
+        assert isinstance(results[0].exception, ExecCmdError)
+        assert session.executed == ["show foo"]
+
+        results = await session.send_cmds([CmdTask(command) for command in commands], continue_on_error=True)
+        assert [type(result.exception) for result in results] == [ExecCmdError, type(None), type(None)]
+        assert session.executed == ["show foo"] + commands
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_batch_reorder_by_mode(monkeypatch):
+    session = _session({
+        "show clock": "show clock\r\n10:00:00\r\nhostname# ",
+        "show this": "show this\r\nhostname(config)# ",
+        "show version": "show version\r\n5.5\r\nhostname# ",
+        "show that": "show that\r\nhostname(config)# ",
+    }, monkeypatch)
+    try:
+        commands = [("show clock", Mode.ENABLE), ("show this", Mode.CONFIG), ("show version", Mode.ENABLE),
+                    ("show that", Mode.CONFIG)]
+        results = await session.send_cmds([CmdTask(command, mode=mode) for command, mode in commands],
+                                          reorder=True)
+        assert session.executed == ["show clock", "show version", "show this", "show that"]
+        assert session.switches == [Mode.CONFIG]
+        # the results are in the order of the commands
+        assert all(f"# {command}\r\n" in result.output for result, (command, _) in zip(results, commands))
+        assert all(result.transitions_saved == 2 for result in results)
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_batch_reorder_stops_on_error(monkeypatch):
+    session = _session({
+        "show clock": "show clock\r\n10:00:00\r\nhostname# ",
+        "show foo": "show foo\r\n" + _ERROR + "hostname(config)# ",
+        "show version": "show version\r\n5.5\r\nhostname# ",
+        "show that": "show that\r\nhostname(config)# ",
+    }, monkeypatch)
+    try:
+        commands = [("show foo", Mode.CONFIG), ("show clock", Mode.ENABLE), ("show that", Mode.CONFIG),
+                    ("show version", Mode.ENABLE)]
+        session._mode = Mode.ENABLE
+        results = await session.send_cmds([CmdTask(command, mode=mode) for command, mode in commands],
+                                          reorder=True)
+        # the failed command runs in the middle of the reordered batch, the one after it is skipped
+        assert session.executed == ["show clock", "show version", "show foo"]
+        # the results are still one per command, in the order of the commands
+        assert [result.skipped for result in results] == [False, False, True, False]
+        assert isinstance(results[0].exception, ExecCmdError)
+        assert "# show foo\r\n" in results[0].output
+        assert "# show clock\r\n" in results[1].output and results[1].exception is None
+        assert results[2].output == "" and results[2].exception is None
+        assert "# show version\r\n" in results[3].output and results[3].exception is None
+    finally:
+        await _stop(session)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+
+import pytest
+
+from netdriver_agent.client.channel import BytesReadBuffer, BytesSSHChannel, to_bytes_pattern
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+_UNION = HillstoneBase.PatternHelper.get_union_pattern()
+_MORE = HillstoneBase.PatternHelper.get_more_pattern()
+
+
+def create_channel(chunks: list[bytes], encode: str = "utf-8") -> BytesSSHChannel:
+    channel = BytesSSHChannel(FakeConn(), FakeProcess(chunks), logger=logman.logger, encode=encode)
+    channel._read_buffer_size = 8192
+    channel._read_channel_until_timeout = 1
+    return channel
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_to_bytes_pattern():
+    assert to_bytes_pattern(_UNION, "utf-8").search(b"hostname# ")
+    assert to_bytes_pattern(_UNION, "utf-8").flags & re.MULTILINE
+    assert to_bytes_pattern(re.compile(r"错误：.+"), "utf-8") is None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encode", ["utf-8", "gb18030"])
+async def test_multi_byte_char_split_across_chunks(encode: str):
+    data = "hostname# show address\r\n地址簿 中文\r\nhostname# ".encode(encode)
+    split = data.index("中".encode(encode)) + 1
+    output = BytesReadBuffer(cmd="show address", encode=encode)
+    output.append(data[:split])
+    assert not output.check_pattern(_UNION)
+    output.append(data[split:])
+    matched = output.check_pattern(_UNION)
+    assert matched
+    assert matched.group().strip() == "hostname#"
+    assert output.get_data() == data.decode(encode)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_prompt_before_echo_is_ignored():
+    output = BytesReadBuffer(cmd="show version")
+    output.append(b"hostname# \r\n")
+    assert not output.check_pattern(_UNION)
+    output.append(b"hostname# show version\r\nVersion 5.5\r\nhostname# ")
+    assert output.check_pattern(_UNION)
+    assert not output.check_pattern(_UNION)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_read_channel_until_handles_more():
+    channel = create_channel([
+        b"hostname# show config\r\nline 1\r\n --More-- ",
+        b"\r\nline 2\r\n",
+        "描述\r\nhostname# ".encode("utf-8"),
+    ])
+    output = await channel.read_channel_until("show config", _UNION, _MORE, " ")
+    assert output == "hostname# show config\r\nline 1\r\n --More-- \r\nline 2\r\n描述\r\nhostname# "
+    assert channel._terminal.stdin.writes == [b" "]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_read_channel_keeps_incomplete_char():
+    data = "中文".encode("gb18030")
+    channel = create_channel([data[:1], data[1:]], encode="gb18030")
+    assert await channel.read_channel() == ""
+    assert await channel.read_channel() == "中文"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_read_str_fallback_with_coalescing():
+    # the pattern can not be matched on bytes, so the output is read as str
+    union = re.compile(f"{_UNION.pattern}|错误：.+", _UNION.flags)
+    data = ["hostname# show log\r\n".encode(), b"x" * 100 + b"\r\n"] + ["日志\r\n".encode()] * 20 + [b"hostname# "]
+    channel = BytesSSHChannel(FakeConn(), FakeProcess(list(data), interval=0.01), logger=logman.logger,
+                              coalesce_min_size=64, coalesce_quiet_time=0.05)
+    channel._read_buffer_size = 8192
+    channel._read_channel_until_timeout = 0.1
+    # the timeout of the caller applies rather than the read timeout of the profile
+    output = await channel.read_channel_until("show log", union, _MORE, " ", timeout=5)
+    assert output == b"".join(data).decode("utf-8")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client import channel as channel_module
+from netdriver_agent.client.channel import SSHChannel
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+_UNION = HillstoneBase.PatternHelper.get_union_pattern()
+_MORE = HillstoneBase.PatternHelper.get_more_pattern()
+_CHUNKS = ["hostname# show log\r\n", "x" * 100 + "\r\n"] + ["log line\r\n"] * 50 + ["hostname# "]
+
+
+def create_channel(chunks: list, interval: float = 0, **kwargs) -> SSHChannel:
+    channel = SSHChannel(FakeConn(), FakeProcess(chunks, interval), logger=logman.logger, **kwargs)
+    channel._read_buffer_size = 8192
+    channel._read_channel_until_timeout = 5
+    return channel
+
+
+@pytest.fixture
+def count_checks(monkeypatch):
+    counter = {"checks": 0}
+    check_pattern = channel_module.ReadBuffer.check_pattern
+
+    def _check_pattern(self, pattern, is_update_checkpos=True):
+        counter["checks"] += 1
+        return check_pattern(self, pattern, is_update_checkpos)
+
+    monkeypatch.setattr(channel_module.ReadBuffer, "check_pattern", _check_pattern)
+    return counter
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_no_coalescing_by_default(count_checks):
+    channel = create_channel(_CHUNKS)
+    assert await channel.read_channel_until("show log", _UNION, _MORE, " ") == "".join(_CHUNKS)
+    assert channel._terminal.stdout.reads == len(_CHUNKS)
+    # union and more pattern for every chunk but the last one
+    assert count_checks["checks"] == len(_CHUNKS) * 2 - 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_coalesce_large_output(count_checks):
+    channel = create_channel(_CHUNKS, coalesce_min_size=64, coalesce_quiet_time=0.05)
+    assert await channel.read_channel_until("show log", _UNION, _MORE, " ") == "".join(_CHUNKS)
+    assert channel._terminal.stdout.reads == len(_CHUNKS)
+    # the first two chunks are checked one by one, then the small chunks are coalesced
+    assert count_checks["checks"] < 20
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_coalesce_stops_at_quiet_point():
+    channel = create_channel(_CHUNKS[:3] + _CHUNKS[-1:], interval=0.01,
+                             coalesce_min_size=64, coalesce_quiet_time=0.001)
+    output = await channel.read_channel_until("show log", _UNION, _MORE, " ")
+    assert output == "".join(_CHUNKS[:3] + _CHUNKS[-1:])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client.channel import CmdEchoMatcher, ReadBuffer, get_cmd_echo_matcher
+from netdriver_agent.plugins.array import ArrayBase
+from netdriver_agent.plugins.cisco import CiscoBase
+from netdriver_agent.plugins.fortinet import FortinetBase
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_agent.plugins.juniper import JuniperBase
+from netdriver_agent.plugins.topsec import TopSecBase
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pattern, cmd, line", [
+    # plain echo
+    (HillstoneBase.PatternHelper.get_union_pattern(), "show version", "hostname# show version\r\n"),
+    # Topsec output extra ' \r' char
+    (TopSecBase.PatternHelper.get_union_pattern(), "show system", "TopsecOS# show sys \rtem\r\n"),
+    # Fortinet output extra ' \x08' char
+    (FortinetBase.PatternHelper.get_union_pattern(), "show system", "FGT # show sys \x08tem\r\n"),
+    # Juniper removes the extra spaces of the input
+    (JuniperBase.PatternHelper.get_union_pattern(), "show  configuration", "admin@srx> show configuration\r\n"),
+    # Fortinet input Chinese and output octal char
+    (FortinetBase.PatternHelper.get_union_pattern(), 'set name "中文"',
+     'FGT # set name "\\344\\270\\255\\346\\226\\207"\r\n'),
+    # Topsec chinese escape failed, character ignored
+    (HillstoneBase.PatternHelper.get_union_pattern(), "set name 中文abc", "hostname# set name ��abc\r\n"),
+    # Cisco display ultra wide
+    (CiscoBase.PatternHelper.get_union_pattern(), "access-list outside extended permit ip any any",
+     "ciscoasa# access-list outside extended permit i$\r\n"),
+    # Array display ultra wide
+    (ArrayBase.PatternHelper.get_union_pattern(), "aaa map group \"San Francisco VPN Group\" \"g-SF-VPN\"",
+     "vpndg(config)$aaa map group \"San Francisco VPN$\r\n"),
+])
+async def test_cmd_displayed(pattern, cmd, line):
+    assert CmdEchoMatcher(cmd, "utf-8").match(pattern, line)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pattern, cmd, line", [
+    (HillstoneBase.PatternHelper.get_union_pattern(), "show version", "hostname# \r\n"),
+    (HillstoneBase.PatternHelper.get_union_pattern(), "show version", "Version 5.5R8\r\n"),
+    (HillstoneBase.PatternHelper.get_union_pattern(), "set name 中文abc", "hostname# set name ��xyz\r\n"),
+    (CiscoBase.PatternHelper.get_union_pattern(), "show run", " " * 1000 + "\r\n"),
+])
+async def test_cmd_not_displayed(pattern, cmd, line):
+    assert not CmdEchoMatcher(cmd, "utf-8").match(pattern, line)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_strip_prompt():
+    pattern = HillstoneBase.PatternHelper.get_union_pattern()
+    assert CmdEchoMatcher.strip_prompt(pattern, "hostname# show version") == "show version"
+    assert CmdEchoMatcher.strip_prompt(pattern, "show version") == "show version"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_matcher_is_cached_per_command():
+    assert get_cmd_echo_matcher("show version", "utf-8") is get_cmd_echo_matcher("show version", "utf-8")
+    assert get_cmd_echo_matcher("show version", "utf-8") is not get_cmd_echo_matcher("show clock", "utf-8")
+    assert ReadBuffer(cmd="show version", encode="utf-8")._echo_matcher is \
+        get_cmd_echo_matcher("show version", "utf-8")
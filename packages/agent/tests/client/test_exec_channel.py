@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+from asyncssh import ChannelOpenError
+
+from netdriver_agent.client.channel import SSHChannel
+from netdriver_agent.client.task import CmdTask
+from netdriver_agent.plugins.arista import AristaBase
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+from netdriver_core.exception.errors import ExecCmdError
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+_VERSION = "Arista vEOS\r\nSoftware image version: 4.31.2F\r\n"
+
+
+def _session(plugin=AristaBase, profile: dict = None, outputs: dict = None):
+    session = plugin(ip="192.168.1.1", username="admin", password="admin",
+                     vendor=plugin.info.vendor, model="eos", version="4.31.2F")
+    session._session_profile = {"exec_channel": True, **(profile or {})}
+    session._channel = SSHChannel(FakeConn(outputs=outputs), FakeProcess([]), logger=logman.logger)
+    session._exec_mode = session._mode = Mode.ENABLE
+    return session
+
+
+@pytest.mark.unit
+def test_can_exec_read_only_commands():
+    session = _session()
+    assert session._can_exec(CmdTask("show version"))
+    assert session._can_exec(CmdTask("show version", vsys="default", mode=Mode.ENABLE))
+    # the commands need a mode or vsys switch, or change the device
+    assert not session._can_exec(CmdTask("show version", mode=Mode.CONFIG))
+    assert not session._can_exec(CmdTask("show version", vsys="vsys1"))
+    session._vsys = "vsys1"
+    assert not session._can_exec(CmdTask("show version"))
+    session._vsys = session._DEFAULT_VSYS
+    assert not session._can_exec(CmdTask("hostname eos"))
+    assert not session._can_exec(CmdTask("show version\nshow clock"))
+    # the option of the command overrides the profile
+    assert not session._can_exec(CmdTask("show version"), exec_channel=False)
+    assert not _session(profile={"exec_channel": False})._can_exec(CmdTask("show version"))
+    assert _session(profile={"exec_channel": False})._can_exec(CmdTask("show version"), exec_channel=True)
+    # the plugin does not support exec channels
+    assert not _session(plugin=HillstoneBase)._can_exec(CmdTask("show version"))
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_send_cmd_over_exec_channel():
+    session = _session(outputs={"show version": _VERSION, "show foo": "% Invalid input\r\n"})
+    result = await session.send_cmd("show version")
+    assert result.output == _VERSION
+    assert result.exception is None
+    assert result.queue_time < 0.01
+    assert session._channel._conn.runs == ["show version"]
+    assert session._cmd_queue.empty()
+
+    result = await session.send_cmd("show foo")
+    assert isinstance(result.exception, ExecCmdError)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_exec_channel_rejected():
+    session = _session()
+
+    async def reject(command, **kwargs):
+        raise ChannelOpenError(1, "exec not allowed")
+
+    session._channel._conn.run = reject
+    assert not await session._exec_cmd_task_over_exec(CmdTask("show version"))
+    # falls back to the interactive shell for the later commands
+    assert not session._can_exec(CmdTask("show version"))
+
+
+@pytest.mark.unit
+def test_can_exec_in_default_vsys_of_plugin(monkeypatch):
+    session = _session()
+    monkeypatch.setattr(session, "_DEFAULT_VSYS", "root")
+    session._vsys = "root"
+    assert session._can_exec(CmdTask("show version", vsys="root"))
+    assert not session._can_exec(CmdTask("show version", vsys="default"))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client.channel import BytesSSHChannel, SSHChannel
+from netdriver_agent.client.recorder import FlightRecorder
+from netdriver_agent.plugins.arista import AristaBase
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+@pytest.mark.unit
+def test_recorder_drops_oldest_records():
+    recorder = FlightRecorder(capacity=10)
+    recorder.record(FlightRecorder.WRITE, "abcd")
+    recorder.record(FlightRecorder.READ, "efgh")
+    recorder.record(FlightRecorder.READ, "ijkl")
+    assert [data for _, _, data in recorder.records()] == ["efgh", "ijkl"]
+    # a chunk larger than the capacity keeps only its tail
+    recorder.record(FlightRecorder.READ, b"0123456789ABCDEF")
+    assert [data for _, _, data in recorder.records()] == [b"6789ABCDEF"]
+    recorder.clear()
+    assert len(recorder) == 0
+
+
+@pytest.mark.unit
+def test_recorder_disabled():
+    recorder = FlightRecorder(capacity=0)
+    recorder.record(FlightRecorder.READ, "data")
+    assert len(recorder) == 0
+    assert recorder.dump() == ""
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_channel_records_io():
+    channel = BytesSSHChannel(FakeConn(), FakeProcess([b"show clock\r\n", b"eos# "]), logger=logman.logger)
+    channel._read_buffer_size = 8192
+    await channel.write_channel("show clock\n")
+    await channel.read_channel()
+    await channel.read_channel()
+    records = channel.recorder.records()
+    assert [(direction, data) for _, direction, data in records] == [
+        (FlightRecorder.WRITE, "show clock\n"),
+        (FlightRecorder.READ, b"show clock\r\n"),
+        (FlightRecorder.READ, b"eos# "),
+    ]
+    dump = channel.recorder.dump()
+    assert dump.splitlines()[0].endswith(">>> 'show clock\\n'")
+    assert "\\r\\n" in dump
+    # the shells over the connection have their own recorders
+    shell = await channel.open_shell()
+    assert len(shell.recorder) == 0
+    assert shell.recorder.capacity == channel.recorder.capacity
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_session_dumps_records_on_failure(monkeypatch):
+    session = AristaBase(ip="192.168.1.1", username="admin", password="admin",
+                         vendor="arista", model="eos", version="4.31.2F")
+    session._session_profile = {"exec_channel": True}
+    session._channel = SSHChannel(FakeConn(outputs={"show foo": "% Invalid input\r\n"}), FakeProcess([]),
+                                  logger=logman.logger)
+    logged = []
+    monkeypatch.setattr(session, "_log_io_records", lambda task: logged.append(str(task)))
+
+    result = await session.send_cmd("show foo")
+    assert result.exception is not None
+    assert logged == ["[show foo|None|None|10]"]
+    dump = session.dump_io_records()
+    assert dump.startswith("[shell 0]")
+    assert "$$$ 'show foo'" in dump
+    assert "<<< '% Invalid input\\r\\n'" in dump
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_password_not_recorded():
+    session = AristaBase(ip="192.168.1.1", username="admin", password="admin", enable_password="Secret#123",
+                         vendor="arista", model="eos", version="4.31.2F")
+    session._channel = SSHChannel(FakeConn(), FakeProcess(["enable\r\nPassword: ", "\r\neos#"]),
+                                  logger=logman.logger)
+    session._channel._read_buffer_size = 8192
+    await session.enable()
+    assert session._channel._terminal.stdin.writes == ["enable\n", "Secret#123\n"]
+    dump = session.dump_io_records()
+    assert "Secret#123" not in dump
+    assert f">>> '{FlightRecorder.SECRET}'" in dump
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client.channel import BytesReadBuffer, ReadBuffer, SSHChannel
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+_UNION = HillstoneBase.PatternHelper.get_union_pattern()
+_MORE = HillstoneBase.PatternHelper.get_more_pattern()
+
+
+class CountingPattern:
+    """ Wrap a pattern to count the searched lines """
+
+    def __init__(self, pattern):
+        self._pattern = pattern
+        self.searches = 0
+
+    def search(self, *args):
+        self.searches += 1
+        return self._pattern.search(*args)
+
+    def match(self, *args):
+        return self._pattern.match(*args)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_learned_prompt_skips_pattern_on_output_lines():
+    pattern = CountingPattern(_UNION)
+    output = ReadBuffer(cmd="show log")
+    output.append("hostname# show log\r\n")
+    assert not output.check_learned_prompt("hostname#", pattern)
+    for _ in range(100):
+        output.append("log line\r\n" * 10)
+        assert not output.check_learned_prompt("hostname#", pattern)
+    output.append("hostname# ")
+    assert output.check_learned_prompt("hostname#", pattern)
+    # only the last line of every chunk is searched
+    assert pattern.searches < 110
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_learned_prompt_falls_back_to_pattern_on_changed_prompt():
+    output = ReadBuffer(cmd="configure")
+    output.append("hostname# configure\r\n")
+    assert not output.check_learned_prompt("hostname#", _UNION)
+    output.append("hostname(config)# ")
+    assert output.check_learned_prompt("hostname#", _UNION)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_learned_prompt_inside_output():
+    output = ReadBuffer(cmd="show ver")
+    output.append("hostname# show ver\r\n")
+    assert not output.check_learned_prompt("hostname#", _UNION)
+    output.append("Version 1.0\r\nhostname# \r\n%LINK-3-UPDOWN: interface up\r\n")
+    assert output.check_learned_prompt("hostname#", _UNION)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_learned_prompt_waits_for_echo():
+    output = ReadBuffer(cmd="show ver")
+    output.append("hostname# \r\n")
+    assert not output.check_learned_prompt("hostname#", _UNION)
+    output.append("hostname# show ver\r\nVersion 1.0\r\nhostname# ")
+    assert output.check_learned_prompt("hostname#", _UNION)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_learned_prompt_on_bytes():
+    output = BytesReadBuffer(cmd="show log")
+    output.append(b"hostname# show log\r\n")
+    assert not output.check_learned_prompt("hostname#", _UNION)
+    output.append(b"log line\r\n" * 100)
+    assert not output.check_learned_prompt("hostname#", _UNION)
+    output.append(b"hostname(config)# ")
+    assert output.check_learned_prompt("hostname#", _UNION)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_tail_pattern_handles_more():
+    output = BytesReadBuffer(cmd="show config")
+    output.append(b"hostname# show config\r\n")
+    assert not output.check_tail_pattern(_MORE)
+    output.append(b"line\r\n" * 100 + b" --More-- ")
+    assert output.check_tail_pattern(_MORE)
+    output.append(b"\r          \rline\r\n")
+    assert not output.check_tail_pattern(_MORE)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_read_channel_until_with_learned_prompt():
+    chunks = ["hostname# show config\r\n", "line\r\n" * 50 + " --More-- ", "line\r\n" * 50 + "hostname# "]
+    terminal = FakeProcess(chunks)
+    channel = SSHChannel(FakeConn(), terminal, logger=logman.logger)
+    channel._read_buffer_size = 8192
+    channel._read_channel_until_timeout = 1
+    output = await channel.read_channel_until("show config", _UNION, _MORE, " ", prompt="hostname#")
+    assert output == "".join(chunks)
+    assert terminal.stdin.writes == [" "]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from netdriver_agent.client.channel import Channel
+from netdriver_agent.client.stream import OutputStream
+from netdriver_agent.client.task import CmdTask
+from netdriver_agent.handlers.cmd_req_handler import CommandStreamRequestHandler
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+from netdriver_core.exception.errors import QueueFullError
+from netdriver_core.utils.terminal import simulate_output
+
+
+_OUTPUT = "show interface\r\n" + "".join(f"eth0/{i} up\r\r\n" for i in range(10)) + \
+    "\rprogress 50%\rprogress 100%\r\nhostname# "
+
+
+class _Channel(Channel):
+    """ Channel reads the output of a command in chunks """
+
+    def __init__(self, outputs: dict, chunk_size: int) -> None:
+        self._outputs = outputs
+        self._chunk_size = chunk_size
+        self._cmd = None
+
+    async def write_channel(self, data: str, secret: bool = False) -> None:
+        self._cmd = data.strip()
+
+    async def read_channel_until(self, cmd, union_pattern, more_pattern, more_cmd='', prompt=None,
+                                 timeout=10) -> str:
+        output = self._outputs[self._cmd]
+        for i in range(0, len(output), self._chunk_size):
+            await self._stream_output(output[i:i + self._chunk_size])
+        return output
+
+
+async def _read_all(stream: OutputStream) -> list:
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stream_normalizes_lines():
+    stream = OutputStream()
+    reader = asyncio.create_task(_read_all(stream))
+    for i in range(0, len(_OUTPUT), 7):
+        await stream.write(_OUTPUT[i:i + 7].encode())
+    stream.close()
+    chunks = await reader
+    # the lines split across chunks are sent once complete, the prompt on close
+    assert all(chunk.endswith("\n") for chunk in chunks[:-1])
+    assert chunks[-1] == "hostname# "
+    assert "".join(chunks) == simulate_output(_OUTPUT)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stream_backpressure():
+    stream = OutputStream(max_pending=2)
+    await stream.write("line 1\r\n")
+    writer = asyncio.create_task(stream.write("line 2\r\n"))
+    await asyncio.sleep(0)
+    # the writer waits until the client reads
+    assert not writer.done()
+    assert await stream.read() == "line 1\n"
+    await writer
+
+    # the writes after the client is gone are discarded
+    stream.abort()
+    await stream.write("line 3\r\n")
+    assert await stream.read() is None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_task_streams_output(monkeypatch):
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session._channel = _Channel({"show interface": _OUTPUT}, chunk_size=16)
+
+    async def decide_init_state():
+        session._mode = Mode.ENABLE
+        return "hostname# "
+
+    monkeypatch.setattr(session, "_decide_init_state", decide_init_state)
+    task = CmdTask("show interface", output_stream=OutputStream(),
+                   future=asyncio.get_running_loop().create_future())
+    reader = asyncio.create_task(_read_all(task.output_stream))
+    output = await session._exec_cmd_task(task)
+    chunks = await reader
+    # the output is streamed rather than kept, and the prompt is still tracked
+    assert output == ""
+    assert "".join(chunks) == simulate_output("hostname# " + _OUTPUT)
+    assert session._clean_prompt == "hostname# "
+    assert session._channel.output_stream is None
+    result = await task.get_result()
+    assert result.exception is None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stream_ends_with_send_error():
+    class _Session:
+        async def send_cmds(self, *args, **kwargs):
+            raise QueueFullError("queue is full")
+
+    loop = asyncio.get_running_loop()
+    commands = [SimpleNamespace(command=f"show {name}", type="raw") for name in ("version", "clock")]
+    tasks = [CmdTask(cmd.command, output_stream=OutputStream(), future=loop.create_future()) for cmd in commands]
+    request = SimpleNamespace(continue_on_error=True, priority=0)
+    records = [json.loads(record) async for record in
+               CommandStreamRequestHandler()._stream(_Session(), request, commands, tasks, None)]
+    # the commands not run end with the error of the sending rather than OK
+    assert records == [{"type": "end", "code": QueueFullError("").code, "msg": "queue is full", "time": 0.0,
+                        "transitions_saved": None}]
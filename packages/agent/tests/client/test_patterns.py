@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import sys
+
+import pytest
+
+from netdriver_agent.client.patterns import merge_patterns
+from netdriver_agent.plugins.engine import PluginEngine
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+from netdriver_core.plugin.core import IPluginRegistry
+
+
+@pytest.mark.unit
+def test_merge_patterns():
+    merged, = merge_patterns([re.compile(r"^Error: .+$", re.MULTILINE), re.compile(r"denied", re.IGNORECASE)],
+                             "error")
+    match = merged.search("ok\nDENIED\nError: failed")
+    assert match.group() == "DENIED" and match.lastgroup == "error1"
+    assert merged.search("Error: access denied").lastgroup == "error0"
+    # the flags are kept for each pattern
+    assert not merged.search("ok Error: failed")
+
+    patterns = [re.compile(r"(a)\1"), re.compile(r"b")]
+    assert merge_patterns(patterns, "error") == tuple(patterns)
+
+
+@pytest.mark.unit
+def test_patterns_shared_by_sessions():
+    plugin = PluginEngine().get_plugin("hillstone", "sg6000", "5.5")
+    kwargs = dict(ip="192.168.1.1", username="admin", password="admin", vendor="hillstone",
+                  model="sg6000", version="5.5")
+    first, second = plugin(**kwargs), plugin(**kwargs)
+    for name in ["get_union_pattern", "get_error_patterns", "get_ignore_error_patterns",
+                 "get_mode_prompt_patterns", "get_auto_confirm_patterns", "get_more_pattern"]:
+        assert getattr(first, name)() is getattr(second, name)(), name
+    assert len(first.get_error_patterns()) == 1
+    with pytest.raises(TypeError):
+        first.get_mode_prompt_patterns()[Mode.LOGIN] = re.compile("login>")
+    assert first.get_more_pattern()[1] == HillstoneBase._CMD_MORE
+    # the class referring to itself by name imported before the plugin engine is compiled on its
+    # first session
+    HillstoneBase(**kwargs)
+    assert HillstoneBase._patterns.union.search("hostname(config)# ")
+
+
+@pytest.fixture
+def plugin_registries():
+    registries = {key: list(plugins) for key, plugins in IPluginRegistry.plugin_registries.items()}
+    yield
+    IPluginRegistry.plugin_registries.clear()
+    IPluginRegistry.plugin_registries.update(registries)
+
+
+@pytest.mark.unit
+def test_patterns_of_subclass(plugin_registries):
+    class Plugin(HillstoneBase):
+        info = HillstoneBase.info
+        _CMD_MORE = "q"
+
+        def get_union_pattern(self) -> re.Pattern:
+            return re.compile(r"^host> $", re.MULTILINE)
+
+    plugin = Plugin(ip="192.168.1.1", username="admin", password="admin", vendor="hillstone",
+                    model="base", version="base")
+    assert plugin.get_union_pattern().pattern == r"^host> $"
+    assert plugin.get_more_pattern()[1] == "q"
+    assert plugin.get_error_patterns() == HillstoneBase._patterns.errors
+
+
+@pytest.mark.unit
+def test_plugins_compiled_on_load(plugin_registries, monkeypatch):
+    # load the cisco plugins again, as the plugin engine does on startup
+    for name in [name for name in sys.modules if name.startswith("netdriver_agent.plugins.cisco")]:
+        monkeypatch.delitem(sys.modules, name)
+    PluginEngine()._load_plugins()
+    cisco_base = sys.modules["netdriver_agent.plugins.cisco.cisco"].CiscoBase
+    assert cisco_base in IPluginRegistry.plugin_registries["cisco/base"]
+    # the vendor base class refers to itself by name, it is compiled once its module is loaded
+    assert cisco_base.__dict__.get("_patterns") is not None
+    assert cisco_base._patterns.union.search("router# ")
+    for plugins in IPluginRegistry.plugin_registries.values():
+        for plugin in plugins:
+            assert plugin.__dict__.get("_patterns") is not None, plugin
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client.channel import PromptSplitter, SSHChannel
+from netdriver_agent.client.task import CmdTask
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+_UNION = HillstoneBase.PatternHelper.get_union_pattern()
+_PROMPT = "hostname(config)# "
+_ERROR = "            ^-----unrecognized keyword\r\n"
+
+
+def _session(chunks: list) -> HillstoneBase:
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session._channel = SSHChannel(FakeConn(), FakeProcess(chunks), logger=logman.logger)
+    session._channel._read_buffer_size = 8192
+    return session
+
+
+@pytest.mark.unit
+def test_split_echo_after_prompt():
+    # the device echoes a line when the CLI reads it, after the prompt
+    splitter = PromptSplitter(_UNION)
+    assert splitter.feed("ip vrouter trust\r\n") == []
+    assert splitter.feed("hostname(config-vrouter)# ") == ["ip vrouter trust\r\nhostname(config-vrouter)# "]
+    assert splitter.feed("exit\r\nhostname(config)# foo\r\n" + _ERROR + "host") == \
+        ["exit\r\nhostname(config)# "]
+    assert splitter.feed("name(config)# ") == ["foo\r\n" + _ERROR + "hostname(config)# "]
+    assert splitter.get_data() == ""
+
+
+@pytest.mark.unit
+def test_split_echo_on_arrival():
+    # the device echoes the lines as they arrive, the output follows the prompt on the same line
+    splitter = PromptSplitter(_UNION)
+    outputs = splitter.feed("a\r\nb\r\nc\r\n\r\nhostname# out b\r\nhostname# ")
+    assert outputs == ["a\r\nb\r\nc\r\n\r\nhostname# ", "out b\r\nhostname# "]
+    assert splitter.feed("\r\nhostname# ") == ["\r\nhostname# "]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pipelined_lines_stop_on_first_error():
+    session = _session([
+        "l1\r\nl2\r\n" + _PROMPT,
+        "l3\r\n" + _ERROR + _PROMPT,
+        "\r\n" + _PROMPT,
+        "unexpected",
+    ])
+    lines = ["l1", "l2", "l3", "l4", "l5"]
+    output, err_msg = await session._exec_lines_pipelined(lines, window=2)
+    assert err_msg.startswith("Line 2 [l2]: ")
+    assert "unrecognized keyword" in err_msg
+    # l3 was in flight when the error showed up, l4 and l5 are never written
+    assert session._channel._terminal.stdin.writes == ["l1\n", "l2\n", "l3\n"]
+    assert output.endswith(_PROMPT)
+    assert session._channel._terminal.stdout.chunks == ["unexpected"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pipeline_window_of_task():
+    session = _session([])
+    session._session_profile = {"pipeline_window": 16}
+    lines = ["l1", "l2"]
+    assert session._get_pipeline_window(CmdTask("l1\nl2"), lines) == 16
+    assert session._get_pipeline_window(CmdTask("l1\nl2", pipeline_window=0), lines) == 0
+    assert session._get_pipeline_window(CmdTask("l1"), ["l1"]) == 0
+    # the lines with hooks run one by one
+    session.register_hook("l2", session.save)
+    assert session._get_pipeline_window(CmdTask("l1\nl2"), lines) == 0
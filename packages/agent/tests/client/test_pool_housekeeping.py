@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from netdriver_agent.client import pool as pool_module
+from netdriver_agent.models.session import SessionListResponse
+
+
+def _device(ip: str) -> dict:
+    return {"ip": ip, "username": "admin", "password": "admin", "vendor": "hillstone", "model": "sg",
+            "version": "5.5"}
+
+
+_CONFIG = {"cleanup_concurrency": 2, "profiles": {"global": {"max_idle_time": 10}}}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_check_due_sessions_only(create_pool, monkeypatch):
+    pool = create_pool(_CONFIG)
+    sessions = [await pool.get_session(**_device(f"192.168.1.{i}")) for i in range(1, 7)]
+    assert len(pool._check_heap) == 6
+    now = time.time()
+    assert all(check_time == pytest.approx(now + 10, abs=1) for check_time, _, _ in pool._check_heap)
+
+    # the sessions idle too long are not checked before they are due
+    for session in sessions[:5]:
+        session._create_time -= 20
+    await pool._check_due_sessions()
+    assert pool.get_stats().sessions == 6
+
+    # once due, the idle ones are closed concurrently, the others are checked again later
+    monkeypatch.setattr(pool_module.time, "time", lambda: now + 11)
+    await pool._check_due_sessions()
+    assert pool.find_sessions("ssh", "admin", "192.168.1.6", 22) == [sessions[5]]
+    assert pool.get_stats().sessions == 1 and len(pool._check_heap) == 1
+    assert type(sessions[0]).closing["max"] == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_list_sessions_by_page(create_pool):
+    pool = create_pool(_CONFIG)
+    sessions = [await pool.get_session(**_device(f"192.168.1.{i}")) for i in range(1, 4)]
+    sessions[0]._idle = False
+
+    stats = pool.get_stats()
+    assert (stats.devices, stats.sessions, stats.busy, stats.queued) == (3, 3, 1, 1)
+    total, rows = await pool.list_sessions(offset=1, limit=5)
+    assert total == 3
+    assert [row[0] for row in rows] == [session.session_key for session in sessions[1:]]
+
+    response = SessionListResponse.ok(devices=stats.devices, total=total, busy=stats.busy, queued=stats.queued,
+                                      sessions=rows, cor_id="test")
+    assert response.sessions[0].session == sessions[1].session_key
+    assert response.sessions[0].mode == "enable" and response.sessions[0].idle is True
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_refill_hot_sessions_removed(create_pool):
+    pool = create_pool(_CONFIG)
+    pool.prewarm([dict(_device("192.168.1.1"), hot=True)])
+    while pool._prewarm_tasks:
+        await asyncio.gather(*pool._prewarm_tasks)
+    session = pool.find_session("ssh", "admin", "192.168.1.1", 22)
+
+    # the liveness is left to the checks due, the session in the pool is not waited for
+    session._init_task_done = asyncio.get_running_loop().create_future()
+    pool._refill_hot_sessions()
+    assert not pool._prewarm_tasks
+
+    session._init_task_done.set_result(None)
+    await pool._handle_closed_session(session)
+    pool._refill_hot_sessions()
+    assert len(pool._prewarm_tasks) == 1
+    await asyncio.gather(*pool._prewarm_tasks)
+    assert pool.find_session("ssh", "admin", "192.168.1.1", 22) not in (None, session)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+
+import pytest
+
+from netdriver_agent.client.pool import SessionPool
+from netdriver_agent.models.session import PrewarmRequest
+
+
+_INVENTORY = os.path.join(os.path.dirname(__file__), "../../../../config/agent/inventory.example.yml")
+
+
+def _device(ip: str, hot: bool = False) -> dict:
+    return {"ip": ip, "username": "admin", "password": "admin", "vendor": "hillstone", "model": "sg",
+            "version": "5.5", "hot": hot}
+
+
+_CONFIG = {"prewarm": {"concurrency": 2}}
+
+
+async def _wait_prewarm(pool: SessionPool) -> None:
+    while pool._prewarm_tasks:
+        await asyncio.gather(*pool._prewarm_tasks)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_prewarm_with_bounded_concurrency(create_pool, monkeypatch):
+    pool = create_pool(_CONFIG)
+    running = {"now": 0, "max": 0}
+
+    async def get_session(**kwargs):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        if kwargs["ip"] == "192.168.1.4":
+            raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(pool, "get_session", get_session)
+    progress = pool.prewarm([_device(f"192.168.1.{i}") for i in range(1, 6)])
+    assert progress.total == 5 and progress.pending == 5
+    # the device being pre-warmed is not pre-warmed twice
+    pool.prewarm([_device("192.168.1.1")])
+    assert progress.total == 5
+
+    await _wait_prewarm(pool)
+    assert running["max"] == 2
+    assert (progress.created, progress.failed, progress.pending) == (4, 1, 0)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_refill_hot_sessions(create_pool, monkeypatch):
+    pool = create_pool(_CONFIG)
+    created = []
+
+    async def get_session(**kwargs):
+        created.append(kwargs["ip"])
+
+    monkeypatch.setattr(pool, "get_session", get_session)
+    pool.prewarm([_device("192.168.1.1", hot=True), _device("192.168.1.2")])
+    await _wait_prewarm(pool)
+    assert sorted(created) == ["192.168.1.1", "192.168.1.2"]
+
+    # the sessions are not in the pool, only the hot one is created again
+    pool._refill_hot_sessions()
+    await _wait_prewarm(pool)
+    assert sorted(created) == ["192.168.1.1", "192.168.1.1", "192.168.1.2"]
+    assert "hot" not in pool._hot_devices["ssh://admin@192.168.1.1:22"]
+
+
+@pytest.mark.unit
+def test_load_inventory():
+    devices = PrewarmRequest.from_yaml(_INVENTORY).get_devices()
+    assert len(devices) == 2
+    assert devices[0]["hot"] is True
+    assert devices[1]["hot"] is False
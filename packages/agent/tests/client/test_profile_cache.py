@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+from dependency_injector.providers import Configuration
+
+from netdriver_agent.client.channel import SSHChannel, update_ssh_config
+from netdriver_agent.client.profile_cache import DeviceProfileCache
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    DeviceProfileCache._instance = None
+    yield str(tmp_path / "cache" / "device_profiles.json")
+    DeviceProfileCache._instance = None
+
+
+def _config(cache_file: str) -> Configuration:
+    config = Configuration()
+    config.from_dict({"session": {"device_profile_cache": cache_file}})
+    return config
+
+
+@pytest.mark.unit
+def test_cache_persists_entries(cache_file):
+    cache = DeviceProfileCache(cache_file)
+    assert cache.get("ssh://admin@192.168.1.1:22") == {}
+    cache.update("ssh://admin@192.168.1.1:22", encryption_alg="aes128-ctr", prompt="hostname#")
+    cache.update("ssh://admin@192.168.1.1:22", encryption_alg=None, prompt="hostname(M)#")
+
+    DeviceProfileCache._instance = None
+    entry = DeviceProfileCache(cache_file).get("ssh://admin@192.168.1.1:22")
+    assert entry["prompt"] == "hostname(M)#"
+    assert entry["encryption_alg"] == "aes128-ctr"
+
+
+@pytest.mark.unit
+def test_cache_ignores_broken_file(cache_file, tmp_path):
+    (tmp_path / "cache").mkdir()
+    with open(cache_file, "w") as f:
+        f.write("{broken")
+    assert DeviceProfileCache(cache_file).get("ssh://admin@192.168.1.1:22") == {}
+
+
+@pytest.mark.unit
+def test_ssh_config_prefers_learned_algorithms():
+    config = Configuration()
+    kwargs, _ = update_ssh_config({}, {}, config)
+    default_kex_algs = kwargs["kex_algs"]
+    assert "server_host_key_algs" not in kwargs
+
+    device_profile = {"encryption_alg": "aes128-ctr", "server_host_key_alg": "ssh-ed25519"}
+    kwargs, _ = update_ssh_config({}, {}, config, device_profile)
+    assert kwargs["encryption_algs"][0] == "aes128-ctr"
+    assert kwargs["server_host_key_algs"][0] == "ssh-ed25519"
+    assert "ssh-rsa" in kwargs["server_host_key_algs"]
+    # the algorithms are offered in the same order by every session
+    assert kwargs["kex_algs"] == default_kex_algs
+
+    # ssh-rsa is kept in its place
+    kwargs, _ = update_ssh_config({}, {}, config, {"server_host_key_alg": "ssh-rsa"})
+    assert "server_host_key_algs" not in kwargs
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_init_session_by_cached_prompt(cache_file, monkeypatch):
+    DeviceProfileCache(cache_file).update("ssh://admin@192.168.1.1:22", prompt="hostname#")
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin", vendor="hillstone",
+                            model="sg", version="5.5", config=_config(cache_file))
+    session._channel = SSHChannel(FakeConn(), FakeProcess(["Welcome\r\n", "hostname# "]),
+                                  logger=logman.logger)
+    session._channel._read_buffer_size = 8192
+
+    async def probe():
+        raise AssertionError("the prompt should not be probed")
+
+    async def disable_pagging():
+        pass
+
+    monkeypatch.setattr(session, "_decide_init_state", probe)
+    monkeypatch.setattr(session, "disable_pagging", disable_pagging)
+    await session._init_session()
+    assert session._mode == Mode.ENABLE
+    assert session.get_learned_prompt() == "hostname#"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_init_session_probes_changed_prompt(cache_file, monkeypatch):
+    DeviceProfileCache(cache_file).update("ssh://admin@192.168.1.1:22", prompt="hostname#")
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin", vendor="hillstone",
+                            model="sg", version="5.5", config=_config(cache_file))
+    session._channel = SSHChannel(FakeConn(), FakeProcess(["Welcome\r\n", "renamed# "]),
+                                  logger=logman.logger)
+    session._channel._read_buffer_size = 8192
+    probes = []
+
+    async def probe():
+        probes.append(True)
+        session._mode = Mode.ENABLE
+        return "renamed# "
+
+    async def disable_pagging():
+        pass
+
+    monkeypatch.setattr(session, "_decide_init_state", probe)
+    monkeypatch.setattr(session, "disable_pagging", disable_pagging)
+    await session._init_session()
+    assert probes
+    # the new prompt is cached for the next session
+    assert DeviceProfileCache().get("ssh://admin@192.168.1.1:22")["prompt"] == "renamed#"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_init_session_banner_without_prompt(cache_file, monkeypatch):
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin", vendor="hillstone",
+                            model="sg", version="5.5", config=_config(cache_file))
+    session._session_profile = {"banner_timeout": 0.1}
+    # the device shows no prompt until probed
+    session._channel = SSHChannel(FakeConn(), FakeProcess(["hostname# "], interval=5), logger=logman.logger)
+    session._channel._read_buffer_size = 8192
+
+    async def probe():
+        session._mode = Mode.ENABLE
+        return "hostname# "
+
+    async def disable_pagging():
+        pass
+
+    monkeypatch.setattr(session, "_decide_init_state", probe)
+    monkeypatch.setattr(session, "disable_pagging", disable_pagging)
+    start = time.time()
+    await session._init_session()
+    # the probe goes on once the banner timeout of the profile is spent
+    assert time.time() - start < 1
+    assert session.get_learned_prompt() == "hostname#"
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from netdriver_agent.client.task import CmdTask
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core import utils
+from netdriver_core.dev.mode import Mode
+
+
+_ERROR = "            ^-----unrecognized keyword\r\n"
+
+
+def _session(outputs: dict, monkeypatch) -> HillstoneBase:
+    """ Create a session runs the commands by the outputs, and counts the prompt probes """
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session.probes = 0
+
+    async def decide_init_state():
+        session.probes += 1
+        session._mode = Mode.ENABLE
+        return "hostname# "
+
+    async def exec_cmd(command):
+        output = outputs[command]
+        if isinstance(output, BaseException):
+            raise output
+        return output
+
+    monkeypatch.setattr(session, "_decide_init_state", decide_init_state)
+    monkeypatch.setattr(session, "exec_cmd", exec_cmd)
+    return session
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_skip_probe_after_clean_task(monkeypatch):
+    session = _session({
+        "show clock": "show clock\r\n10:00:00\r\nhostname# ",
+        "configure": "configure\r\nhostname(config)# ",
+    }, monkeypatch)
+    assert await session._exec_cmd_task(CmdTask("show clock")) == "hostname# show clock\r\n10:00:00\r\nhostname# "
+    assert session.probes == 1
+
+    # the output starts with the prompt as if it is probed
+    assert await session._exec_cmd_task(CmdTask("show clock")) == "hostname# show clock\r\n10:00:00\r\nhostname# "
+    assert session.probes == 1
+
+    # the mode changed by the command is tracked
+    await session._exec_cmd_task(CmdTask("configure"))
+    assert session._mode == Mode.CONFIG
+    assert session.probes == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_probe_after_failed_task(monkeypatch):
+    session = _session({
+        "show clock": "show clock\r\n10:00:00\r\nhostname# ",
+        "show foo": "show foo\r\n" + _ERROR + "hostname# ",
+        "show slow": asyncio.CancelledError(),
+        "show more": "show more\r\n --More-- ",
+    }, monkeypatch)
+    for command in ["show foo", "show slow", "show more"]:
+        await session._exec_cmd_task(CmdTask("show clock"))
+        probes = session.probes
+        task = CmdTask(command, future=asyncio.get_running_loop().create_future())
+        await session._exec_cmd_task(task)
+        await session._exec_cmd_task(CmdTask("show clock"))
+        assert session.probes == probes + 1, command
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_check_error_of_each_line(monkeypatch):
+    session = _session({f"address a{i}": f"address a{i}\r\nhostname# " for i in range(10)}, monkeypatch)
+    checked = []
+    catch_error_of_output = utils.regex.catch_error_of_output
+
+    def catch_error(output, error_patterns, ignore_patterns):
+        checked.append(output)
+        return catch_error_of_output(output, error_patterns, ignore_patterns)
+
+    monkeypatch.setattr(utils.regex, "catch_error_of_output", catch_error)
+    command = "\n".join(f"address a{i}" for i in range(10))
+    output = await session._exec_cmd_task(CmdTask(command, pipeline_window=0))
+    assert output == "hostname# " + "".join(f"address a{i}\r\nhostname# " for i in range(10))
+    # only the output of the line is checked, with the prompt before it
+    assert checked == [f"hostname# address a{i}\r\nhostname# " for i in range(10)]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+
+import pytest
+
+from netdriver_agent.client.channel import ReadBuffer
+
+
+_PROMPT = re.compile(r"^\r{0,1}.+#\s\r{0,1}$", re.MULTILINE)
+_MORE = re.compile(r" --More-- ", re.MULTILINE)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_get_data_keeps_original_stream():
+    chunks = ["show ver", "sion\r\nline 1\r", "\nline 2\r\nhost", "name# "]
+    output = ReadBuffer()
+    for chunk in chunks:
+        output.append(chunk)
+    assert output.get_data() == "".join(chunks)
+    assert str(output) == "".join(chunks)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_prompt_split_across_chunks():
+    output = ReadBuffer(cmd="show version")
+    output.append("hostname# show version\r\nVersion 1.0\r\nhost")
+    assert not output.check_pattern(_PROMPT, False)
+    output.append("name# ")
+    matched = output.check_pattern(_PROMPT, False)
+    assert matched
+    assert matched.group().strip() == "hostname#"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_prompt_before_echo_is_ignored():
+    output = ReadBuffer(cmd="show version")
+    output.append("hostname# \r\n")
+    assert not output.check_pattern(_PROMPT)
+    output.append("hostname# show version\r\nVersion 1.0\r\nhostname# ")
+    assert output.check_pattern(_PROMPT)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_line_break_split_across_chunks():
+    output = ReadBuffer(line_break="\r\n")
+    output.append("hostname# \r")
+    output.append("\nnext line")
+    assert output.get_data() == "hostname# \r\nnext line"
+    assert output.check_pattern(re.compile(r"^hostname# \r\n$"))
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_patterns_have_independent_cursors():
+    output = ReadBuffer()
+    output.append("line 1\r\n --More-- ")
+    # the more pattern consumes the pager prompt, but the prompt pattern is still unmatched
+    assert output.check_pattern(_MORE)
+    assert not output.check_pattern(_PROMPT)
+    # a matched pattern does not match the same text again
+    assert not output.check_pattern(_MORE)
+    output.append("\r\nline 2\r\n --More-- ")
+    assert output.check_pattern(_MORE)
+    output.append("\r\nhostname# ")
+    assert output.check_pattern(_PROMPT)
+    assert not output.check_pattern(_PROMPT)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_matched_partial_line_is_not_rematched():
+    output = ReadBuffer()
+    output.append(" --More-- ")
+    assert output.check_pattern(_MORE)
+    output.append("\x08\x08\x08line 2\r\n")
+    assert not output.check_pattern(_MORE)
+    output.append(" --More-- ")
+    assert output.check_pattern(_MORE)
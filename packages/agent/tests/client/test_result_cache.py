@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from netdriver_agent.client import result_cache
+from netdriver_agent.client.result_cache import ResultCache
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.dev.mode import Mode
+
+
+def _session(monkeypatch) -> HillstoneBase:
+    """ Create a session caches show version, and records the commands run on the device """
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session._result_cache = ResultCache({r"show version": 60})
+    session.executed = []
+
+    async def decide_init_state():
+        session._mode = Mode.ENABLE
+        return "hostname# "
+
+    async def switch_mode(mode):
+        session._mode = mode
+        return ""
+
+    async def exec_cmd(command):
+        session.executed.append(command)
+        return f"{command}\r\nhostname# "
+
+    monkeypatch.setattr(session, "_decide_init_state", decide_init_state)
+    monkeypatch.setattr(session, "switch_mode", switch_mode)
+    monkeypatch.setattr(session, "exec_cmd", exec_cmd)
+    session._cmd_task_consumer = asyncio.create_task(session._consume_cmd_queue())
+    return session
+
+
+async def _stop(session: HillstoneBase) -> None:
+    session._is_closing = True
+    session._cmd_task_consumer.cancel()
+    await asyncio.gather(session._cmd_task_consumer, return_exceptions=True)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_serve_from_cache(monkeypatch):
+    session = _session(monkeypatch)
+    try:
+        first = await session.send_cmd("show version", mode=Mode.ENABLE)
+        second = await session.send_cmd("show version", mode=Mode.ENABLE)
+        assert session.executed == ["show version"]
+        assert first.cache_age is None
+        assert second.cache_age >= 0
+        assert second.output == first.output
+
+        # the commands without ttl, or in another mode, or not using the cache, run on the device
+        await session.send_cmd("show clock", mode=Mode.ENABLE)
+        await session.send_cmd("show clock", mode=Mode.ENABLE)
+        await session.send_cmd("show version", mode=Mode.CONFIG)
+        fresh = await session.send_cmd("show version", mode=Mode.ENABLE, use_cache=False)
+        assert fresh.cache_age is None
+        assert session.executed == ["show version", "show clock", "show clock", "show version", "show version"]
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_cache_by_current_vsys_and_mode(monkeypatch):
+    session = _session(monkeypatch)
+    try:
+        # the vsys and mode not set are the ones the command runs in
+        await session.send_cmd("show version")
+        assert (await session.send_cmd("show version", vsys="default", mode=Mode.ENABLE)).cache_age is not None
+        assert (await session.send_cmd("show version")).cache_age is not None
+
+        # not served in another mode, nor while the session may switch before the command runs
+        session._mode = Mode.CONFIG
+        assert (await session.send_cmd("show version")).cache_age is None
+        assert (await session.send_cmd("show version", mode=Mode.ENABLE)).cache_age is not None
+        session._mode = Mode.ENABLE
+        session._idle = False
+        executed = len(session.executed)
+        assert (await session.send_cmd("show version")).cache_age is None
+        assert len(session.executed) == executed + 1
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_invalidate_by_write(monkeypatch):
+    session = _session(monkeypatch)
+    try:
+        for write in [dict(command="address a1", mode=Mode.CONFIG), dict(command="save", mode=Mode.ENABLE),
+                      dict(command="exec policy-hit-count reset", mode=Mode.ENABLE)]:
+            await session.send_cmd("show version", mode=Mode.ENABLE)
+            assert (await session.send_cmd("show version", mode=Mode.ENABLE)).cache_age is not None
+            await session.send_cmd(**write)
+            assert (await session.send_cmd("show version", mode=Mode.ENABLE)).cache_age is None, write
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+def test_cache_expires(monkeypatch):
+    cache = ResultCache({r"show version": 10, r"show interface.*": 1, r"show (": 1})
+    key = (None, Mode.ENABLE, "show version")
+    cache.put(key, "5.5")
+    cache.put((None, Mode.ENABLE, "show interface eth0"), "up")
+    cache.put((None, Mode.ENABLE, "show clock"), "10:00:00")
+    assert len(cache) == 2
+    assert cache.get(key) == ("5.5", pytest.approx(0, abs=1))
+
+    now = time.time()
+    monkeypatch.setattr(result_cache.time, "time", lambda: now + 5)
+    assert cache.get(key) == ("5.5", pytest.approx(5, abs=1))
+    # the expired output is dropped on put
+    cache.put((None, Mode.CONFIG, "show version"), "5.5")
+    assert len(cache) == 2
+
+    monkeypatch.setattr(result_cache.time, "time", lambda: now + 11)
+    assert cache.get(key) is None
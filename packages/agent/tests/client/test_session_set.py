@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from netdriver_core.dev.mode import Mode
+from netdriver_core.exception.errors import LoginFailed
+
+
+_DEVICE = {"ip": "192.168.1.1", "username": "admin", "password": "admin", "vendor": "hillstone",
+           "model": "sg", "version": "5.5"}
+_CONFIG = {"prewarm": {"concurrency": 2}, "profiles": {"global": {"sessions_per_device": 2}}}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_dispatch_by_mode_and_queue(create_pool, monkeypatch):
+    pool = create_pool(_CONFIG)
+    first = await pool.get_session(**_DEVICE, mode=Mode.ENABLE)
+    assert await pool.get_session(**_DEVICE, mode=Mode.CONFIG) is first
+
+    # a new session is opened while the others are busy, and shares the result cache
+    first._idle = False
+    second = await pool.get_session(**_DEVICE, mode=Mode.CONFIG)
+    assert second is not first and second.member == 1
+    assert second._result_cache is first._result_cache
+    second._mode = Mode.CONFIG
+
+    # the idle session already in the mode is preferred
+    first._idle = True
+    assert await pool.get_session(**_DEVICE, mode=Mode.CONFIG) is second
+    assert await pool.get_session(**_DEVICE, mode=Mode.ENABLE) is first
+
+    # no more sessions than the profile allows, the one with the shortest queue is used
+    first._idle = second._idle = False
+    monkeypatch.setattr(first._cmd_queue, "qsize", lambda: 3)
+    assert await pool.get_session(**_DEVICE, mode=Mode.ENABLE) is second
+    assert len(pool.find_sessions("ssh", "admin", "192.168.1.1", 22)) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_close_sessions_one_by_one(create_pool):
+    pool = create_pool(_CONFIG)
+    first = await pool.get_session(**_DEVICE)
+    first._idle = False
+    second = await pool.get_session(**_DEVICE)
+
+    # the other session of the device is kept, and the member index is reused
+    await pool._handle_closed_session(first)
+    assert pool.find_sessions("ssh", "admin", "192.168.1.1", 22) == [second]
+    second._idle = False
+    third = await pool.get_session(**_DEVICE)
+    assert third.member == 0
+    sessions = pool.find_sessions("ssh", "admin", "192.168.1.1", 22)
+    assert [(await session.get_display_info())[:2] for session in sessions] == \
+        [[second.session_key, 1], [second.session_key, 0]]
+
+    await pool.close_all()
+    assert pool.find_session("ssh", "admin", "192.168.1.1", 22) is None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_not_wait_for_initializing_session(create_pool):
+    pool = create_pool(_CONFIG)
+    first = await pool.get_session(**_DEVICE)
+    # the second session is still logging in
+    second = type(first)(**_DEVICE)
+    second._init_task_done = asyncio.get_running_loop().create_future()
+    second.member = 1
+    pool._pool[first.session_key].append(second)
+
+    # the initialized idle session is used without waiting for the other
+    assert await asyncio.wait_for(pool.get_session(**_DEVICE), 1) is first
+    # once it is busy, the initializing one is taken rather than opening another, once it is logged in
+    first._idle = False
+    getting = asyncio.create_task(pool.get_session(**_DEVICE))
+    await asyncio.sleep(0.01)
+    assert not getting.done()
+    second._init_task_done.set_result(None)
+    second._init_task = second._init_task_done
+    assert await asyncio.wait_for(getting, 1) is second
+    assert len(pool.find_sessions("ssh", "admin", "192.168.1.1", 22)) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_initializing_session_login_failed(create_pool):
+    pool = create_pool(_CONFIG, login_error=LoginFailed("login failed"))
+
+    async def send_cmd():
+        session = await pool.get_session(**_DEVICE)
+        return await session.send_cmd("show version")
+
+    # the request waiting for the session of the other fails with it rather than waiting forever
+    results = await asyncio.wait_for(asyncio.gather(send_cmd(), send_cmd(), return_exceptions=True), 1)
+    assert all(isinstance(result, LoginFailed) for result in results)
+    assert pool.find_session("ssh", "admin", "192.168.1.1", 22) is None
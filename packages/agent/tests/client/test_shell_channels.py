@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client.channel import BytesSSHChannel, SSHChannel
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.log import logman
+from .fake_ssh import FakeConn, FakeProcess
+
+
+def _session() -> HillstoneBase:
+    return HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                         vendor="hillstone", model="sg6000", version="5.5")
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_open_shell_shares_connection():
+    conn = FakeConn()
+    channel = SSHChannel(conn, FakeProcess([]), logger=logman.logger, term_size=(200, 40))
+    shell = await channel.open_shell()
+    assert shell._conn is conn
+    assert shell._terminal is conn.processes[0]
+    assert shell._terminal is not channel._terminal
+
+    # closing a shell keeps the connection for the others
+    await shell.close()
+    assert shell._terminal.closed
+    assert not conn.closed
+    assert channel.is_alive()
+
+    await channel.close()
+    assert conn.closed
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_open_shell_of_bytes_channel():
+    conn = FakeConn(["hostname# "])
+    channel = BytesSSHChannel(conn, FakeProcess([]), logger=logman.logger)
+    shell = await channel.open_shell()
+    assert isinstance(shell, BytesSSHChannel)
+    assert shell._decoder is not channel._decoder
+    assert shell._spill_threshold == channel._spill_threshold
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_select_least_busy_shell():
+    session = _session()
+    assert session._select_shell() is session
+
+    shells = [_session(), _session()]
+    for shell in [session] + shells:
+        shell._channel = SSHChannel(FakeConn(), FakeProcess([]), logger=logman.logger)
+        shell._idle = True
+    session._shells = shells
+
+    session._idle = False
+    shells[0]._cmd_queue.put_nowait("task")
+    assert session._select_shell() is shells[1]
+    assert not session.is_idle
+
+    # the dead shells are skipped
+    await shells[1]._channel.close()
+    session._idle = True
+    assert session._select_shell() is session
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from netdriver_agent.client.result_cache import ResultCache
+from netdriver_agent.client.task import CmdTask, Priority
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_agent.plugins.huawei import HuaweiBase
+from netdriver_core.dev.mode import Mode
+
+
+def _session(monkeypatch) -> HillstoneBase:
+    """ Create a session runs the commands once released, and records the commands run on the device """
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session.executed = []
+    session.release = asyncio.Event()
+
+    async def decide_init_state():
+        session._mode = Mode.ENABLE
+        return "hostname# "
+
+    async def exec_cmd(command):
+        session.executed.append(command)
+        await session.release.wait()
+        return f"{command}\r\n{len(session.executed)}\r\nhostname# "
+
+    monkeypatch.setattr(session, "_decide_init_state", decide_init_state)
+    monkeypatch.setattr(session, "exec_cmd", exec_cmd)
+    session._cmd_task_consumer = asyncio.create_task(session._consume_cmd_queue())
+    return session
+
+
+async def _stop(session: HillstoneBase) -> None:
+    session._is_closing = True
+    session._cmd_task_consumer.cancel()
+    await asyncio.gather(session._cmd_task_consumer, return_exceptions=True)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_attach_identical_tasks(monkeypatch):
+    session = _session(monkeypatch)
+    try:
+        sends = [asyncio.create_task(session.send_cmd("show version", mode=Mode.ENABLE)) for _ in range(3)]
+        # not identical, by the detail output or the command
+        others = [asyncio.create_task(session.send_cmd("show version", mode=Mode.ENABLE, detail_output=False)),
+                  asyncio.create_task(session.send_cmd("save", mode=Mode.ENABLE)),
+                  asyncio.create_task(session.send_cmd("save", mode=Mode.ENABLE))]
+        await asyncio.sleep(0.01)
+        session.release.set()
+        results = await asyncio.gather(*sends)
+        await asyncio.gather(*others)
+        assert session.executed == ["show version", "show version", "save", "save"]
+        # the waiters get the same result and timing
+        assert len({result.output for result in results}) == 1
+        assert len({(result.start_time, result.end_time) for result in results}) == 1
+        assert not session._inflight
+
+        # the task done is not shared
+        result = await session.send_cmd("show version", mode=Mode.ENABLE)
+        assert session.executed[-1] == "show version" and result.output != results[0].output
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_attach_by_priority_and_cancel(monkeypatch):
+    session = _session(monkeypatch)
+    try:
+        low = asyncio.create_task(session.send_cmd("show version", priority=Priority.LOW))
+        await asyncio.sleep(0)
+        # a higher priority does not wait for a lower one
+        high = asyncio.create_task(session.send_cmd("show version", priority=Priority.HIGH))
+        waiter = asyncio.create_task(session.send_cmd("show version", priority=Priority.LOW))
+        await asyncio.sleep(0.01)
+        # the waiter gives up without cancelling the task it waits for
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        session.release.set()
+        await asyncio.gather(low, high)
+        assert session.executed == ["show version", "show version"]
+        assert low.result().exception is None
+    finally:
+        await _stop(session)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_attach_read_only_commands_only(monkeypatch):
+    session = _session(monkeypatch)
+    try:
+        # the commands not known as read-only are run each time
+        sends = [asyncio.create_task(session.send_cmd("exec policy-hit-count reset")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        session.release.set()
+        await asyncio.gather(*sends)
+        assert session.executed == ["exec policy-hit-count reset"] * 2
+    finally:
+        await _stop(session)
+
+    # the read-only commands are known by the plugin, or by the result cache ttl
+    huawei = HuaweiBase(ip="192.168.1.1", username="admin", password="admin",
+                        vendor="huawei", model="usg", version="base")
+    assert huawei._is_read_only_task(CmdTask("display version"))
+    assert not huawei._is_read_only_task(CmdTask("show version"))
+    assert not huawei._is_read_only_task(CmdTask("display version", mode=Mode.CONFIG))
+    assert not huawei._is_read_only_task(CmdTask("display version\nreset counters"))
+    huawei._result_cache = ResultCache({r"ping .+": 10})
+    assert huawei._is_read_only_task(CmdTask("ping 192.168.1.2"))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from netdriver_agent.client.channel import ReadBufferBudget, SpillReadBuffer
+from netdriver_agent.plugins.hillstone import HillstoneBase
+
+
+_UNION = HillstoneBase.PatternHelper.get_union_pattern()
+_LINE = b"set address host 10.0.0.1/32\r\n"
+
+
+@pytest.fixture
+def budget():
+    ReadBufferBudget._instance = None
+    yield ReadBufferBudget(limit=1024)
+    ReadBufferBudget._instance = None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_spill_over_threshold(budget: ReadBufferBudget):
+    output = SpillReadBuffer(cmd="show address", spill_threshold=256)
+    output.append(b"hostname# show address\r\n")
+    assert not output.is_spilled
+    for _ in range(20):
+        output.append(_LINE)
+    assert output.is_spilled
+    assert budget.in_memory == 0
+    assert not output.check_pattern(_UNION)
+    output.append(b"hostname")
+    output.append(b"# ")
+    assert output.check_pattern(_UNION)
+    assert output.get_data() == "hostname# show address\r\n" + _LINE.decode() * 20 + "hostname# "
+    output.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_budget_spills_largest_first(budget: ReadBufferBudget):
+    small = SpillReadBuffer(spill_threshold=4096)
+    large = SpillReadBuffer(spill_threshold=4096)
+    small.append(b"x" * 200)
+    large.append(b"x" * 700)
+    assert budget.in_memory == 900
+    small.append(b"x" * 200)
+    assert large.is_spilled
+    assert not small.is_spilled
+    assert budget.in_memory == 400
+    small.close()
+    large.close()
+    assert budget.in_memory == 0
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_budget_forgets_collected_buffer(budget: ReadBufferBudget):
+    output = SpillReadBuffer(spill_threshold=4096)
+    output.append(b"x" * 100)
+    assert budget.in_memory == 100
+    del output
+    assert budget.in_memory == 0
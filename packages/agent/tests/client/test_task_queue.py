@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from asyncio import QueueFull
+
+import pytest
+
+from netdriver_agent.client.task import CmdTask, Priority
+from netdriver_agent.client.task_queue import TaskQueue
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.exception.errors import DeadlineExceeded, QueueFullError
+
+
+def _task(command: str, priority: Priority, queued: float = 0) -> CmdTask:
+    task = CmdTask(command, priority=priority)
+    task.set_enqueue_timestamp()
+    task.enqueue_timestamp -= queued
+    return task
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_dispatch_by_priority():
+    queue = TaskQueue(4, starvation_time=30)
+    for command, priority in [("push 1", Priority.LOW), ("collect", Priority.NORMAL),
+                              ("push 2", Priority.LOW), ("show log", Priority.HIGH)]:
+        queue.put_nowait(_task(command, priority))
+    with pytest.raises(QueueFull):
+        queue.put_nowait(_task("show clock", Priority.HIGH))
+    assert queue.qsize() == 4 and queue.qsize_of(Priority.LOW) == 2
+
+    dispatched = [(await queue.get()).command for _ in range(4)]
+    assert dispatched == ["show log", "collect", "push 1", "push 2"]
+    assert queue.empty()
+    assert queue.stats[Priority.LOW].count == 2
+    assert queue.stats[Priority.HIGH].count == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_starving_task_dispatched_first():
+    queue = TaskQueue(starvation_time=30)
+    queue.put_nowait(_task("push", Priority.LOW, queued=31))
+    queue.put_nowait(_task("collect", Priority.NORMAL, queued=40))
+    queue.put_nowait(_task("show log", Priority.HIGH))
+    # the task waited longest goes first
+    assert [(await queue.get()).command for _ in range(3)] == ["collect", "push", "show log"]
+    assert queue.stats[Priority.NORMAL].max >= 40
+
+    queue = TaskQueue(starvation_time=0)
+    queue.put_nowait(_task("push", Priority.LOW, queued=time.time()))
+    queue.put_nowait(_task("show log", Priority.HIGH))
+    assert (await queue.get()).command == "show log"
+
+
+def _session(monkeypatch) -> HillstoneBase:
+    session = HillstoneBase(ip="192.168.1.1", username="admin", password="admin",
+                            vendor="hillstone", model="sg6000", version="5.5")
+    session.executed = []
+
+    async def exec_cmd_task(task):
+        session.executed.append(task.command)
+        task.set_result(output="")
+
+    monkeypatch.setattr(session, "_exec_cmd_task", exec_cmd_task)
+    return session
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reject_task_estimated_after_deadline(monkeypatch):
+    session = _session(monkeypatch)
+    queue = session._cmd_queue
+    assert queue.estimate_wait(Priority.NORMAL) == 0
+    for exec_time in [1.0, 3.0]:
+        queue.record_exec_time(exec_time)
+    queue.put_nowait(_task("push", Priority.LOW))
+    queue.put_nowait(_task("collect", Priority.NORMAL))
+    assert queue.estimate_wait(Priority.HIGH, busy=True) == 2.0
+    assert queue.estimate_wait(Priority.NORMAL) == 2.0
+    assert queue.estimate_wait(Priority.LOW) == 4.0
+
+    result = await session.send_cmd("show log", priority=Priority.LOW, deadline=time.time() + 3)
+    assert isinstance(result.exception, QueueFullError)
+    assert 1 <= result.exception.retry_after <= 2
+    assert queue.qsize() == 2
+
+    # admitted without deadline or in time
+    session._enqueue = lambda task: task.set_result(output="queued")
+    assert (await session.send_cmd("show log", priority=Priority.HIGH, deadline=time.time() + 3)).output == "queued"
+    assert (await session.send_cmd("show log", priority=Priority.LOW)).output == "queued"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_drop_expired_task(monkeypatch):
+    session = _session(monkeypatch)
+    future = asyncio.get_running_loop().create_future()
+    expired = CmdTask("show log", future=future, deadline=time.time() - 1)
+    session._enqueue(expired)
+    batch = [CmdTask("show clock"), CmdTask("show version")]
+    consumer = asyncio.create_task(session._consume_cmd_queue())
+    try:
+        result = await expired.get_result()
+        assert isinstance(result.exception, DeadlineExceeded)
+        results = await session.send_cmds(batch, deadline=time.time() + 10)
+        assert [result.exception for result in results] == [None, None]
+        assert session.executed == ["show clock", "show version"]
+        # the expired task takes no exec time
+        assert session._cmd_queue.estimate_wait(Priority.NORMAL) < 1
+    finally:
+        session._is_closing = True
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from netdriver_agent.client.channel import SSHChannel
+from netdriver_agent.client.telnet import TelnetClientConnection
+from netdriver_agent.plugins.hillstone import HillstoneBase
+from netdriver_core.exception.errors import LoginFailed
+from netdriver_core.log import logman
+from netdriver_core.utils import telnet
+from netdriver_core.utils.telnet import TelnetParser
+
+
+_UNION = HillstoneBase.PatternHelper.get_union_pattern()
+_MORE = HillstoneBase.PatternHelper.get_more_pattern()
+
+
+class FakeTelnetServer:
+    """ Telnet server asks for the terminal size, then the username and password """
+
+    def __init__(self, password: str = "admin"):
+        self._password = password
+        self.cmds = []
+        self.lines = []
+
+    async def _readline(self, reader, parser) -> str:
+        line = b''
+        while not line.endswith(b'\n'):
+            chunk = await reader.read(1)
+            if not chunk:
+                return ''
+            data, cmds = parser.feed(chunk)
+            self.cmds.extend(cmds)
+            line += data
+        return line.decode().strip()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        parser = TelnetParser()
+        writer.write(telnet.build_cmd(telnet.WILL, telnet.ECHO) + telnet.build_cmd(telnet.DO, telnet.NAWS) +
+                     telnet.build_cmd(telnet.DO, telnet.TTYPE) + telnet.build_sb(telnet.TTYPE, b"\x01") +
+                     telnet.build_cmd(telnet.DO, 0x27) + b"login: ")
+        self.lines.append(await self._readline(reader, parser))
+        writer.write(b"Password: ")
+        if await self._readline(reader, parser) != self._password:
+            writer.write(b"\r\nLogin incorrect\r\nlogin: ")
+        else:
+            writer.write(b"\r\nWelcome\r\nhostname# ")
+            while line := await self._readline(reader, parser):
+                self.lines.append(line)
+                writer.write(f"{line}\r\n".encode() + b"line\r\n" * 3 + b"hostname# ")
+        await reader.read()
+        writer.close()
+
+    async def __aenter__(self) -> int:
+        self._server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def __aexit__(self, *args):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_telnet_login_and_read_until_prompt():
+    server = FakeTelnetServer()
+    async with server as port:
+        conn = await TelnetClientConnection.connect(
+            "127.0.0.1", port, username="admin", password="admin", term_size=(1000, 100))
+        channel = SSHChannel(conn, await conn.create_process(), logger=logman.logger)
+        channel._read_buffer_size = 8192
+        channel._read_channel_until_timeout = 2
+        output = await channel.read_channel_until("", _UNION, _MORE, " ")
+        assert output.endswith("Welcome\r\nhostname# ")
+        await channel.write_channel("show version\n")
+        output = await channel.read_channel_until("show version", _UNION, _MORE, " ")
+        assert output == "show version\r\n" + "line\r\n" * 3 + "hostname# "
+        await channel.close()
+    assert server.lines == ["admin", "show version"]
+    assert (telnet.SB, telnet.NAWS, b"\x03\xe8\x00\x64") in server.cmds
+    assert (telnet.SB, telnet.TTYPE, b"\x00ANSI") in server.cmds
+    assert (telnet.DO, telnet.ECHO, b'') in server.cmds
+    assert (telnet.WONT, 0x27, b'') in server.cmds
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_telnet_login_failed():
+    async with FakeTelnetServer() as port:
+        with pytest.raises(LoginFailed):
+            await TelnetClientConnection.connect("127.0.0.1", port, username="admin", password="wrong")
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_telnet_bytes_process():
+    async with FakeTelnetServer() as port:
+        conn = await TelnetClientConnection.connect("127.0.0.1", port, username="admin", password="admin")
+        process = await conn.create_process(encoding=None)
+        data = b''
+        while not data.endswith(b"hostname# "):
+            data += await process.stdout.read(8192)
+        assert data == b"\r\nWelcome\r\nhostname# "
+        process.close()
@@ -16,6 +16,7 @@ class ErrorCode(StrEnum):
     QUEUE_FULL = _CLIENT_ERROR_PREFIX + "0003"
     UNSUPPORTED_MODE = _CLIENT_ERROR_PREFIX + "0004"
     UNSUPPORTED_CONFIG_TYPE = _CLIENT_ERROR_PREFIX + "0005"
+    DEADLINE_EXCEEDED = _CLIENT_ERROR_PREFIX + "0006"
 
     # Server error
     SERVER_ERROR = _SERVER_ERROR_PREFIX + "0000"
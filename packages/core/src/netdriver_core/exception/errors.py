@@ -37,10 +37,21 @@ class PluginNotFound(BaseError):
 
 
 class QueueFullError(BaseError):
-    def __init__(self, msg: str = "Queue is full, please try again later.") -> None:
+    # seconds the client should wait before retrying, None if unknown
+    retry_after: int
+
+    def __init__(self, msg: str = "Queue is full, please try again later.", retry_after: int = None) -> None:
         super().__init__(msg)
         self.status_code = 429 # Too Many Requests
         self.code = ErrorCode.QUEUE_FULL
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(BaseError):
+    def __init__(self, msg: str = "Deadline exceeded before the task started.") -> None:
+        super().__init__(msg)
+        self.status_code = 504 # Gateway Timeout
+        self.code = ErrorCode.DEADLINE_EXCEEDED
 
 
 class ConnectTimeout(BaseError):
@@ -23,11 +23,20 @@ class IPluginRegistry(type):
             model_plugins.append(cls)
             IPluginRegistry.plugin_registries[key] = model_plugins
             log.info(f"registed plugin: {key} -> {cls}")
+            cls.on_registered()
 
 
 class PluginCore(object, metaclass=IPluginRegistry):
     ''' Plugin Core Class '''
 
+    @classmethod
+    def on_registered(cls) -> None:
+        ''' Called once the plugin class is registered, to prepare the class-level resources '''
+
+    @classmethod
+    def on_loaded(cls) -> None:
+        ''' Called once all the plugin modules are loaded, the names of the plugin modules are bound '''
+
     def get_plugin_info(self) -> PluginInfo:
         ''' Get plugin info '''
         return self.info
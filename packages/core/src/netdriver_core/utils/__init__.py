@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from . import regex, terminal, string, files
+from . import regex, terminal, string, files, telnet
 
-__all__ = ["regex", "terminal", "string", "files"]
+__all__ = ["regex", "terminal", "string", "files", "telnet"]
@@ -13,21 +13,24 @@ log = logman.logger
 
 def catch_error_of_output(output: str,
                           error_patterns: List[re.Pattern],
-                          ignore_patterns: List[re.Pattern]) -> str | None:
+                          ignore_patterns: List[re.Pattern],
+                          context_lines: int = 1) -> str | None:
     """ Catch error message from output by error patterns and ignore patterns
     :param output: output string
     :param error_patterns: list of error patterns
-    :param ignore_patterns: list of ignore patterns
+    :param ignore_patterns: list of ignore patterns, checked against the lines of the matched error
+        and context_lines lines around them, instead of the whole output
+    :param context_lines: lines before and after the matched error checked by ignore patterns
     :return: error message or None
     """
     log.debug("Catching errors in output.")
     output = output.replace("\r", "")
     for error_pattern in error_patterns:
-        ematch: re.Match = error_pattern.search(output)
-        if ematch:
+        for ematch in error_pattern.finditer(output):
+            region = _get_region(output, ematch.start(), ematch.end(), context_lines)
             imatch: re.Match = None
             for ignore_pattern in ignore_patterns:
-                imatch = ignore_pattern.search(output)
+                imatch = ignore_pattern.search(region)
                 if imatch:
                     log.debug(f"Ignoring error: {ematch.group()}, By pattern: {ignore_pattern}")
                     break
@@ -38,6 +41,21 @@ def catch_error_of_output(output: str,
     return None
 
 
+def _get_region(output: str, start: int, end: int, context_lines: int) -> str:
+    """ Get the lines from start to end, with context_lines lines before and after them """
+    start = output.rfind("\n", 0, start) + 1
+    for _ in range(context_lines):
+        if start == 0:
+            break
+        start = output.rfind("\n", 0, start - 1) + 1
+    end = output.find("\n", end)
+    for _ in range(context_lines):
+        if end < 0:
+            break
+        end = output.find("\n", end + 1)
+    return output[start:end if end >= 0 else len(output)]
+
+
 def catch_auto_confirm_of_output(output: str, 
                                  auto_confirm_patterns: dict[re.Pattern, str]) -> str | None:
     log.debug("Catching auto confirm in output.")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Telnet protocol (RFC 854) helpers, shared by the agent client and the simunet server """
+
+import struct
+from typing import List, Tuple
+
+
+# commands
+SE = 240
+NOP = 241
+SB = 250
+WILL = 251
+WONT = 252
+DO = 253
+DONT = 254
+IAC = 255
+
+# options
+ECHO = 1
+SGA = 3
+TTYPE = 24
+NAWS = 31
+
+# terminal type subnegotiation
+TTYPE_IS = 0
+TTYPE_SEND = 1
+
+_IAC_BYTE = bytes([IAC])
+_NEGOTIATIONS = (WILL, WONT, DO, DONT)
+
+
+def escape_iac(data: bytes) -> bytes:
+    """ Double the IAC bytes of the data """
+    return data.replace(_IAC_BYTE, _IAC_BYTE * 2)
+
+
+def build_cmd(cmd: int, option: int) -> bytes:
+    """ Build an option negotiation, such as IAC DO ECHO """
+    return bytes([IAC, cmd, option])
+
+
+def build_sb(option: int, payload: bytes) -> bytes:
+    """ Build an option subnegotiation """
+    return bytes([IAC, SB, option]) + escape_iac(payload) + bytes([IAC, SE])
+
+
+def build_naws(width: int, height: int) -> bytes:
+    """ Build the NAWS subnegotiation of the terminal size (RFC 1073) """
+    return build_sb(NAWS, struct.pack(">HH", width & 0xFFFF, height & 0xFFFF))
+
+
+def parse_naws(payload: bytes) -> Tuple[int, int]:
+    """ Parse the NAWS payload into (width, height) """
+    if len(payload) < 4:
+        return 0, 0
+    return struct.unpack(">HH", payload[:4])
+
+
+class TelnetParser:
+    """ Incremental parser splits a telnet stream into data and commands
+
+    A command may be split across chunks, the parser keeps the unfinished one until the rest
+    arrives. Doubled IAC bytes are unescaped and CR NUL is decoded as CR.
+    """
+    _STATE_DATA = 0
+    _STATE_IAC = 1
+    _STATE_OPTION = 2
+    _STATE_SB = 3
+    _STATE_SB_IAC = 4
+
+    def __init__(self) -> None:
+        self._state = self._STATE_DATA
+        self._cmd = 0
+        self._sb = bytearray()
+        self._last_cr = False
+
+    def feed(self, data: bytes) -> Tuple[bytes, List[Tuple[int, int, bytes]]]:
+        """ Parse a chunk of the stream
+
+        :return: the data bytes and the commands, each one is (command, option, subnegotiation payload)
+        """
+        if self._state == self._STATE_DATA and IAC not in data:
+            return self._strip_nul(data), []
+
+        out = bytearray()
+        cmds = []
+        i = 0
+        size = len(data)
+        while i < size:
+            state = self._state
+            if state == self._STATE_DATA:
+                end = data.find(_IAC_BYTE, i)
+                if end == -1:
+                    end = size
+                out += data[i:end]
+                i = end
+                if i < size:
+                    self._state = self._STATE_IAC
+                    i += 1
+            elif state == self._STATE_IAC:
+                cmd = data[i]
+                i += 1
+                if cmd == IAC:
+                    out.append(IAC)
+                    self._state = self._STATE_DATA
+                elif cmd in _NEGOTIATIONS:
+                    self._cmd = cmd
+                    self._state = self._STATE_OPTION
+                elif cmd == SB:
+                    self._sb = bytearray()
+                    self._state = self._STATE_SB
+                else:
+                    cmds.append((cmd, 0, b''))
+                    self._state = self._STATE_DATA
+            elif state == self._STATE_OPTION:
+                cmds.append((self._cmd, data[i], b''))
+                i += 1
+                self._state = self._STATE_DATA
+            elif state == self._STATE_SB:
+                end = data.find(_IAC_BYTE, i)
+                if end == -1:
+                    self._sb += data[i:]
+                    i = size
+                else:
+                    self._sb += data[i:end]
+                    i = end + 1
+                    self._state = self._STATE_SB_IAC
+            else:
+                cmd = data[i]
+                i += 1
+                if cmd == IAC:
+                    self._sb.append(IAC)
+                    self._state = self._STATE_SB
+                else:
+                    # IAC SE, or a broken subnegotiation which is ended by any other command
+                    if self._sb:
+                        cmds.append((SB, self._sb[0], bytes(self._sb[1:])))
+                    self._sb = bytearray()
+                    self._state = self._STATE_DATA
+        return self._strip_nul(bytes(out)), cmds
+
+    def _strip_nul(self, data: bytes) -> bytes:
+        if not data:
+            return data
+        if self._last_cr and data[0] == 0:
+            data = data[1:]
+        data = data.replace(b'\r\x00', b'\r')
+        self._last_cr = data.endswith(b'\r')
+        return data
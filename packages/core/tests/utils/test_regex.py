@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+
+from netdriver_core.utils.regex import catch_error_of_output
+
+
+_ERROR_PATTERNS = [re.compile(r"^Error: .+$", re.MULTILINE)]
+_IGNORE_PATTERNS = [re.compile(r"^Error: .+ already exists\.$", re.MULTILINE)]
+
+
+def test_catch_error():
+    output = "host# address a\r\nError: Invalid address.\r\nhost# "
+    assert catch_error_of_output(output, _ERROR_PATTERNS, _IGNORE_PATTERNS) == "Error: Invalid address."
+    assert catch_error_of_output("host# address a\r\nhost# ", _ERROR_PATTERNS, _IGNORE_PATTERNS) is None
+
+
+def test_ignore_error_around_the_match():
+    ignored = "host# address a\nError: Address a already exists.\nhost# "
+    assert catch_error_of_output(ignored, _ERROR_PATTERNS, _IGNORE_PATTERNS) is None
+    # an ignored error elsewhere in the output does not hide the error
+    output = ignored + "address b\nhost# address c\nhost# address d\nError: Invalid address.\nhost# "
+    assert catch_error_of_output(output, _ERROR_PATTERNS, _IGNORE_PATTERNS) == "Error: Invalid address."
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from netdriver_core.utils import telnet
+from netdriver_core.utils.telnet import TelnetParser
+
+
+def test_parse_plain_data():
+    parser = TelnetParser()
+    assert parser.feed(b"hostname# ") == (b"hostname# ", [])
+
+
+def test_parse_negotiations():
+    parser = TelnetParser()
+    data = b"Username: " + telnet.build_cmd(telnet.DO, telnet.NAWS) + telnet.build_cmd(telnet.WILL, telnet.ECHO)
+    assert parser.feed(data) == (b"Username: ", [(telnet.DO, telnet.NAWS, b''), (telnet.WILL, telnet.ECHO, b'')])
+
+
+def test_parse_command_split_across_chunks():
+    parser = TelnetParser()
+    data = b"abc" + telnet.build_naws(1000, 100) + b"def"
+    results = [parser.feed(data[i:i + 1]) for i in range(len(data))]
+    assert b"".join(result[0] for result in results) == b"abcdef"
+    cmds = [cmd for result in results for cmd in result[1]]
+    assert cmds == [(telnet.SB, telnet.NAWS, b"\x03\xe8\x00\x64")]
+    assert telnet.parse_naws(cmds[0][2]) == (1000, 100)
+
+
+def test_parse_escaped_iac_and_cr_nul():
+    parser = TelnetParser()
+    assert parser.feed(telnet.escape_iac(b"\xff\xfe") + b"line\r\x00") == (b"\xff\xfeline\r", [])
+    assert parser.feed(b"\r") == (b"\r", [])
+    assert parser.feed(b"\x00next") == (b"next", [])
+
+
+def test_build_naws_escapes_iac():
+    assert telnet.build_naws(255, 24) == bytes([telnet.IAC, telnet.SB, telnet.NAWS, 0, 255, 255, 0, 24,
+                                                telnet.IAC, telnet.SE])
+    parser = TelnetParser()
+    assert parser.feed(telnet.build_naws(255, 24)) == (b'', [(telnet.SB, telnet.NAWS, b"\x00\xff\x00\x18")])
@@ -31,7 +31,7 @@ async def start_servers(config: dict) -> AsyncGenerator[MockSSHDevice, None]:
         log.info(f"Starting SSH server {vendor}-{model}-{version} on \
                  {host if host else '0.0.0.0'}:{port}...")
         yield MockSSHDevice.create_device(vendor=vendor, model=model, version=version, host=host,
-                                          port=port)
+                                          port=port, telnet_port=dev.get("telnet_port", None))
 
 
 async def on_startup() -> None:
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3.10.6
 # -*- coding: utf-8 -*-
+import asyncio
 import socket
 from typing import List, Optional
 
@@ -8,6 +9,7 @@ import asyncssh
 from netdriver_core.log import logman
 from netdriver_core.exception.server import ClientExit
 from netdriver_simunet.server.handlers import CommandHandler, CommandHandlerFactory
+from netdriver_simunet.server.telnet import TelnetServerProcess
 from netdriver_simunet.server.user_repo import UserRepo
 
 
@@ -20,8 +22,9 @@ log = logman.logger.patch(_patch_record)
 
 
 class MockSSHDevice(asyncssh.SSHServer):
-    """ Create mock SSH-device """
+    """ Create mock SSH-device, optionally listening on telnet as well """
     _server: asyncssh.SSHAcceptor
+    _telnet_server: Optional[asyncio.Server] = None
     _logger = log
     _handlers = List[CommandHandler]
 
@@ -30,6 +33,7 @@ class MockSSHDevice(asyncssh.SSHServer):
     version: str
     host : str
     port : int
+    telnet_port : Optional[int] = None
     family : int
     host_keys : list
     user_repo: UserRepo
@@ -37,7 +41,7 @@ class MockSSHDevice(asyncssh.SSHServer):
     @classmethod
     def create_device(cls, vendor: str, model: str, version: str, host: str = None,
                       port: int = 8022, family: int = socket.AF_INET, host_keys: list = None,
-                      user_repo: UserRepo = None) -> "MockSSHDevice":
+                      user_repo: UserRepo = None, telnet_port: int = None) -> "MockSSHDevice":
         """ Create a mock SSH-device
 
         @param vendor: Vendor name of the device
@@ -48,11 +52,13 @@ class MockSSHDevice(asyncssh.SSHServer):
         @param family: Address family to listen on, default is AF_INET
         @param host_keys: List of host key files, default is ['config/simunet/keys/host_key']
         @param user_repo: user repository for authentication
+        @param telnet_port: Port number to listen on for telnet, default is no telnet
         """
         device = cls(host, port, family, host_keys, user_repo)
         device.vendor = vendor
         device.model = model
         device.version = version
+        device.telnet_port = telnet_port
         return device
 
     def __init__(self, host: str = None, port: int = 8022,
@@ -104,7 +110,10 @@ class MockSSHDevice(asyncssh.SSHServer):
             _handler = CommandHandlerFactory.create_handler(process, self.vendor, self.model,
                                                             self.version)
             self._handlers.append(_handler)
-            await _handler.run()
+            if process.command:
+                await _handler.run_command(process.command)
+            else:
+                await _handler.run()
         except ValueError as e:
             self._logger.error(e)
             process.stdout.write(str(e))
@@ -123,6 +132,21 @@ class MockSSHDevice(asyncssh.SSHServer):
             except Exception as e:
                 self._logger.error(f"Error during process cleanup: {e}")
 
+    async def handle_telnet(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ Handle telnet connection, login and run the command handler as the SSH process """
+        peer_name = writer.get_extra_info('peername')
+        self._logger.info(f"Telnet connection received from {peer_name[0]}:{peer_name[1]}")
+        process = TelnetServerProcess(reader, writer)
+        process.start()
+        try:
+            if await process.login(self.user_repo):
+                await self.handle_process(process)
+            else:
+                self._logger.info("Telnet login failed")
+        finally:
+            process.exit(0)
+            self._logger.info('Telnet connection closed')
+
     async def start(self):
         """ Start mock SSH-device """
         self._server = await asyncssh.create_server(
@@ -135,11 +159,19 @@ class MockSSHDevice(asyncssh.SSHServer):
             process_factory=self.handle_process,
         )
         self._logger.info(f"SSH server started at: {self._server.get_addresses()}")
+        if self.telnet_port is not None:
+            self._telnet_server = await asyncio.start_server(
+                self.handle_telnet, host=self.host, port=self.telnet_port, family=self.family)
+            self._logger.info(f"Telnet server started at: "
+                              f"{[sock.getsockname() for sock in self._telnet_server.sockets]}")
 
     def stop(self):
         """ Stop mock SSH-device """
         self._server.close()
         self._logger.info("SSH server stopped")
+        if self._telnet_server:
+            self._telnet_server.close()
+            self._logger.info("Telnet server stopped")
 
     async def __aenter__(self):
         await self.start()
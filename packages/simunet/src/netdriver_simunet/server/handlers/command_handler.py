@@ -22,6 +22,8 @@ class CommandHandler(abc.ABC):
     info: DeviceBaseInfo
     conf_path: str
     config: DeviceConfig
+    # configs loaded by conf_path, shared by the handlers of all the channels
+    _configs: Dict[str, DeviceConfig] = {}
 
     @classmethod
     @abc.abstractmethod
@@ -43,10 +45,12 @@ class CommandHandler(abc.ABC):
         self._mode = self.config.start_mode
 
     def _load_config(self):
-        """ Load config from file """
+        """ Load config from file, once per file """
         try:
-            conf_dict = yaml.safe_load(Path(self.conf_path).read_text(encoding='utf-8'))
-            self.config = DeviceConfig(**conf_dict)
+            if self.conf_path not in CommandHandler._configs:
+                conf_dict = yaml.safe_load(Path(self.conf_path).read_text(encoding='utf-8'))
+                CommandHandler._configs[self.conf_path] = DeviceConfig(**conf_dict)
+            self.config = CommandHandler._configs[self.conf_path]
         except Exception as e:
             self._logger.error(f"Config load failed: {e}")
 
@@ -85,6 +89,13 @@ class CommandHandler(abc.ABC):
         if not self._process.is_closing():
             self._process.stdout.write(message)
 
+    async def run_command(self, command: str):
+        """ Run the command of an exec request, the output ends with EOF without prompt """
+        self._logger.info(f"Received exec <- {command}")
+        output = await self.exec_cmd(command.strip())
+        self._logger.info(f"Output -> {output}")
+        self.writeline(output)
+
     async def run(self):
         self.writeline(self.config.welcome)
         self.write(self.prompt)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import codecs
+from collections import deque
+from typing import Deque, Tuple
+
+from netdriver_core.log import logman
+from netdriver_core.utils import telnet
+from netdriver_core.utils.telnet import TelnetParser
+from netdriver_simunet.server.user_repo import UserRepo
+
+
+class TelnetServerProcess:
+    """ Telnet session of a mock device
+
+    Provides the parts of asyncssh.SSHServerProcess used by the command handlers. Like the asyncssh
+    line editor, the input is echoed and returned line by line, and the output line feeds are
+    converted to CR LF. The process is its own stdin and stdout.
+    """
+    _logger = logman.logger
+    _READ_SIZE = 4096
+    term_size: Tuple[int, int, int, int]
+    # telnet has no exec request
+    command = None
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 encoding: str = "utf-8") -> None:
+        self._reader = reader
+        self._writer = writer
+        self._encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._parser = TelnetParser()
+        self._lines: Deque[str] = deque()
+        self._line = ''
+        self._last_cr = False
+        self._echo = True
+        self.term_size = (80, 24, 0, 0)
+
+    @property
+    def stdin(self) -> "TelnetServerProcess":
+        return self
+
+    @property
+    def stdout(self) -> "TelnetServerProcess":
+        return self
+
+    def start(self) -> None:
+        """ Negotiate the options, the server echoes the input and asks for the terminal size """
+        self._send(telnet.build_cmd(telnet.WILL, telnet.ECHO) +
+                   telnet.build_cmd(telnet.WILL, telnet.SGA) +
+                   telnet.build_cmd(telnet.DO, telnet.NAWS))
+
+    async def login(self, user_repo: UserRepo, retries: int = 3) -> bool:
+        """ Ask for the username and password """
+        for _ in range(retries):
+            self.write("Username: ")
+            username = await self.readline()
+            if not username:
+                return False
+            self.set_echo(False)
+            self.write("Password: ")
+            password = await self.readline()
+            self.set_echo(True)
+            if not password:
+                return False
+            self.write("\n")
+            if await user_repo.auth(username.strip(), password.rstrip("\r\n")):
+                return True
+            self.write("% Login invalid\n\n")
+        return False
+
+    def set_echo(self, echo: bool) -> None:
+        self._echo = echo
+
+    def _send(self, data: bytes) -> None:
+        if not self._writer.is_closing():
+            self._writer.write(data)
+
+    def _negotiate(self, cmd: int, option: int, payload: bytes) -> None:
+        if cmd == telnet.SB and option == telnet.NAWS:
+            width, height = telnet.parse_naws(payload)
+            self.term_size = (width, height, 0, 0)
+        elif cmd == telnet.DO and option not in (telnet.ECHO, telnet.SGA):
+            self._send(telnet.build_cmd(telnet.WONT, option))
+        elif cmd == telnet.WILL and option != telnet.NAWS:
+            self._send(telnet.build_cmd(telnet.DONT, option))
+
+    def _input(self, text: str) -> None:
+        """ Split the input into lines, CR, LF and CR LF all end a line """
+        echo = []
+        for char in text:
+            if char == '\n' and self._last_cr:
+                self._last_cr = False
+                continue
+            self._last_cr = char == '\r'
+            if char in '\r\n':
+                self._lines.append(self._line + '\n')
+                self._line = ''
+                echo.append('\r\n')
+            else:
+                self._line += char
+                if self._echo:
+                    echo.append(char)
+        if echo:
+            self._send(telnet.escape_iac(''.join(echo).encode(self._encoding)))
+
+    async def readline(self) -> str:
+        """ Read a line of input, empty at EOF """
+        while not self._lines:
+            chunk = await self._reader.read(self._READ_SIZE)
+            if not chunk:
+                return ''
+            data, cmds = self._parser.feed(chunk)
+            for cmd, option, payload in cmds:
+                self._negotiate(cmd, option, payload)
+            self._input(self._decoder.decode(data))
+        return self._lines.popleft()
+
+    def __aiter__(self) -> "TelnetServerProcess":
+        return self
+
+    async def __anext__(self) -> str:
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    def write(self, data: str) -> None:
+        data = data.replace('\n', '\r\n')
+        self._send(telnet.escape_iac(data.encode(self._encoding)))
+
+    def is_closing(self) -> bool:
+        return self._writer.is_closing()
+
+    def exit(self, status: int) -> None:
+        if not self._writer.is_closing():
+            self._writer.close()
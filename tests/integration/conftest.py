@@ -188,6 +188,28 @@ def hillstone_SG6000_dev(request: pytest.FixtureRequest, simunet_process) -> Gen
             "enable_password": "",
         }
 
+@pytest.fixture(scope="module")
+def hillstone_SG6000_telnet_dev(request: pytest.FixtureRequest, simunet_process) -> Generator[dict, None, None]:
+    mock_dev = request.config.getoption(_ARG_MOCK_DEV, default=False)
+    if not mock_dev:
+        yield {
+            "protocol": "telnet",
+            "ip": "192.168.60.123",
+            "port": 23,
+            "username": "admin",
+            "password": "r00tme",
+            "enable_password": "",
+        }
+    else:
+        yield {
+            "protocol": "telnet",
+            "ip": "127.0.0.1",
+            "port": 18041,
+            "username": "admin",
+            "password": "Admin@1234567",
+            "enable_password": "",
+        }
+
 @pytest.fixture(scope="module")
 def h3c_secpath_dev(request: pytest.FixtureRequest, simunet_process) -> Generator[dict, None, None]:
     mock_dev = request.config.getoption(_ARG_MOCK_DEV, default=False)
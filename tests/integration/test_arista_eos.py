@@ -75,3 +75,38 @@ async def test_pull_config(test_client: TestClient, arista_eos_dev: dict):
     assert response.headers.get("x-correlation-id") == trace_id
     assert not response.json().get("err_msg")
     assert len(response.json().get("result")) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_exec_channel(test_client: TestClient, arista_eos_dev: dict):
+    trace_id = uuid4().hex
+    response = test_client.post("/api/v1/cmd", headers={"x-correlation-id": trace_id}, json={
+        "protocol": arista_eos_dev.get("protocol"),
+        "ip": arista_eos_dev.get("ip"),
+        "port": arista_eos_dev.get("port"),
+        "username": arista_eos_dev.get("username"),
+        "password": arista_eos_dev.get("password"),
+        "enable_password": arista_eos_dev.get("enable_password"),
+        "vendor": "arista",
+        "model": "eos",
+        "version": "4.31.2F",
+        "encode": "utf-8",
+        "vsys": "default",
+        "commands": [
+            {
+                "type": "raw",
+                "mode": "enable",
+                "command": "show version",
+                "exec_channel": True
+            }
+        ],
+        "timeout": 10
+    })
+
+    assert response.status_code == 200
+    assert response.json().get("code") == "OK"
+    assert response.headers.get("x-correlation-id") == trace_id
+    assert not response.json().get("err_msg")
+    assert len(response.json().get("result")) == 1
+    assert "Arista" in response.json().get("result")[0].get("ret")